@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    # Weak comparison (RFC 9110 13.1.2): W/"x" and "x" match
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def not_modified(request: Request, response: Response, etag: str,
+                 last_modified: Optional[float] = None) -> Optional[Response]:
+    """Set the validators on `response`; return a 304 to send instead when the client's copy is current.
+
+    Call it before building the listing so an unchanged poll skips that work. If-None-Match wins
+    over If-Modified-Since when both are sent.
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(datetime.fromtimestamp(int(last_modified), timezone.utc), usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        fresh = _etag_matches(etag, if_none_match)
+    elif if_modified_since and last_modified:
+        try:
+            fresh = int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            fresh = False
+    else:
+        fresh = False
+    return Response(status_code=304, headers=headers) if fresh else None
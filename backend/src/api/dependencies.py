@@ -1,7 +1,32 @@
 from functools import lru_cache
+from typing import Any, Callable
+
+from fastapi import HTTPException
+from services.memory import MemoryMonitor
 from services.model_service import ModelService
+from services.scheduler import Lane, LaneOverloaded, LaneScheduler
+from utils.settings import SCHEDULER_LANES, SCHEDULER_WORKERS
 
 @lru_cache()
 def get_model_service() -> ModelService:
     # Construct once per process; reuse across requests
-    return ModelService()
\ No newline at end of file
+    return ModelService()
+
+@lru_cache()
+def get_scheduler() -> LaneScheduler:
+    lanes = [
+        Lane(name, max_concurrency=concurrency, max_queue=queue, weight=weight)
+        for name, (concurrency, queue, weight) in SCHEDULER_LANES.items()
+    ]
+    return LaneScheduler(lanes, workers=SCHEDULER_WORKERS)
+
+@lru_cache()
+def get_memory_monitor() -> MemoryMonitor:
+    return MemoryMonitor()
+
+async def run_in_lane(lane: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    # Run blocking model work off the event loop, under the lane's admission limits
+    try:
+        return await get_scheduler().run(lane, fn, *args, **kwargs)
+    except LaneOverloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
@@ -0,0 +1,143 @@
+import bz2
+import gzip
+import io
+from typing import BinaryIO, Optional
+
+import pandas as pd
+from fastapi import HTTPException, Request, UploadFile
+
+from utils.settings import COLUMNS, MAX_UPLOAD_BYTES, PREDICT_MAX_ROWS, PREDICT_MEMORY_BUDGET_BYTES
+
+CSV_CONTENT_TYPES = ("text/csv", "application/vnd.ms-excel", "application/csv")
+BATCH_JSON_TYPES = ("application/json",)
+ARROW_STREAM_TYPES = ("application/vnd.apache.arrow.stream", "application/x-apache-arrow-stream")
+COMPRESSED_CONTENT_TYPES = {
+    "application/gzip": "gzip",
+    "application/x-gzip": "gzip",
+    "application/zstd": "zstd",
+    "application/x-zstd": "zstd",
+    "application/x-bzip2": "bz2",
+    "application/octet-stream": None,  # decided by magic bytes
+}
+MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+    (b"BZh", "bz2"),
+)
+
+
+def check_upload_type(file: UploadFile, extra_types: tuple = ()) -> None:
+    if file.content_type not in CSV_CONTENT_TYPES + tuple(extra_types) and file.content_type not in COMPRESSED_CONTENT_TYPES:
+        raise HTTPException(status_code=415, detail="Unsupported media type. Upload a CSV file (optionally gzip/zstd/bz2-compressed).")
+
+
+def check_upload_size(file: UploadFile, limit: int = MAX_UPLOAD_BYTES) -> None:
+    # Uploads already known to be too big are refused before any parsing
+    if file.size is not None and file.size > limit:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {limit} bytes.")
+
+
+class InputBudget:
+    """Row and estimated-memory limits for one request, checked chunk by chunk as the input is parsed.
+
+    The memory estimate is the parsed chunks' own size per row, plus the float feature matrix
+    and `extra_per_row` bytes of per-row output (predictions, labels) derived from them.
+    """
+
+    def __init__(self, max_rows: int = PREDICT_MAX_ROWS, max_memory: int = PREDICT_MEMORY_BUDGET_BYTES,
+                 extra_per_row: int = 16):
+        self.max_rows = max_rows
+        self.max_memory = max_memory
+        self.extra_per_row = extra_per_row
+        self.rows = 0
+        self.bytes_per_row = 0.0
+
+    def expect_rows(self, rows: int) -> None:
+        if rows > self.max_rows:
+            raise HTTPException(status_code=413, detail=f"Input has {rows} rows; the limit is {self.max_rows}.")
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        self.rows += len(chunk)
+        if self.rows > self.max_rows:
+            raise HTTPException(status_code=413, detail=f"Input exceeds {self.max_rows} rows.")
+        if len(chunk):
+            per_row = chunk.memory_usage(deep=True, index=False).sum() / len(chunk)
+            self.bytes_per_row = max(self.bytes_per_row, per_row + 8 * len(COLUMNS) + self.extra_per_row)
+
+    @property
+    def estimated_bytes(self) -> int:
+        return int(self.rows * self.bytes_per_row)
+
+    @property
+    def over_memory(self) -> bool:
+        return self.estimated_bytes > self.max_memory
+
+
+class _LimitedReader(io.RawIOBase):
+    """Counts bytes as the parser pulls them and stops once the (decompressed) limit is passed."""
+
+    def __init__(self, stream: BinaryIO, limit: int):
+        self._stream = stream
+        self._limit = limit
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        self.bytes_read += len(data)
+        if self.bytes_read > self._limit:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {self._limit} bytes after decompression.")
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _detect_compression(file: UploadFile) -> Optional[str]:
+    codec = COMPRESSED_CONTENT_TYPES.get(file.content_type)
+    if codec:
+        return codec
+    head = file.file.read(4)
+    file.file.seek(0)
+    for magic, name in MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def open_upload(file: UploadFile, limit: int = MAX_UPLOAD_BYTES) -> BinaryIO:
+    """Binary stream over the upload's CSV bytes, decompressed on the fly and size-limited.
+
+    Nothing is decompressed up front: the CSV parser pulls bytes through the decompressor
+    as it goes, so the decompressed payload never exists whole in memory or on disk.
+    """
+    file.file.seek(0)
+    codec = _detect_compression(file)
+    if codec == "gzip":
+        stream = gzip.GzipFile(fileobj=file.file, mode="rb")
+    elif codec == "bz2":
+        stream = bz2.BZ2File(file.file, mode="rb")
+    elif codec == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise HTTPException(status_code=415, detail="zstd-compressed uploads are not supported on this server (zstandard is not installed).")
+        stream = zstandard.ZstdDecompressor().stream_reader(file.file)
+    else:
+        stream = file.file
+    return io.BufferedReader(_LimitedReader(stream, limit), buffer_size=1024 * 1024)
+
+
+async def read_body(request: Request, limit: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Raw request body, refused with 413 as soon as it passes the upload limit."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f"Body exceeds {limit} bytes.")
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413, detail=f"Body exceeds {limit} bytes.")
+        chunks.append(chunk)
+    return b"".join(chunks)
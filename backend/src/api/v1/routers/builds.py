@@ -1,15 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from api.conditional import not_modified
 from api.dependencies import get_model_service
 
 router = APIRouter()
 
 @router.get("/")
-async def list_builds(limit: int = Query(50, ge=1, le=500), model_service = Depends(get_model_service)):
+async def list_builds(request: Request, response: Response, limit: int = Query(50, ge=1, le=500),
+                      model_service = Depends(get_model_service)):
     try:
+        cached = not_modified(request, response, model_service.builds_etag(limit))
+        if cached is not None:
+            return cached
         return model_service.list_builds(limit=limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/leaderboard", summary="Builds ranked by a metric, optionally best build per family")
+async def leaderboard(
+    metric: str = Query("macro_f1", description="Metric to rank by (accuracy, precision, recall, f1, macro_f1)"),
+    model: str | None = Query(None, description="Restrict to one model family"),
+    per_family: bool = Query(False, description="Only the best build of each family"),
+    ascending: bool = Query(False, description="Lower is better"),
+    limit: int = Query(10, ge=1, le=500),
+    model_service = Depends(get_model_service),
+):
+    try:
+        return model_service.build_leaderboard(metric, model_name=model, limit=limit, per_family=per_family, ascending=ascending)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/trend", summary="A metric over the most recent builds, oldest first")
+async def trend(
+    metric: str = Query("f1", description="Metric to follow"),
+    model: str | None = Query(None, description="Restrict to one model family"),
+    limit: int = Query(200, ge=1, le=5000),
+    model_service = Depends(get_model_service),
+):
+    try:
+        return model_service.build_trend(metric, model_name=model, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/active", summary="Builds currently training, with their latest progress stage")
+async def active_builds(model_service = Depends(get_model_service)):
+    return model_service.progress.active()
+
+@router.get("/{build_id}/events", summary="Live progress of a build as server-sent events")
+async def build_events(
+    build_id: str,
+    last_event_id: int = Header(0, alias="Last-Event-ID", description="Resume after this event (sent by EventSource on reconnect)"),
+    model_service = Depends(get_model_service),
+):
+    # Subscribing before the build starts is fine: events flow once a retrain with this build_id begins.
+    # A build that finished before the events were buffered (or was evicted) only has its record.
+    events, done, _ = model_service.progress.snapshot(build_id)
+    if not events and not done and model_service.get_build(build_id):
+        raise HTTPException(status_code=410, detail="Build already finished; its progress events are no longer buffered.")
+
+    async def stream():
+        async for event in model_service.progress.subscribe(build_id, after_seq=last_event_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event['seq']}\nevent: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.get("/{build_id}")
 async def get_build(build_id: str, model_service = Depends(get_model_service)):
     try:
@@ -0,0 +1,66 @@
+from __future__ import annotations
+from typing import Optional
+
+import pandas as pd
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse
+
+from api.dependencies import get_model_service
+from api.uploads import check_upload_type, open_upload
+
+router = APIRouter()
+
+@router.get("/", summary="List registered benchmark holdout sets")
+def list_holdouts(model_service = Depends(get_model_service)):
+    return {"holdouts": model_service.list_holdouts()}
+
+@router.post("/", status_code=201, summary="Register a holdout set (CSV with all feature columns and 'label')")
+def register_holdout(
+    name: str = Form(..., description="Holdout name (letters, digits, '_', '-', '.')"),
+    description: Optional[str] = Form(None),
+    file: UploadFile = File(..., description="CSV file with feature columns and a 'label' column"),
+    model_service = Depends(get_model_service),
+):
+    check_upload_type(file, extra_types=("text/plain",))
+    try:
+        df = pd.read_csv(open_upload(file), sep=None, engine="python")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to parse CSV: {e}")
+    if df.empty:
+        raise HTTPException(status_code=400, detail="Holdout is empty.")
+    df.columns = df.columns.str.strip()
+    try:
+        return model_service.register_holdout(name, df, description=description)
+    except FileExistsError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/{name}", summary="Remove a holdout set (cached results are kept for re-registration)")
+def delete_holdout(name: str, model_service = Depends(get_model_service)):
+    try:
+        model_service.delete_holdout(name)
+        return {"deleted": name}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/comparison", summary="Every model version scored on every holdout, from cached results")
+def holdout_comparison(
+    metric: Optional[str] = Query(None, description="Only this metric per cell (accuracy, precision, recall, f1, macro_f1)"),
+    model_service = Depends(get_model_service),
+):
+    try:
+        return model_service.holdout_comparison(metric)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/evaluate", summary="Score versions and holdouts that have no cached result yet")
+def evaluate_holdouts(model_service = Depends(get_model_service)):
+    model_service.evaluate_holdouts()
+    return JSONResponse(status_code=202, content={"status": "scheduled"})
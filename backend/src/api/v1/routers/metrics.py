@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+from api.dependencies import get_memory_monitor, get_scheduler
+
+router = APIRouter()
+
+@router.get("/scheduler", summary="Per-lane queue depth, concurrency and wait times")
+def scheduler_metrics(scheduler = Depends(get_scheduler)):
+    return scheduler.metrics()
+
+@router.get("/memory", summary="Sampled per-endpoint allocation high-water marks by stage, and input budget outcomes")
+def memory_metrics(monitor = Depends(get_memory_monitor)):
+    return monitor.metrics()
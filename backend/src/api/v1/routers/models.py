@@ -1,8 +1,10 @@
 from __future__ import annotations
 import os
-from typing import List
-from fastapi import APIRouter, HTTPException, Depends
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
 
+from api.conditional import not_modified
 from api.dependencies import get_model_service
 
 router = APIRouter()
@@ -13,7 +15,10 @@ def list_models(model_service = Depends(get_model_service)):
     return {"models": models}
 
 @router.get("/all", summary="List all base models and trained models (including versions)")
-def list_all_models(model_service = Depends(get_model_service)):
+def list_all_models(request: Request, response: Response, model_service = Depends(get_model_service)):
+    cached = not_modified(request, response, *model_service.catalog_validators())
+    if cached is not None:
+        return cached
     list_base_models = model_service.get_base_models()
     models = model_service.get_models()
     all_models = {}
@@ -28,14 +33,146 @@ def list_base_models(model_service = Depends(get_model_service)):
     return {"base_models": models}
 
 @router.get("/{model_name}/versions", summary="List versions for a model")
-def list_model_versions(model_name: str, model_service = Depends(get_model_service)):
-    models = set(model_service.get_models())
-    if model_name not in models:
+def list_model_versions(model_name: str, request: Request, response: Response, model_service = Depends(get_model_service)):
+    # Existence first: an unknown name must not get a 304 for the catalog's current ETag
+    if not model_service.has_model(model_name):
         raise HTTPException(status_code=404, detail=f"Model '{model_name}' not found.")
+    cached = not_modified(request, response, *model_service.catalog_validators())
+    if cached is not None:
+        return cached
     versions: List[str] = model_service.list_versions(model_name)
     return {
         "model": model_name,
         "parent": model_service.get_parent_model(model_name),
         "versions": versions,
         "latest": versions[-1] if versions else None,
-    }
\ No newline at end of file
+        "tiers": model_service.version_tiers(model_name),
+    }
+
+@router.post("/gc", summary="Compress (or drop) cold model versions")
+def run_retention(
+    dry_run: bool = Query(True, description="Only report what would be done"),
+    keep_hot: Optional[int] = Query(None, ge=0, description="Newest versions kept uncompressed per family"),
+    max_versions: Optional[int] = Query(None, ge=1, description="Delete versions older than the newest N"),
+    model_service = Depends(get_model_service),
+):
+    try:
+        return model_service.run_retention(dry_run=dry_run, keep_hot=keep_hot, max_versions=max_versions)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{model_name}/importance", summary="Global feature importance and SHAP summary for a model version")
+def get_model_importance(
+    model_name: str,
+    version: Optional[str] = Query(None, description="Model version (omit for a base model)"),
+    model_service = Depends(get_model_service),
+):
+    if version is None:
+        if not model_service.registry.get_model_info(model_name):
+            raise HTTPException(status_code=404, detail=f"Base model '{model_name}' not found.")
+    elif version not in model_service.list_versions(model_name):
+        raise HTTPException(status_code=404, detail=f"Model '{model_name}' version '{version}' not found.")
+
+    summary = model_service.get_shap_summary(model_name, version)
+    if summary is None:
+        failure = model_service.background_failure("shap_summary", model_name, version)
+        if failure is not None:
+            raise HTTPException(
+                status_code=500,
+                detail=f"SHAP summary failed: {failure['error']} (retried in {int(failure['retry_after_s'])} s)",
+            )
+        # Not computed yet (older version or base model): compute in the background
+        model_service.schedule_shap_summary(model_name, version)
+        return JSONResponse(status_code=202, content={"model": model_name, "version": version, "status": "pending"})
+    return summary
+
+
+@router.get("/{model_name}/drift", summary="Input drift (PSI/KS) of scored traffic against the training data")
+def get_model_drift(
+    model_name: str,
+    version: Optional[str] = Query(None, description="Model version (omit for a base model)"),
+    model_service = Depends(get_model_service),
+):
+    if version is None:
+        if not model_service.registry.get_model_info(model_name):
+            raise HTTPException(status_code=404, detail=f"Base model '{model_name}' not found.")
+    elif version not in model_service.list_versions(model_name):
+        raise HTTPException(status_code=404, detail=f"Model '{model_name}' version '{version}' not found.")
+    return model_service.get_drift(model_name, version)
+
+
+@router.get("/{model_name}/shadow", summary="Shadow version and its agreement/latency against live traffic")
+def get_model_shadow(model_name: str, model_service = Depends(get_model_service)):
+    return model_service.get_shadow(model_name)
+
+@router.put("/{model_name}/shadow", summary="Shadow-score a sampled share of this family's traffic with another version")
+def set_model_shadow(
+    model_name: str,
+    version: str = Query(..., description="Shadow version"),
+    shadow_model: Optional[str] = Query(None, description="Family of the shadow version (defaults to model_name)"),
+    sample_rate: float = Query(0.1, gt=0.0, le=1.0, description="Fraction of requests scored by the shadow"),
+    model_service = Depends(get_model_service),
+):
+    try:
+        return model_service.set_shadow(model_name, version, shadow_model=shadow_model, sample_rate=sample_rate)
+    except RuntimeError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.delete("/{model_name}/shadow", summary="Stop shadow scoring for a model family")
+def clear_model_shadow(model_name: str, model_service = Depends(get_model_service)):
+    model_service.clear_shadow(model_name)
+    return {"model": model_name, "shadow": None}
+
+
+@router.get("/{model_name}/serving", summary="Version currently served for a model family")
+def get_model_serving(model_name: str, model_service = Depends(get_model_service)):
+    return model_service.get_serving(model_name)
+
+@router.post("/{model_name}/promote", summary="Promote a version to serve requests that do not pin one")
+def promote_model_version(
+    model_name: str,
+    version: str = Query(..., description="Version to promote"),
+    model_service = Depends(get_model_service),
+):
+    try:
+        return model_service.promote(model_name, version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{model_name}/rollback", summary="Serve the previously promoted version again")
+def rollback_model_version(model_name: str, model_service = Depends(get_model_service)):
+    try:
+        return model_service.rollback(model_name)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{model_name}/versions/{version}/lineage", summary="Datasets a model version was trained on")
+def get_version_lineage(model_name: str, version: str, model_service = Depends(get_model_service)):
+    lineage = model_service.get_lineage(model_name, version)
+    if lineage is None:
+        raise HTTPException(status_code=404, detail=f"No lineage recorded for '{model_name}' version '{version}'.")
+    return lineage
+
+
+@router.get("/{model_name}/versions/{version}/tiers", summary="Boosting rounds, latency and holdout accuracy of the full and fast tiers")
+def get_version_tiers(model_name: str, version: str, model_service = Depends(get_model_service)):
+    if version not in model_service.list_versions(model_name):
+        raise HTTPException(status_code=404, detail=f"Model '{model_name}' version '{version}' not found.")
+
+    tiers = model_service.get_lite(model_name, version)
+    if tiers is None:
+        failure = model_service.background_failure("lite", model_name, version)
+        if failure is not None:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Fast tier build failed: {failure['error']} (retried in {int(failure['retry_after_s'])} s)",
+            )
+        # Not sized yet (older version, or training finished moments ago): build it in the background
+        model_service.schedule_lite(model_name, version)
+        return JSONResponse(status_code=202, content={"model": model_name, "version": version, "status": "pending"})
+    return tiers
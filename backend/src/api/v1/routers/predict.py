@@ -1,94 +1,505 @@
+import json
+import time
+from typing import Iterator, Literal
 import pandas as pd
 import numpy as np
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, Request, UploadFile
 from fastapi.encoders import jsonable_encoder
-from api.v1.schemas.predict import PredictResponse, SinglePredictBody, SinglePredictResponse
-from api.dependencies import get_model_service
-from utils.settings import COLUMNS, LABEL_MAP, _to_label
+from api.v1.schemas.predict import CompareResponse, PredictResponse, RoutedPredictResponse, SinglePredictBody, SinglePredictResponse
+from api.dependencies import get_memory_monitor, get_model_service, run_in_lane
+from api.uploads import (
+    ARROW_STREAM_TYPES,
+    BATCH_JSON_TYPES,
+    InputBudget,
+    check_upload_size,
+    check_upload_type,
+    open_upload,
+    read_body,
+)
+from utils.settings import COLUMNS, LABEL_MAP, PREDICT_CHUNK_ROWS, PREDICT_MAX_BYTES, PREDICT_MAX_JSON_BYTES, SHAP_EXPLAINER, _to_label
 
 router = APIRouter()
 
+MAX_COMPARE_MODELS = 10
+
 @router.post("/", response_model=PredictResponse)
 async def predict(
     file: UploadFile = File(..., description="CSV file with feature rows"),
     model: str = Query(..., description="Model name"),
     version: str | None = Query(None, description="Model version (optional)"),
     evaluate: bool = Query(False, description="Whether to include evaluation metrics (requires 'label' column)"),
+    tier: Literal["full", "fast"] = Query("full", description="'fast' scores with the version's truncated low-latency variant (see /models/{name}/versions/{version}/tiers)"),
+    background_tasks: BackgroundTasks = None,
     model_service = Depends(get_model_service),
+    monitor = Depends(get_memory_monitor),
 ):
-    if file.content_type not in ("text/csv", "application/vnd.ms-excel", "application/csv"):
-        raise HTTPException(status_code=415, detail="Unsupported media type. Upload a CSV file.")
-    try:
-        # Read all bytes (or switch to chunked if files are huge)
-        file.file.seek(0)
-        df = pd.read_csv(file.file, sep=None, engine="python")
-        df.fillna(np.nan, inplace=True)
-
-        if df.empty:
-            raise HTTPException(status_code=400, detail="CSV is empty or has no data rows.")
-        
+    check_upload_type(file)
+    check_upload_size(file, PREDICT_MAX_BYTES)
+    tier = _check_tier(model_service, model, version, tier)
+    return await run_in_lane("bulk", _predict_csv, file, model, version, evaluate, background_tasks, model_service, monitor, tier)
+
+def _check_tier(model_service, model: str, version: str | None, tier: str) -> str:
+    # Base models have no stored holdout split to size a fast tier on
+    if tier == "fast" and version is None and model_service.serving_version(model) is None:
+        raise HTTPException(status_code=400, detail=f"Model '{model}' serves its base model; the fast tier needs a trained version.")
+    # A fast tier still being built is served (and reported) as full
+    return model_service.serving_tier(model, version, tier)
+
+def _csv_chunks(file: UploadFile) -> Iterator[pd.DataFrame]:
+    # Stream through (optional) decompression straight into the parser, a chunk of rows at a time
+    reader = pd.read_csv(open_upload(file, limit=PREDICT_MAX_BYTES), sep=None, engine="python", chunksize=PREDICT_CHUNK_ROWS)
+    for chunk in reader:
+        chunk.fillna(np.nan, inplace=True)
+        yield chunk
+
+def _read_csv_features(file: UploadFile, evaluate: bool, budget: InputBudget, probe) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # For callers that need the whole frame: over the memory budget is refused while parsing
+    chunks = []
+    for chunk in _csv_chunks(file):
+        budget.add(chunk)
+        if budget.over_memory:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Input is estimated at over {budget.estimated_bytes} bytes in memory; the budget is {budget.max_memory}.",
+            )
+        _check_columns(chunk, evaluate)
+        chunks.append(chunk)
+    probe.stage("parse")
+
+    if not budget.rows:
+        raise HTTPException(status_code=400, detail="CSV is empty or has no data rows.")
+    df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+    return _validate_features(df, evaluate)
+
+def _check_columns(df: pd.DataFrame, evaluate: bool) -> None:
+    if evaluate:
+        if "label" not in df.columns:
+            raise HTTPException(status_code=400, detail="Evaluation requested but 'label' column is missing.")
+    
+    # Fail on duplicate columns
+    if df.columns.duplicated().any():
+        dups = df.columns[df.columns.duplicated()].tolist()
+        raise HTTPException(status_code=400, detail=f"Duplicate columns found: {dups}")
+    
+    # Validate required and unexpected columns
+    required = COLUMNS
+    missing = [c for c in required if c not in df.columns]
+    unexpected = [c for c in df.columns if c not in required]
+    # Allow label column only for evaluation
+    if "label" in unexpected:
+        unexpected.remove("label")
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing required feature columns: {missing}")
+    if unexpected:
+        raise HTTPException(status_code=400, detail=f"Unexpected columns present: {unexpected}. Allowed columns: {required}")
+
+def _validate_features(df: pd.DataFrame, evaluate: bool) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # Shared by every batch input format (CSV, columnar JSON, Arrow)
+    if df.empty:
+        raise HTTPException(status_code=400, detail="Input has no data rows.")
+    _check_columns(df, evaluate)
+
+    # Use all required features; exclude label (if present) for prediction. A frame that is
+    # exactly the features is used as is rather than copied.
+    if list(df.columns) == COLUMNS:
+        return df, df
+    return df, df[COLUMNS]
+
+def _evaluation_report(labels: pd.Series, preds: list[str]) -> dict:
+    from sklearn.metrics import classification_report
+
+    # Normalize ground-truth labels to the same string names
+    label_series = labels.copy()
+    num = pd.to_numeric(label_series, errors="coerce")
+    is_num = num.notna()
+    label_series = label_series.astype(str)
+    # Map numeric gt -> names; fallback to numeric string if unknown
+    label_series.loc[is_num] = num[is_num].astype(int).map(LABEL_MAP).fillna(
+        num[is_num].astype(int).astype(str)
+    )
+    true_labels = label_series.tolist()
+
+    label_order = list(LABEL_MAP.values())
+    return classification_report(
+        true_labels, preds, labels=label_order, output_dict=True, zero_division=0
+    )
+
+def _predict_csv(file: UploadFile, model: str, version: str | None, evaluate: bool,
+                 background_tasks: BackgroundTasks, model_service, monitor, tier: str = "full") -> PredictResponse:
+    with monitor.track("predict") as probe:
+        try:
+            return _predict_chunks(_csv_chunks(file), "predict", model, version, evaluate, background_tasks,
+                                   model_service, monitor, probe, tier=tier, empty_detail="CSV is empty or has no data rows.")
+        except HTTPException as e:
+            if e.status_code == 413:
+                monitor.count("predict", "rejected")
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+def _predict_chunks(chunks: Iterator[pd.DataFrame], endpoint: str, model: str, version: str | None, evaluate: bool,
+                    background_tasks: BackgroundTasks, model_service, monitor, probe, tier: str = "full",
+                    empty_detail: str = "Input has no data rows.") -> PredictResponse:
+    """Scores the input whole while its estimated size fits the memory budget.
+
+    Once parsing shows it will not, the request is downgraded to streaming: the chunks read so
+    far and every later one are scored as they come and dropped, keeping only the labels.
+    """
+    budget = InputBudget()
+    held: list[pd.DataFrame] = []
+    preds: list[str] = []
+    labels: list[pd.Series] = []
+    streaming = False
+
+    def score(chunk: pd.DataFrame) -> None:
+        _, features_df = _validate_features(chunk, evaluate)
+        start = time.perf_counter()
+        preds_num = model_service.predict(features_df, model_name=model, version=version, tier=tier)
+        primary_ms = (time.perf_counter() - start) * 1000.0
+        if len(preds_num) != len(chunk):
+            raise HTTPException(status_code=500, detail="Prediction length mismatch.")
+        model_service.record_drift(features_df, model_name=model, version=version)
+        if not preds:
+            # The shadow model sees the first chunk only, so it does not hold the whole input
+            background_tasks.add_task(model_service.observe_shadow, features_df, preds_num, model_name=model, version=version,
+                                      primary_ms=primary_ms)
+        probe.stage("predict")
+        preds.extend(_to_label(v) for v in preds_num)
         if evaluate:
-            if "label" not in df.columns:
-                raise HTTPException(status_code=400, detail="Evaluation requested but 'label' column is missing.")
-        
-        # Fail on duplicate columns
-        if df.columns.duplicated().any():
-            dups = df.columns[df.columns.duplicated()].tolist()
-            raise HTTPException(status_code=400, detail=f"Duplicate columns found: {dups}")
-        
-        # Validate required and unexpected columns
-        required = COLUMNS
-        missing = [c for c in required if c not in df.columns]
-        unexpected = [c for c in df.columns if c not in required]
-        # Allow label column only for evaluation
-        if "label" in unexpected:
-            unexpected.remove("label")
-        if missing:
-            raise HTTPException(status_code=400, detail=f"Missing required feature columns: {missing}")
-        if unexpected:
-            raise HTTPException(status_code=400, detail=f"Unexpected columns present: {unexpected}. Allowed columns: {required}")
+            labels.append(chunk["label"])
+        probe.stage("postprocess")
+
+    for chunk in chunks:
+        budget.add(chunk)
+        _check_columns(chunk, evaluate)
+        probe.stage("parse")
+        if not streaming and budget.over_memory:
+            streaming = True
+            monitor.count(endpoint, "streamed")
+            while held:
+                score(held.pop(0))
+        if streaming:
+            score(chunk)
+        else:
+            held.append(chunk)
 
-        # Use all required features; exclude label (if present) for prediction
-        features_df = df[required]
-        preds_num = model_service.predict(features_df, model_name=model, version=version)
+    if not budget.rows:
+        raise HTTPException(status_code=400, detail=empty_detail)
+    if not streaming:
+        df = held[0] if len(held) == 1 else pd.concat(held, ignore_index=True)
+        held.clear()
+        df, features_df = _validate_features(df, evaluate)
+        return _predict_frame(df, features_df, model, version, evaluate, background_tasks, model_service, probe, tier)
+
+    report = _evaluation_report(pd.concat(labels, ignore_index=True), preds) if evaluate else None
+    probe.stage("postprocess")
+    return PredictResponse(prediction=preds, rows=len(preds), evaluation=report, tier=tier)
+
+def _predict_frame(df: pd.DataFrame, features_df: pd.DataFrame, model: str, version: str | None, evaluate: bool,
+                   background_tasks: BackgroundTasks, model_service, probe, tier: str = "full") -> PredictResponse:
+    try:
+        start = time.perf_counter()
+        preds_num = model_service.predict(features_df, model_name=model, version=version, tier=tier)
+        primary_ms = (time.perf_counter() - start) * 1000.0
         if len(preds_num) != len(df):
             raise HTTPException(status_code=500, detail="Prediction length mismatch.")
+        model_service.record_drift(features_df, model_name=model, version=version)
+        # Shadow scoring runs after the response has been sent; the primary is timed here, not rescored
+        background_tasks.add_task(model_service.observe_shadow, features_df, preds_num, model_name=model, version=version,
+                                  primary_ms=primary_ms)
+        probe.stage("predict")
 
         preds = [_to_label(v) for v in preds_num]
 
         if evaluate:
-            from sklearn.metrics import classification_report
-
-            # Normalize ground-truth labels to the same string names
-            label_series = df["label"].copy()
-            num = pd.to_numeric(label_series, errors="coerce")
-            is_num = num.notna()
-            label_series = label_series.astype(str)
-            # Map numeric gt -> names; fallback to numeric string if unknown
-            label_series.loc[is_num] = num[is_num].astype(int).map(LABEL_MAP).fillna(
-                num[is_num].astype(int).astype(str)
-            )
-            true_labels = label_series.tolist()
+            report = _evaluation_report(df["label"], preds)
+            probe.stage("postprocess")
+            return PredictResponse(prediction=preds, rows=len(preds), evaluation=report, tier=tier)
 
-            label_order = list(LABEL_MAP.values())
-            report = classification_report(
-                true_labels, preds, labels=label_order, output_dict=True, zero_division=0
-            )
-            return PredictResponse(prediction=preds, rows=len(preds), evaluation=report)
-
-        return PredictResponse(prediction=preds, rows=len(preds))
+        probe.stage("postprocess")
+        return PredictResponse(prediction=preds, rows=len(preds), tier=tier)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/batch/", response_model=PredictResponse)
+async def predict_batch(
+    request: Request,
+    model: str = Query(..., description="Model name"),
+    version: str | None = Query(None, description="Model version (optional)"),
+    evaluate: bool = Query(False, description="Whether to include evaluation metrics (requires a 'label' column)"),
+    tier: Literal["full", "fast"] = Query("full", description="'fast' scores with the version's truncated low-latency variant (see /models/{name}/versions/{version}/tiers)"),
+    background_tasks: BackgroundTasks = None,
+    model_service = Depends(get_model_service),
+    monitor = Depends(get_memory_monitor),
+):
+    """Batch prediction from numeric columns instead of CSV.
+
+    - `application/json`: `{"data": {"<feature>": [v0, v1, ...], ..., "label": [...]}}`, one array per
+      column in COLUMNS (null for missing values), all of the same length. Capped at PREDICT_MAX_JSON_BYTES;
+      send bigger inputs as Arrow or CSV.
+    - `application/vnd.apache.arrow.stream`: an Arrow IPC stream with those columns (needs pyarrow on the server).
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in BATCH_JSON_TYPES + ARROW_STREAM_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported media type. Use one of: {list(BATCH_JSON_TYPES + ARROW_STREAM_TYPES)}.")
+    tier = _check_tier(model_service, model, version, tier)
+    # JSON is refused on its raw size, before it is buffered or parsed; Arrow converts a chunk at a time
+    limit = PREDICT_MAX_JSON_BYTES if content_type in BATCH_JSON_TYPES else PREDICT_MAX_BYTES
+    try:
+        body = await read_body(request, limit=limit)
+    except HTTPException:
+        monitor.count("predict_batch", "rejected")
+        raise
+    return await run_in_lane("bulk", _predict_batch, body, content_type, model, version, evaluate, background_tasks, model_service, monitor, tier)
+
+def _predict_batch(body: bytes, content_type: str, model: str, version: str | None, evaluate: bool,
+                   background_tasks: BackgroundTasks, model_service, monitor, tier: str = "full") -> PredictResponse:
+    with monitor.track("predict_batch") as probe:
+        try:
+            chunks = _chunks_from_arrow(body) if content_type in ARROW_STREAM_TYPES else _chunks_from_columns(body)
+            return _predict_chunks(chunks, "predict_batch", model, version, evaluate, background_tasks, model_service, monitor, probe, tier=tier)
+        except HTTPException as e:
+            if e.status_code == 413:
+                monitor.count("predict_batch", "rejected")
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+def _chunks_from_columns(body: bytes) -> Iterator[pd.DataFrame]:
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    data = payload.get("data") if isinstance(payload, dict) else None
+    if not isinstance(data, dict) or not data:
+        raise HTTPException(status_code=400, detail='Body must be {"data": {"<column>": [values, ...], ...}}.')
+    if not all(isinstance(values, list) for values in data.values()):
+        raise HTTPException(status_code=400, detail="Every column must be a JSON array.")
+    lengths = {len(values) for values in data.values()}
+    if len(lengths) != 1:
+        raise HTTPException(status_code=400, detail="All columns must have the same length.")
+    rows = lengths.pop()
+    # The row count is known before any column is converted
+    InputBudget().expect_rows(rows)
+
+    for start in range(0, rows, PREDICT_CHUNK_ROWS):
+        columns = {}
+        for name, values in data.items():
+            values = values[start:start + PREDICT_CHUNK_ROWS]
+            if name == "label":
+                columns[name] = pd.Series(values)
+                continue
+            try:
+                # Straight to float64; null becomes NaN
+                columns[name] = np.asarray(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail=f"Column '{name}' must contain only numbers or null.")
+        yield pd.DataFrame(columns)
+
+def _chunks_from_arrow(body: bytes) -> Iterator[pd.DataFrame]:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(status_code=415, detail="Arrow input is not supported on this server (pyarrow is not installed).")
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except pa.ArrowException as e:
+        raise HTTPException(status_code=400, detail=f"Invalid Arrow IPC stream: {e}")
+    if len(set(table.column_names)) != len(table.column_names):
+        dups = sorted({c for c in table.column_names if table.column_names.count(c) > 1})
+        raise HTTPException(status_code=400, detail=f"Duplicate columns found: {dups}")
+    InputBudget().expect_rows(table.num_rows)
+    # Slices share the table's buffers; only one chunk at a time is converted to pandas
+    for start in range(0, table.num_rows, PREDICT_CHUNK_ROWS):
+        yield table.slice(start, PREDICT_CHUNK_ROWS).to_pandas()
+
+@router.post("/compare/", response_model=CompareResponse)
+async def predict_compare(
+    file: UploadFile = File(..., description="CSV file with feature rows (optional 'label' column for evaluation)"),
+    models: list[str] = Query(..., description="Models to compare, as 'name' or 'name@version'"),
+    model_service = Depends(get_model_service),
+    monitor = Depends(get_memory_monitor),
+):
+    check_upload_type(file)
+    check_upload_size(file, PREDICT_MAX_BYTES)
+    if not 2 <= len(models) <= MAX_COMPARE_MODELS:
+        raise HTTPException(status_code=400, detail=f"Provide between 2 and {MAX_COMPARE_MODELS} models to compare.")
+    # 'name' and 'name@' are the same target
+    targets = [_parse_target(spec) for spec in models]
+    if len(set(targets)) != len(targets):
+        raise HTTPException(status_code=400, detail="Duplicate models in comparison.")
+    return await run_in_lane("bulk", _predict_compare, file, models, targets, model_service, monitor)
+
+def _parse_target(spec: str) -> tuple[str, str | None]:
+    # 'name' or 'name@version'
+    name, _, version = spec.partition("@")
+    return name, version or None
+
+def _target_key(target: tuple[str, str | None]) -> str:
+    name, version = target
+    return f"{name}@{version}" if version else name
+
+def _predict_compare(file: UploadFile, keys: list[str], targets: list[tuple[str, str | None]],
+                     model_service, monitor) -> CompareResponse:
+    with monitor.track("predict_compare") as probe:
+        try:
+            return _compare(file, keys, targets, model_service, probe)
+        except HTTPException as e:
+            if e.status_code == 413:
+                monitor.count("predict_compare", "rejected")
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+def _compare(file: UploadFile, keys: list[str], targets: list[tuple[str, str | None]],
+             model_service, probe) -> CompareResponse:
+    # Every model's predictions and labels are held at once, so the input must fit the budget whole
+    budget = InputBudget(extra_per_row=24 * len(targets))
+    # Parse and validate once; every model scores the same feature matrix
+    df, features_df = _read_csv_features(file, evaluate=False, budget=budget, probe=probe)
+    preds_by_model = model_service.predict_many(features_df, targets)
+    probe.stage("predict")
+
+    labels = {key: [_to_label(v) for v in preds] for key, preds in zip(keys, preds_by_model)}
+    codes = np.stack([pd.Categorical(labels[key], categories=list(LABEL_MAP.values())).codes for key in keys])
+    agree = (codes[:, np.newaxis, :] == codes[np.newaxis, :, :])
+    agreement = agree.mean(axis=2)
+    disagreement = (~agree).sum(axis=2)
+    unanimous = (codes == codes[0]).all(axis=0)
+
+    evaluation = None
+    if "label" in df.columns:
+        evaluation = {key: _evaluation_report(df["label"], labels[key]) for key in keys}
+    probe.stage("postprocess")
+
+    return CompareResponse(
+        rows=len(df),
+        models=keys,
+        predictions=labels,
+        agreement=agreement.tolist(),
+        disagreement=disagreement.tolist(),
+        unanimous_rate=float(unanimous.mean()),
+        evaluation=evaluation,
+    )
+
+@router.post("/routed/", response_model=RoutedPredictResponse)
+async def predict_routed(
+    file: UploadFile = File(..., description="CSV file with feature rows and a routing column (optional 'label' column for evaluation)"),
+    route_column: str = Query("mission", description="Column whose value picks each row's model"),
+    routes: list[str] | None = Query(None, description="Rules 'value=name' or 'value=name@version'; added to (and overriding) the registry's kepler/k2/tess slots"),
+    fallback: str | None = Query(None, description="Model for rows whose value has no route, as 'name' or 'name@version'"),
+    evaluate: bool = Query(False, description="Whether to include evaluation metrics (requires 'label' column)"),
+    background_tasks: BackgroundTasks = None,
+    model_service = Depends(get_model_service),
+    monitor = Depends(get_memory_monitor),
+):
+    """Bulk prediction for uploads that mix missions: each row is scored by the model its routing
+    value maps to (matched case-insensitively). Predictions come back in the upload's row order."""
+    check_upload_type(file)
+    check_upload_size(file, PREDICT_MAX_BYTES)
+    rules = dict(model_service.mission_routes())
+    for rule in routes or []:
+        value, sep, spec = rule.partition("=")
+        if not sep or not value.strip() or not spec.strip():
+            raise HTTPException(status_code=400, detail=f"Invalid routing rule '{rule}'. Use 'value=name' or 'value=name@version'.")
+        rules[value.strip().lower()] = _parse_target(spec.strip())
+    fallback_target = _parse_target(fallback) if fallback else None
+    if not rules and fallback_target is None:
+        raise HTTPException(status_code=400, detail="No routes: registry.json has no kepler/k2/tess models. Pass routes or a fallback model.")
+    return await run_in_lane("bulk", _predict_routed, file, route_column, rules, fallback_target, evaluate,
+                             background_tasks, model_service, monitor)
+
+def _predict_routed(file: UploadFile, route_column: str, rules: dict[str, tuple[str, str | None]],
+                    fallback: tuple[str, str | None] | None, evaluate: bool,
+                    background_tasks: BackgroundTasks, model_service, monitor) -> RoutedPredictResponse:
+    with monitor.track("predict_routed") as probe:
+        try:
+            return _route(file, route_column, rules, fallback, evaluate, background_tasks, model_service, probe)
+        except HTTPException as e:
+            if e.status_code == 413:
+                monitor.count("predict_routed", "rejected")
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+def _route(file: UploadFile, route_column: str, rules: dict[str, tuple[str, str | None]],
+           fallback: tuple[str, str | None] | None, evaluate: bool,
+           background_tasks: BackgroundTasks, model_service, probe) -> RoutedPredictResponse:
+    # Values routed to the same model share one group; chunks are scored as they are parsed
+    targets = sorted(set(rules.values()) | ({fallback} if fallback else set()), key=_target_key)
+    index = {target: i for i, target in enumerate(targets)}
+    route_index = {value: index[target] for value, target in rules.items()}
+    budget = InputBudget()
+    preds: list[str] = []
+    labels: list[pd.Series] = []
+    counts = np.zeros(len(targets), dtype=np.int64)
+
+    for chunk in _csv_chunks(file):
+        if route_column not in chunk.columns:
+            raise HTTPException(status_code=400, detail=f"Routing column '{route_column}' is missing.")
+        values = chunk.pop(route_column).astype("string").str.strip().str.lower()
+        budget.add(chunk)
+        _, features_df = _validate_features(chunk, evaluate)
+        assignment = values.map(route_index)
+        unrouted = assignment.isna()
+        if unrouted.any():
+            if fallback is None:
+                missing = sorted(set(values[unrouted].fillna("")))[:10]
+                raise HTTPException(status_code=400, detail=f"No route for {route_column} values {missing}. Add routes or a fallback model.")
+            assignment = assignment.fillna(index[fallback])
+        assignment = assignment.to_numpy(dtype=np.intp)
+        probe.stage("parse")
+
+        preds_num = model_service.predict_routed(features_df, assignment, targets)
+        if len(preds_num) != len(chunk):
+            raise HTTPException(status_code=500, detail="Prediction length mismatch.")
+        preds_arr = np.asarray(preds_num)
+        for i, (name, version) in enumerate(targets):
+            rows = assignment == i
+            if not rows.any():
+                continue
+            group = features_df[rows]
+            model_service.record_drift(group, model_name=name, version=version)
+            if not counts[i]:
+                # Each shadow model sees its family's first group only
+                background_tasks.add_task(model_service.observe_shadow, group, preds_arr[rows].tolist(), model_name=name, version=version)
+            counts[i] += int(rows.sum())
+        probe.stage("predict")
+        preds.extend(_to_label(v) for v in preds_num)
+        if evaluate:
+            labels.append(chunk["label"])
+        probe.stage("postprocess")
+
+    if not budget.rows:
+        raise HTTPException(status_code=400, detail="CSV is empty or has no data rows.")
+    report = _evaluation_report(pd.concat(labels, ignore_index=True), preds) if evaluate else None
+    probe.stage("postprocess")
+    return RoutedPredictResponse(
+        prediction=preds,
+        rows=len(preds),
+        evaluation=report,
+        routes={_target_key(target): int(n) for target, n in zip(targets, counts) if n},
+    )
+
 @router.post("/single/", response_model=SinglePredictResponse)
 async def predict_single(
     payload: SinglePredictBody,
     model: str = Query(..., description="Model name"),
     version: str | None = Query(None, description="Model version (optional)"),
+    explainer: Literal["shap", "native", "approx"] | None = Query(None, description="SHAP backend (defaults to server configuration)"),
+    tier: Literal["full", "fast"] = Query("full", description="'fast' scores with the version's truncated low-latency variant (see /models/{name}/versions/{version}/tiers)"),
+    background_tasks: BackgroundTasks = None,
     model_service = Depends(get_model_service),
 ):
+    tier = _check_tier(model_service, model, version, tier)
+    # shap.TreeExplainer is orders of magnitude slower than the XGBoost backends: keep it out of the interactive lane
+    lane = "shap" if (explainer or SHAP_EXPLAINER) == "shap" else "interactive"
+    return await run_in_lane(lane, _predict_single, payload, model, version, explainer, background_tasks, model_service, tier)
+
+def _predict_single(payload: SinglePredictBody, model: str, version: str | None, explainer: str | None,
+                    background_tasks: BackgroundTasks, model_service, tier: str = "full") -> SinglePredictResponse:
     try:
         data = payload.data or {}
 
@@ -104,16 +515,20 @@ async def predict_single(
         row = {c: data.get(c, np.nan) for c in COLUMNS}
         features_df = pd.DataFrame([row], columns=COLUMNS)
 
-        preds_num = model_service.predict(features_df, model_name=model, version=version)
-        shap_values = model_service.shap(features_df, model_name=model, version=version)
-        if len(preds_num) != 1:
-            raise HTTPException(status_code=500, detail="Prediction length mismatch.")
+        result = model_service.predict_explain(features_df, model_name=model, version=version, explainer=explainer, tier=tier)
+        model_service.record_drift(features_df, model_name=model, version=version)
+        background_tasks.add_task(model_service.observe_shadow, features_df, [result["prediction"]], model_name=model, version=version)
 
-        pred = _to_label(preds_num[0])
+        pred = _to_label(result["prediction"])
+        probabilities = None
+        if result.get("probabilities") is not None:
+            probabilities = {_to_label(i): float(p) for i, p in enumerate(result["probabilities"])}
 
         return SinglePredictResponse(
             prediction=pred,
-            shap_values=jsonable_encoder(shap_values)
+            probabilities=probabilities,
+            shap_values=jsonable_encoder(result["shap"]),
+            tier=tier,
         )
     except HTTPException:
         raise
@@ -2,18 +2,21 @@ from __future__ import annotations
 from typing import Literal, Optional
 from pathlib import Path
 import json
+import uuid
 import pandas as pd
 
 from fastapi import APIRouter, HTTPException, Depends, File, Form, UploadFile
-from api.dependencies import get_model_service
+from api.dependencies import get_model_service, run_in_lane
+from api.uploads import check_upload_type, open_upload
 from api.v1.schemas.retrain import RetrainResponse
 
 # We locate datasets/ next to models/ using MODELS_DIR
-from utils.settings import MODELS_DIR
+from utils.settings import COLUMNS, MODELS_DIR, TRAIN_MEMORY_BUDGET_BYTES
+from ml.preprocessing import compose_datasets
 
 router = APIRouter()
 
-def _load_dataset_from_store(use_dataset: str, dataset_model: Optional[str], dataset_version: Optional[str]) -> pd.DataFrame:
+def _dataset_path(use_dataset: str, dataset_model: Optional[str], dataset_version: Optional[str]) -> Path:
     datasets_dir = Path(MODELS_DIR).parent / "datasets"
     candidates: list[Path] = []
     if use_dataset == "base_model":
@@ -34,11 +37,61 @@ def _load_dataset_from_store(use_dataset: str, dataset_model: Optional[str], dat
         ]
     else:
         raise HTTPException(status_code=400, detail=f"Unsupported use_dataset '{use_dataset}'.")
+    # Cold-tier versions keep their dataset gzip-compressed
+    candidates += [p.with_name(p.name + ".gz") for p in candidates]
     for p in candidates:
         if p.exists():
-            return pd.read_csv(p, sep=None, engine="python")
+            return p
     raise HTTPException(status_code=404, detail=f"Dataset not found. Searched: {', '.join(str(p) for p in candidates)}")
 
+def _load_dataset_from_store(use_dataset: str, dataset_model: Optional[str], dataset_version: Optional[str]) -> pd.DataFrame:
+    return pd.read_csv(_dataset_path(use_dataset, dataset_model, dataset_version), sep=None, engine="python")
+
+def _needs_out_of_core(path: Path) -> bool:
+    # A parsed frame takes at least as much memory as the CSV text; gzip'd datasets inflate ~4x
+    size = path.stat().st_size * (4 if path.suffix == ".gz" else 1)
+    return size > TRAIN_MEMORY_BUDGET_BYTES
+
+def _read_upload(file: UploadFile) -> pd.DataFrame:
+    try:
+        return pd.read_csv(open_upload(file), sep=None, engine="python")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to parse CSV: {e}")
+
+def _compose_from_sources(dataset_sources: str, file: UploadFile | None, dedup_key: Optional[str]) -> tuple[pd.DataFrame, list[dict]]:
+    try:
+        specs = json.loads(dataset_sources)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"dataset_sources must be a JSON list: {e}")
+    if not isinstance(specs, list) or not specs:
+        raise HTTPException(status_code=400, detail="dataset_sources must be a non-empty JSON list.")
+
+    sources = []
+    for spec in specs:
+        kind = spec.get("type") if isinstance(spec, dict) else None
+        if kind == "csv":
+            if not file:
+                raise HTTPException(status_code=400, detail="A CSV file is required for a 'csv' dataset source.")
+            check_upload_type(file, extra_types=("text/plain",))
+            sources.append(({"type": "csv", "filename": file.filename}, lambda: _read_upload(file)))
+        elif kind in ("base_model", "model_version"):
+            model, version = spec.get("model"), spec.get("version")
+            # Resolve paths up front so a bad source fails before anything is loaded
+            path = _dataset_path(kind, model, version)
+            sources.append((
+                {"type": kind, "model": model, "version": version, "path": str(path)},
+                lambda path=path: pd.read_csv(path, sep=None, engine="python"),
+            ))
+        else:
+            raise HTTPException(status_code=400, detail=f"Unsupported dataset source {spec!r}; type must be csv, base_model or model_version.")
+
+    try:
+        return compose_datasets(sources, COLUMNS + ["label"], dedup_key=dedup_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.post("/", response_model=RetrainResponse)
 async def retrain(
     # ACTION (target)
@@ -49,10 +102,15 @@ async def retrain(
     target_model: Optional[str] = Form(None, description="Target model family for new version (action='version')"),
     target_version: Optional[str] = Form(None, description="Source version to fork from (when fork_source_type='model_version')"),
     # DATASET (independent of action)
-    use_dataset: Literal["csv", "model_version", "base_model"] = Form(..., description="Where to load the dataset from"),
+    use_dataset: Literal["csv", "model_version", "base_model", "composed"] = Form(..., description="Where to load the dataset from"),
     dataset_model: Optional[str] = Form(None, description="When use_dataset in {model_version, base_model}: dataset source model"),
     dataset_version: Optional[str] = Form(None, description="When use_dataset='model_version': dataset source version"),
+    dataset_sources: Optional[str] = Form(None, description="When use_dataset='composed': JSON list of sources, e.g. "
+                                          "[{\"type\": \"base_model\", \"model\": \"default\"}, "
+                                          "{\"type\": \"model_version\", \"model\": \"m\", \"version\": \"v\"}, {\"type\": \"csv\"}]"),
+    dedup_key: Optional[str] = Form(None, description="When use_dataset='composed': key column to de-duplicate on (later sources win)"),
     hyperparams: Optional[str] = Form(None, description="JSON string of hyperparameters to pass to trainer"),
+    build_id: Optional[str] = Form(None, description="Client-chosen build id (UUID) to follow live progress at /builds/{build_id}/events"),
     file: UploadFile | None = File(None, description="CSV file (required when use_dataset='csv')"),
     model_service = Depends(get_model_service),
 ):
@@ -74,73 +132,122 @@ async def retrain(
         if not model_service.registry.get_model_info(target_model):
             raise HTTPException(status_code=400, detail=f"target_model '{target_model}' does not exist.")
 
+    if build_id is not None:
+        try:
+            build_id = str(uuid.UUID(build_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="build_id must be a UUID.")
+        if model_service.get_build(build_id) or any(b["build_id"] == build_id for b in model_service.progress.active()):
+            raise HTTPException(status_code=409, detail=f"Build '{build_id}' already exists.")
+
     # Load dataset
+    dataset_path = None
     if use_dataset == "csv":
         if not file:
             raise HTTPException(status_code=400, detail="CSV file is required when use_dataset='csv'.")
-        if file.content_type not in ("text/csv", "application/vnd.ms-excel", "application/csv", "text/plain"):
-            raise HTTPException(status_code=415, detail="Unsupported media type. Upload a CSV file.")
-        try:
-            file.file.seek(0)
-            df = pd.read_csv(file.file, sep=None, engine="python")
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to parse CSV: {e}")
+        check_upload_type(file, extra_types=("text/plain",))
+        df = _read_upload(file)
+        lineage = {"sources": [{"type": "csv", "filename": file.filename, "rows_in": len(df)}]}
+    elif use_dataset == "composed":
+        if not dataset_sources:
+            raise HTTPException(status_code=400, detail="dataset_sources is required when use_dataset='composed'.")
+        df, sources = _compose_from_sources(dataset_sources, file, dedup_key)
+        lineage = {"sources": sources, "dedup_key": dedup_key, "aligned_to": "COLUMNS+label"}
+    elif _needs_out_of_core(store_path := _dataset_path(use_dataset, dataset_model, dataset_version)):
+        # Too big to load: only the header is read here, the trainer streams the rest
+        df = None
+        dataset_path = str(store_path)
+        lineage = {"sources": [{"type": use_dataset, "model": dataset_model, "version": dataset_version, "path": dataset_path}],
+                   "out_of_core": True}
+        header = pd.read_csv(store_path, nrows=0).columns.str.strip()
+        if "label" not in header:
+            raise HTTPException(status_code=400, detail="Dataset must include a 'label' column.")
     else:
         df = _load_dataset_from_store(use_dataset, dataset_model, dataset_version)
+        lineage = {"sources": [{"type": use_dataset, "model": dataset_model, "version": dataset_version, "rows_in": len(df)}]}
 
-    if df.empty:
-        raise HTTPException(status_code=400, detail="Dataset is empty.")
-    df.columns = df.columns.str.strip()
-    if "label" not in df.columns:
-        raise HTTPException(status_code=400, detail="Dataset must include a 'label' column.")
+    if df is not None:
+        lineage["rows"] = len(df)
+        if df.empty:
+            raise HTTPException(status_code=400, detail="Dataset is empty.")
+        df.columns = df.columns.str.strip()
+        if "label" not in df.columns:
+            raise HTTPException(status_code=400, detail="Dataset must include a 'label' column.")
 
     # Call service
     try:
         # Validate action requirements
         if action == "fork":
-            if target_model and target_version is None:
-                if model_service.registry.get_model_info(target_model):
-                    result = model_service.retrain(
+            if target_model:
+                if model_service.registry.get_model_info(target_model) and target_version is None:
+                    result = await run_in_lane(
+                        "training",
+                        model_service.retrain,
                         action=action,
                         fork_name=fork_name,
                         fork_base_model=target_model,
                         original_df=df,
-                        hyperparams=hyperparams
+                        hyperparams=hyperparams,
+                        lineage=lineage,
+                        dataset_path=dataset_path,
+                        build_id=build_id
                     )
                 else:
-                    result = model_service.retrain(
+                    result = await run_in_lane(
+                        "training",
+                        model_service.retrain,
                         action=action,
                         fork_name=fork_name,
                         fork_model=target_model,
                         fork_version=target_version,
                         original_df=df,
-                        hyperparams=hyperparams
+                        hyperparams=hyperparams,
+                        lineage=lineage,
+                        dataset_path=dataset_path,
+                        build_id=build_id
                     )
         else:  # action == "version"
             # Only model name is needed (target_model already provided). Ignore fork_* if sent.
             if target_model:
                 if not model_service.registry.get_model_info(target_model):
-                    result = model_service.retrain(
+                    result = await run_in_lane(
+                            "training",
+                            model_service.retrain,
                             action=action,
                             version_model=target_model,
                             original_df=df,
-                            hyperparams=hyperparams
+                            hyperparams=hyperparams,
+                            lineage=lineage,
+                            dataset_path=dataset_path,
+                            build_id=build_id
                         )
                 else:
-                    result = model_service.retrain(
+                    result = await run_in_lane(
+                            "training",
+                            model_service.retrain,
                             action=action,
                             version_base_model=target_model,
                             original_df=df,
-                            hyperparams=hyperparams
+                            hyperparams=hyperparams,
+                            lineage=lineage,
+                            dataset_path=dataset_path,
+                            build_id=build_id
                         )
         
+    except HTTPException:
+        raise
+    except FileExistsError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
     return RetrainResponse(
-        message=("Fork created" if action == "fork" else "New version created"),
+        message=("Identical build already exists" if result.get("created") is False
+                 else "Fork created" if action == "fork" else "New version created"),
         build_id=result["build_id"],
         status=result["status"],
         model_version=result["model_version"],
         metrics=result["metrics"],
+        training=result.get("training"),
+        reused_from=result.get("reused_from"),
     )
\ No newline at end of file
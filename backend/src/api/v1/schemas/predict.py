@@ -10,6 +10,10 @@ class PredictResponse(BaseModel):
     prediction: List[Any]
     rows: int
     evaluation: Optional[dict] = None
+    tier: Literal["full", "fast"] = "full"
+
+class RoutedPredictResponse(PredictResponse):
+    routes: dict[str, int] = Field(..., description="Rows scored by each model ('name' or 'name@version')")
 
 class RetrainRequest(BaseModel):
     training_data: List[List[Any]]
@@ -24,4 +28,15 @@ class SinglePredictBody(BaseModel):
 
 class SinglePredictResponse(BaseModel):
     prediction: str
+    probabilities: Optional[dict[str, float]] = None
     shap_values: Optional[dict] = None
+    tier: Literal["full", "fast"] = "full"
+
+class CompareResponse(BaseModel):
+    rows: int
+    models: List[str]
+    predictions: dict[str, List[str]]
+    agreement: List[List[float]] = Field(..., description="Pairwise fraction of rows where two models agree, in 'models' order")
+    disagreement: List[List[int]] = Field(..., description="Pairwise count of rows where two models disagree, in 'models' order")
+    unanimous_rate: float
+    evaluation: Optional[dict[str, dict]] = None
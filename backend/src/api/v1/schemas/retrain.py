@@ -9,4 +9,8 @@ class RetrainResponse(BaseModel):
     build_id: str
     status: str
     model_version: str
-    metrics: dict
\ No newline at end of file
+    metrics: dict
+    # Stopping reason, best iteration and timings; the learning curves are in the build record
+    training: dict | None = None
+    # Set when an identical earlier build (same data, base, hyperparameters and trainer) was reused
+    reused_from: str | None = None
\ No newline at end of file
@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from api.v1.routers import predict, retrain, builds, models
+from api.v1.routers import predict, retrain, builds, models, metrics, holdouts
 
 app = FastAPI()
 
@@ -16,6 +16,8 @@ app.include_router(predict.router, prefix="/api/v1/predict", tags=["predict"])
 app.include_router(retrain.router, prefix="/api/v1/retrain", tags=["retrain"])
 app.include_router(builds.router, prefix="/api/v1/builds", tags=["builds"])
 app.include_router(models.router, prefix="/api/v1/models", tags=["models"])
+app.include_router(metrics.router, prefix="/api/v1/metrics", tags=["metrics"])
+app.include_router(holdouts.router, prefix="/api/v1/holdouts", tags=["holdouts"])
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,175 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DRIFT_BINS = 10
+PSI_EPS = 1e-4
+# Rows per vectorized update step; bounds the temporary (rows, features, edges) comparison
+UPDATE_CHUNK_ROWS = 2048
+
+
+def build_reference(df: pd.DataFrame, columns: List[str], n_bins: int = DRIFT_BINS) -> Dict[str, Any]:
+    """Reference sketch of a training dataset: per-feature quantile bin edges, bin counts and missing rate."""
+    X = df.reindex(columns=columns).to_numpy(dtype=float)
+    inner_edges = np.full((len(columns), n_bins - 1), np.nan)
+    for j in range(len(columns)):
+        col = X[:, j][~np.isnan(X[:, j])]
+        if len(col):
+            inner_edges[j] = np.quantile(col, np.linspace(0.0, 1.0, n_bins + 1)[1:-1])
+    sketch = HistogramSketch(inner_edges)
+    sketch.update(X)
+    return {
+        "columns": list(columns),
+        "inner_edges": inner_edges.tolist(),
+        "counts": sketch.counts.tolist(),
+        "missing": sketch.missing.tolist(),
+        "rows": sketch.rows,
+    }
+
+
+class HistogramSketch:
+    """Fixed-size per-feature histogram over fixed bin edges. Memory does not grow with rows seen."""
+
+    def __init__(self, inner_edges: np.ndarray):
+        self.inner_edges = np.asarray(inner_edges, dtype=float)
+        n_features, n_inner = self.inner_edges.shape
+        self.n_bins = n_inner + 1
+        # Features without any reference values get +inf edges, so everything lands in bin 0
+        self._edges = np.where(np.isnan(self.inner_edges), np.inf, self.inner_edges)
+        self.counts = np.zeros((n_features, self.n_bins), dtype=np.int64)
+        self.missing = np.zeros(n_features, dtype=np.int64)
+        self.rows = 0
+
+    def update(self, X: np.ndarray) -> None:
+        X = np.asarray(X, dtype=float)
+        n_features = self.counts.shape[0]
+        offsets = np.arange(n_features) * self.n_bins
+        for start in range(0, len(X), UPDATE_CHUNK_ROWS):
+            chunk = X[start:start + UPDATE_CHUNK_ROWS]
+            nan = np.isnan(chunk)
+            # Bin index per cell, vectorized over rows and columns at once
+            bins = (chunk[:, :, np.newaxis] >= self._edges[np.newaxis, :, :]).sum(axis=2)
+            flat = (bins + offsets[np.newaxis, :])[~nan]
+            self.counts += np.bincount(flat, minlength=n_features * self.n_bins).reshape(n_features, self.n_bins)
+            self.missing += nan.sum(axis=0)
+            self.rows += len(chunk)
+
+    def compare(self, reference: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+        """PSI and histogram-resolution KS statistic per feature against a reference sketch."""
+        ref_counts = np.asarray(reference["counts"], dtype=float)
+        ref_missing = np.asarray(reference["missing"], dtype=float)
+        ref_rows = max(float(reference["rows"]), 1.0)
+        live_counts = self.counts.astype(float)
+
+        ref_p = ref_counts / np.maximum(ref_counts.sum(axis=1, keepdims=True), 1.0)
+        live_p = live_counts / np.maximum(live_counts.sum(axis=1, keepdims=True), 1.0)
+        ref_q = np.maximum(ref_p, PSI_EPS)
+        live_q = np.maximum(live_p, PSI_EPS)
+        psi = ((live_q - ref_q) * np.log(live_q / ref_q)).sum(axis=1)
+        ks = np.abs(np.cumsum(live_p, axis=1) - np.cumsum(ref_p, axis=1)).max(axis=1)
+
+        rows = max(self.rows, 1)
+        return {
+            feature: {
+                "psi": float(psi[j]),
+                "ks": float(ks[j]),
+                "missing_rate_reference": float(ref_missing[j] / ref_rows),
+                "missing_rate_live": float(self.missing[j] / rows),
+            }
+            for j, feature in enumerate(reference["columns"])
+        }
+
+
+ModelKey = Tuple[str, Optional[str]]
+
+
+class DriftMonitor:
+    """Per-model live sketches of scored inputs, updated on a background thread."""
+
+    def __init__(self,
+                 reference_loader: Callable[[str, Optional[str]], Optional[Dict[str, Any]]],
+                 max_pending: int = 32,
+                 psi_threshold: float = 0.2):
+        self._reference_loader = reference_loader
+        self._references: Dict[ModelKey, Optional[Dict[str, Any]]] = {}
+        self._sketches: Dict[ModelKey, HistogramSketch] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="drift")
+        self._pending = 0
+        self._dropped = 0
+        self.max_pending = max_pending
+        self.psi_threshold = psi_threshold
+
+    def record(self, model_name: str, version: Optional[str], X: np.ndarray) -> bool:
+        """Queue a scored batch; returns False (and drops it) when the updater is backed up."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._dropped += 1
+                return False
+            self._pending += 1
+        self._executor.submit(self._update, (model_name, version), X)
+        return True
+
+    def _reference(self, key: ModelKey) -> Optional[Dict[str, Any]]:
+        if key not in self._references or self._references[key] is None:
+            self._references[key] = self._reference_loader(*key)
+        return self._references[key]
+
+    def _update(self, key: ModelKey, X: np.ndarray) -> None:
+        try:
+            reference = self._reference(key)
+            if reference is None:
+                return
+            sketch = self._sketches.get(key)
+            if sketch is None:
+                sketch = HistogramSketch(np.asarray(reference["inner_edges"], dtype=float))
+                self._sketches[key] = sketch
+            sketch.update(X)
+        except Exception:
+            logger.exception("Drift sketch update failed for %s/%s", *key)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def reset(self, model_name: str, version: Optional[str]) -> None:
+        self._sketches.pop((model_name, version), None)
+        self._references.pop((model_name, version), None)
+
+    def report(self, model_name: str, version: Optional[str]) -> Dict[str, Any]:
+        key = (model_name, version)
+        reference = self._reference(key)
+        sketch = self._sketches.get(key)
+        result: Dict[str, Any] = {
+            "model": model_name,
+            "version": version,
+            "reference_rows": reference["rows"] if reference else 0,
+            "rows_seen": sketch.rows if sketch else 0,
+            "dropped_batches": self._dropped,
+        }
+        if reference is None:
+            result["status"] = "no_reference"
+            return result
+        if sketch is None or sketch.rows == 0:
+            result["status"] = "no_traffic"
+            return result
+
+        features = sketch.compare(reference)
+        psi = np.array([f["psi"] for f in features.values()])
+        result.update({
+            "status": "ok",
+            "max_psi": float(psi.max()),
+            "mean_psi": float(psi.mean()),
+            "max_ks": float(max(f["ks"] for f in features.values())),
+            "drifted_features": sorted(
+                (name for name, f in features.items() if f["psi"] >= self.psi_threshold),
+                key=lambda name: -features[name]["psi"],
+            ),
+            "features": features,
+        })
+        return result
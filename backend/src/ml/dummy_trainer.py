@@ -1,47 +1,488 @@
-import shap
-from typing import Any, Dict, Tuple
+import hashlib
+import os
+import tempfile
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
+import sklearn
+import xgboost
 from xgboost import XGBClassifier
-from sklearn.utils import class_weight
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 
+from ml.explainers import get_explainer
+from utils.settings import (
+    LITE_LATENCY_REPEATS,
+    LITE_LATENCY_TARGET_MS,
+    LITE_MAX_ACCURACY_LOSS,
+    LITE_MIN_SPEEDUP,
+    SHAP_EXPLAINER,
+    TRAIN_CHUNK_ROWS,
+    TRAIN_EARLY_STOPPING_ROUNDS,
+    TRAIN_SCRATCH_DIR,
+    TRAIN_TIME_BUDGET_S,
+    TRAIN_VALIDATION_FRACTION,
+)
+
+# progress(stage, **data): receives training progress events (see services.progress)
+ProgressFn = Callable[..., None]
+
+
+class _ScaledBatches(xgboost.DataIter):
+    """Feeds (X, y) batches to XGBoost one at a time, scaled and class-weighted on the fly.
+
+    `batches` is called again on every pass XGBoost makes, so only one batch is materialized
+    at a time whether it is a slice of a memory-mapped array or a chunk read from disk.
+    """
+
+    def __init__(self,
+                 batches: Callable[[], Iterator[Tuple[np.ndarray, np.ndarray]]],
+                 scaler: StandardScaler,
+                 class_weights: np.ndarray,
+                 feature_names: List[str],
+                 cache_prefix: Optional[str] = None):
+        super().__init__(cache_prefix=cache_prefix)
+        self._batches = batches
+        self._scaler = scaler
+        self._class_weights = class_weights
+        self._feature_names = feature_names
+        self._it: Optional[Iterator[Tuple[np.ndarray, np.ndarray]]] = None
+
+    def next(self, input_data: Callable) -> int:
+        if self._it is None:
+            self._it = self._batches()
+        batch = next(self._it, None)
+        if batch is None:
+            return 0
+        X, y = batch
+        input_data(
+            data=self._scaler.transform(X).astype(np.float32, copy=False),
+            label=y,
+            weight=self._class_weights[y],
+            feature_names=self._feature_names,
+        )
+        return 1
+
+    def reset(self) -> None:
+        self._it = None
+
+
+class _TimeBudget(xgboost.callback.TrainingCallback):
+    """Stops boosting once the wall-clock budget for the build is spent."""
+
+    def __init__(self, seconds: float):
+        super().__init__()
+        self.seconds = seconds
+        self.expired = False
+
+    def before_training(self, model: Any) -> Any:
+        self._start = time.monotonic()
+        return model
+
+    def after_iteration(self, model: Any, epoch: int, evals_log: Dict[str, Any]) -> bool:
+        self.expired = time.monotonic() - self._start > self.seconds
+        return self.expired
+
+
+class _Progress(xgboost.callback.TrainingCallback):
+    """Publishes the latest value of every eval metric after each boosting round."""
+
+    def __init__(self, emit: ProgressFn, max_rounds: int):
+        super().__init__()
+        self.emit = emit
+        self.max_rounds = max_rounds
+
+    def after_iteration(self, model: Any, epoch: int, evals_log: Dict[str, Any]) -> bool:
+        self.emit("iteration", iteration=epoch, max_rounds=self.max_rounds,
+                  metrics={data: {name: values[-1] for name, values in log.items()} for data, log in evals_log.items()})
+        return False
+
+
+def _no_progress(stage: str, **data: Any) -> None:
+    pass
+
+
+@lru_cache(maxsize=1)
+def trainer_code_version() -> str:
+    """Identifies the training code: this module's source plus the library versions it trains with."""
+    digest = hashlib.sha256()
+    with open(__file__, "rb") as f:
+        digest.update(f.read())
+    digest.update(f"xgboost={xgboost.__version__};sklearn={sklearn.__version__}".encode())
+    return digest.hexdigest()[:16]
+
 
 class Trainer:
-    def train(self, df: pd.DataFrame, **kwargs) -> Dict[str, Any]:
+    def train(self, df: pd.DataFrame, progress: Optional[ProgressFn] = None, **kwargs) -> Dict[str, Any]:
+        emit = progress or _no_progress
+        controls = self._pop_controls(kwargs)
+        columns = [c for c in df.columns if c != "label"]
+        y = df["label"].to_numpy(dtype=np.int64)
+        # Features go to a file-backed float32 array once; everything below reads slices of it,
+        # so no split or scaled copies of the whole frame are ever made
+        X, scratch_path = self._to_memmap(df, columns)
+        try:
+            # Train-test split
+            train_idx, test_idx = self.split_index(len(df))
+            valid_idx = None
+            if controls["early_stopping_rounds"] or controls["time_budget_s"]:
+                # Early stopping watches a slice of the training split; the test split stays unseen
+                train_idx, valid_idx = train_test_split(train_idx, test_size=TRAIN_VALIDATION_FRACTION, shuffle=True, random_state=11111)
+            emit("split", train_rows=len(train_idx), validation_rows=len(valid_idx) if valid_idx is not None else 0, test_rows=len(test_idx))
+
+            def batches(index: np.ndarray) -> Callable[[], Iterator[Tuple[np.ndarray, np.ndarray]]]:
+                def gen() -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+                    for start in range(0, len(index), TRAIN_CHUNK_ROWS):
+                        idx = index[start:start + TRAIN_CHUNK_ROWS]
+                        yield X[idx], y[idx]
+                return gen
+
+            # Scale X
+            scaler = StandardScaler()
+            for X_batch, _ in batches(train_idx)():
+                scaler.partial_fit(X_batch)
+            classes_weights = self._balanced_class_weights(np.bincount(y[train_idx], minlength=3))
+            emit("scaled", rows=len(train_idx), features=len(columns))
+
+            model, training = self._fit(
+                _ScaledBatches(batches(train_idx), scaler, classes_weights, columns),
+                external=False,
+                valid_batches=_ScaledBatches(batches(valid_idx), scaler, classes_weights, columns) if valid_idx is not None else None,
+                emit=emit,
+                **controls,
+                **kwargs,
+            )
+            X_test = pd.DataFrame(X[test_idx], index=df.index[test_idx], columns=columns)
+            y_test = df["label"].iloc[test_idx]
+            # Enough to find the test rows again in the stored dataset (see holdout)
+            training["split"] = {"method": "shuffle", "rows": len(df)}
+            return (model, scaler, X_test, y_test, training)
+        finally:
+            # Drop the mapping before the file: Windows cannot delete a file that is still mapped
+            del X
+            os.remove(scratch_path)
+
+    def train_streaming(self, dataset_path: str, chunk_rows: int = TRAIN_CHUNK_ROWS, progress: Optional[ProgressFn] = None,
+                        **kwargs) -> Tuple[Any, Dict[str, float], Dict[str, Any]]:
+        """Out-of-core train_and_eval over a CSV on disk; memory is bounded by `chunk_rows`, not the file size.
+
+        The same 70/30 split is drawn per chunk from a seeded generator, so every pass over
+        the file (scaler statistics, XGBoost's external-memory passes, evaluation) sees the
+        same rows on the same side.
+        """
+        emit = progress or _no_progress
+        controls = self._pop_controls(kwargs)
+        validate = bool(controls["early_stopping_rounds"] or controls["time_budget_s"])
+        train_cut = 0.7 * (1.0 - TRAIN_VALIDATION_FRACTION) if validate else 0.7
+        columns = [c for c in pd.read_csv(dataset_path, nrows=0).columns.str.strip() if c != "label"]
+
+        def split_batches(part: str) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+            reader = pd.read_csv(dataset_path, chunksize=chunk_rows)
+            for chunk_no, chunk in enumerate(reader):
+                chunk.columns = chunk.columns.str.strip()
+                r = self._chunk_draws(chunk_no, len(chunk))
+                if part == "train":
+                    mask = r < train_cut
+                elif part == "validation":
+                    mask = (r >= train_cut) & (r < 0.7)
+                else:
+                    mask = r >= 0.7
+                if mask.any():
+                    rows = chunk[mask]
+                    yield rows[columns].to_numpy(dtype=np.float32), rows["label"].to_numpy(dtype=np.int64)
+
+        # One streaming pass for the scaler statistics and class balance
+        scaler = StandardScaler()
+        counts = np.zeros(3, dtype=np.int64)
+        for X_batch, y_batch in split_batches("train"):
+            scaler.partial_fit(X_batch)
+            counts += np.bincount(y_batch, minlength=3)[:3]
+        if not counts.sum():
+            raise ValueError(f"Dataset {dataset_path} has no rows.")
+        weights = self._balanced_class_weights(counts)
+        # Split sizes are only known after the first pass over the file
+        emit("split", train_rows=int(counts.sum()), out_of_core=True)
+        emit("scaled", rows=int(counts.sum()), features=len(columns))
+
+        with tempfile.TemporaryDirectory(prefix="xgb-extmem-", dir=TRAIN_SCRATCH_DIR) as cache_dir:
+            model, training = self._fit(
+                _ScaledBatches(lambda: split_batches("train"), scaler, weights, columns,
+                               cache_prefix=os.path.join(cache_dir, "train")),
+                external=True,
+                valid_batches=_ScaledBatches(lambda: split_batches("validation"), scaler, weights, columns,
+                                             cache_prefix=os.path.join(cache_dir, "validation")) if validate else None,
+                emit=emit,
+                **controls,
+                **kwargs,
+            )
+
+        pipeline = Pipeline([
+            ('scaler', scaler),
+            ('xgb', model)
+        ])
+        emit("evaluating")
+        y_true, y_pred = [], []
+        for X_batch, y_batch in split_batches("test"):
+            y_true.append(y_batch)
+            y_pred.append(np.asarray(pipeline.predict(X_batch)).ravel())
+        if not y_true:
+            raise ValueError(f"Dataset {dataset_path} is too small to hold out an evaluation split.")
+        metrics = self._metrics(np.concatenate(y_true), np.concatenate(y_pred))
+        emit("evaluated", test_rows=sum(len(y) for y in y_true), metrics=metrics)
+        training["split"] = {"method": "chunked", "chunk_rows": chunk_rows}
+        return pipeline, metrics, training
+
+    def build_config(self, hyperparams: Dict[str, Any], streaming: bool = False) -> Dict[str, Any]:
+        """Everything besides the data that determines a trained model, normalized for fingerprinting."""
+        params = dict(hyperparams)
+        controls = self._pop_controls(params)
+        # 100 and 100.0 train the same model
+        params = {k: int(v) if isinstance(v, float) and v.is_integer() else v for k, v in sorted(params.items())}
+        return {
+            "params": params,
+            **controls,
+            "validation_fraction": TRAIN_VALIDATION_FRACTION,
+            # The out-of-core split is drawn per chunk, so the chunk size changes the model
+            "chunk_rows": TRAIN_CHUNK_ROWS if streaming else None,
+            "trainer": trainer_code_version(),
+        }
+
+    def _pop_controls(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        # Build controls travel with the hyperparameters but are not XGBClassifier arguments
+        rounds = kwargs.pop("early_stopping_rounds", TRAIN_EARLY_STOPPING_ROUNDS)
+        budget = kwargs.pop("time_budget_s", TRAIN_TIME_BUDGET_S)
+        return {
+            "early_stopping_rounds": int(rounds) if rounds else None,
+            "time_budget_s": float(budget) if budget else None,
+        }
+
+    def _fit(self,
+             batches: _ScaledBatches,
+             external: bool,
+             valid_batches: Optional[_ScaledBatches] = None,
+             early_stopping_rounds: Optional[int] = None,
+             time_budget_s: Optional[float] = None,
+             emit: ProgressFn = _no_progress,
+             **kwargs) -> Tuple[XGBClassifier, Dict[str, Any]]:
         model = XGBClassifier(
             objective='multi:softprob',
             num_class=3,
             random_state=11111,
             **kwargs
         )
+        params = {k: v for k, v in model.get_xgb_params().items() if v is not None}
+        params.setdefault("tree_method", "hist")
+        num_rounds = model.get_num_boosting_rounds()
+        if external:
+            # External memory: XGBoost pages the quantized batches through cache files on disk
+            dtrain = xgboost.DMatrix(batches, missing=np.nan)
+            dvalid = xgboost.DMatrix(valid_batches, missing=np.nan) if valid_batches else None
+        else:
+            dtrain = xgboost.QuantileDMatrix(batches, missing=np.nan, max_bin=params.get("max_bin", 256))
+            dvalid = xgboost.QuantileDMatrix(valid_batches, missing=np.nan, ref=dtrain) if valid_batches else None
 
-        y = df["label"]
-        X = df.drop(columns=["label"])
+        evals = [(dtrain, "train")]
+        callbacks: List[xgboost.callback.TrainingCallback] = [_Progress(emit, num_rounds)]
+        budget = _TimeBudget(time_budget_s) if time_budget_s else None
+        if dvalid is not None:
+            evals.append((dvalid, "validation"))
+            # Without a patience limit this only tracks the best round, so a build cut short by
+            # the time budget still keeps its best iteration
+            callbacks.append(xgboost.callback.EarlyStopping(
+                rounds=early_stopping_rounds or num_rounds + 1, data_name="validation", save_best=True))
+        if budget:
+            callbacks.append(budget)
 
-        # Train-test split
-        X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.7, shuffle=True, random_state=11111)
+        curves: Dict[str, Dict[str, List[float]]] = {}
+        started = time.monotonic()
+        booster = xgboost.train(params, dtrain, num_boost_round=num_rounds, evals=evals,
+                                evals_result=curves, callbacks=callbacks, verbose_eval=False)
+        iterations = len(next(iter(curves["train"].values())))
+        if budget and budget.expired:
+            stopped_by = "time_budget"
+        elif iterations < num_rounds:
+            stopped_by = "early_stopping"
+        else:
+            stopped_by = "max_rounds"
+        training = {
+            "max_rounds": num_rounds,
+            "iterations": iterations,
+            "best_iteration": booster.num_boosted_rounds() - 1,
+            "stopped_by": stopped_by,
+            "early_stopping_rounds": early_stopping_rounds,
+            "time_budget_s": time_budget_s,
+            "elapsed_s": time.monotonic() - started,
+            "curves": curves,
+        }
+        emit("trained", **{k: v for k, v in training.items() if k != "curves"})
+        # Hand back a regular fitted XGBClassifier so pipelines and explainers don't care how it was trained
+        model.load_model(bytearray(booster.save_raw(raw_format="json")))
+        return model, training
 
-        # Scale X
-        scaler = StandardScaler()
-        scaler.fit(X_train.values)
-        X_train = pd.DataFrame(scaler.transform(X_train.values), index=X_train.index, columns=X_train.columns)
-        X_test = pd.DataFrame(scaler.transform(X_test.values), index=X_test.index, columns=X_test.columns)
-        classes_weights = class_weight.compute_sample_weight(
-            class_weight='balanced',
-            y=y_train
-        )
+    def _balanced_class_weights(self, counts: np.ndarray) -> np.ndarray:
+        # Same weights as class_weight.compute_sample_weight('balanced'), looked up by label
+        present = counts > 0
+        weights = np.zeros(len(counts), dtype=np.float32)
+        weights[present] = counts.sum() / (present.sum() * counts[present])
+        return weights
+
+    def _to_memmap(self, df: pd.DataFrame, columns: List[str]) -> Tuple[np.ndarray, str]:
+        """File-backed float32 copy of the features and its scratch path; the caller removes the file once done with the array."""
+        handle, path = tempfile.mkstemp(prefix="train-", suffix=".npy", dir=TRAIN_SCRATCH_DIR)
+        os.close(handle)
+        try:
+            X = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(len(df), len(columns)))
+            for start in range(0, len(df), TRAIN_CHUNK_ROWS):
+                X[start:start + TRAIN_CHUNK_ROWS] = df[columns].iloc[start:start + TRAIN_CHUNK_ROWS].to_numpy(dtype=np.float32)
+            X.flush()
+        except BaseException:
+            X = None  # unmap first, as in train
+            os.remove(path)
+            raise
+        return X, path
+
+    def split_index(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Train/test row indices of an in-memory build; the test rows are the version's holdout."""
+        return train_test_split(np.arange(n), train_size=0.7, shuffle=True, random_state=11111)
+
+    @staticmethod
+    def _chunk_draws(chunk_no: int, size: int) -> np.ndarray:
+        # Per-row draws of an out-of-core build's split; rows drawing >= 0.7 are its test rows.
+        # A shorter draw is a prefix of a longer one, so a truncated chunk splits the same way.
+        return np.random.default_rng([11111, chunk_no]).random(size)
+
+    def holdout(self, df: pd.DataFrame, split: Dict[str, Any]) -> Tuple[pd.DataFrame, pd.Series]:
+        """The test rows of a version within `df`, its stored dataset or a leading part of it.
+
+        `split` is what training recorded: the row count of an in-memory build (whose shuffle
+        depends on it, so a truncated frame cannot simply be re-split) or the chunk size of an
+        out-of-core one.
+        """
+        if split["method"] == "shuffle":
+            _, test_idx = self.split_index(split["rows"])
+            test_idx = np.sort(test_idx[test_idx < len(df)])
+        elif split["method"] == "chunked":
+            chunk_rows = split["chunk_rows"]
+            test_idx = np.flatnonzero(np.concatenate([
+                self._chunk_draws(chunk_no, min(chunk_rows, len(df) - start)) >= 0.7
+                for chunk_no, start in enumerate(range(0, len(df), chunk_rows))
+            ]))
+        else:
+            raise ValueError(f"Unknown split method '{split['method']}'.")
+        test = df.iloc[test_idx]
+        return test[[c for c in df.columns if c != "label"]], test["label"]
+
+    def truncate(self, model: Any, iterations: int) -> Any:
+        """The same model using only its first `iterations` boosting rounds."""
+        xgb, scaler = self._split_pipeline(model)
+        booster = xgb.get_booster()[0:iterations]
+        # The slice keeps the early-stopping attributes, which would point past its last round
+        booster.set_attr(best_iteration=None, best_score=None)
+        lite = XGBClassifier(**xgb.get_params())
+        lite.load_model(bytearray(booster.save_raw("json")))
+        return Pipeline([("scaler", scaler), ("xgb", lite)]) if scaler is not None else lite
+
+    def latency(self, model: Any, rows: pd.DataFrame, explainer: Optional[str] = None) -> Dict[str, float]:
+        """p50/p95 milliseconds of single-row scoring and single-row scoring with SHAP over `rows`."""
+        for i in range(2):  # warm up
+            self.predict_explain(model, rows.iloc[[i % len(rows)]], explainer=explainer)
+        predict, explain = [], []
+        for i in range(LITE_LATENCY_REPEATS):
+            row = rows.iloc[[i % len(rows)]]
+            start = time.perf_counter()
+            model.predict_proba(row.values)
+            predict.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            self.predict_explain(model, row, explainer=explainer)
+            explain.append(time.perf_counter() - start)
+        p = lambda samples, q: float(np.percentile(samples, q) * 1000)
+        return {
+            "predict_p50_ms": p(predict, 50),
+            "predict_p95_ms": p(predict, 95),
+            "explain_p50_ms": p(explain, 50),
+            "explain_p95_ms": p(explain, 95),
+        }
+
+    def build_lite(self, model: Any, X_test: pd.DataFrame, y_test: Optional[pd.Series],
+                   target_ms: float = LITE_LATENCY_TARGET_MS,
+                   max_accuracy_loss: float = LITE_MAX_ACCURACY_LOSS) -> Dict[str, Any]:
+        """Picks the fast tier by halving the boosting rounds, timing single-row predict+SHAP p95
+        and scoring each candidate on (X_test, y_test).
+
+        Halving stops at the first candidate that meets `target_ms`, or once it stops paying:
+        the accuracy given up passes `max_accuracy_loss`, or the candidate is less than
+        LITE_MIN_SPEEDUP faster than the one before (SHAP has a fixed per-row cost that fewer
+        rounds cannot remove). The tier is the longest candidate that meets the target within
+        the accuracy loss, else the fastest within it. Without `y_test` (no known holdout) the
+        accuracy is left unmeasured and the rounds are only cut when that meets the target.
+        """
+        xgb, _ = self._split_pipeline(model)
+        total = xgb.get_booster().num_boosted_rounds()
+        rows = X_test.iloc[:LITE_LATENCY_REPEATS]
+        measured = y_test is not None
+
+        def candidate(iterations: int, lite: Any) -> Dict[str, Any]:
+            metrics = {k: float(v) for k, v in self.eval(lite, X_test, y_test).items()} if measured else None
+            return {"iterations": iterations, "model": lite, "latency": self.latency(lite, rows), "metrics": metrics}
+
+        full = candidate(total, model)
+        tried = [full]
+        stopped_by = "target_met"
+        while tried[-1]["latency"]["explain_p95_ms"] > target_ms:
+            if tried[-1]["iterations"] == 1:
+                stopped_by = "min_rounds"
+                break
+            previous = tried[-1]
+            iterations = max(1, previous["iterations"] // 2)
+            current = candidate(iterations, self.truncate(model, iterations))
+            tried.append(current)
+            if measured and full["metrics"]["accuracy"] - current["metrics"]["accuracy"] > max_accuracy_loss:
+                stopped_by = "accuracy_loss"
+                break
+            if current["latency"]["explain_p95_ms"] > previous["latency"]["explain_p95_ms"] * (1.0 - LITE_MIN_SPEEDUP):
+                stopped_by = "no_speedup"
+                break
+
+        def loss(c: Dict[str, Any]) -> Optional[float]:
+            return full["metrics"]["accuracy"] - c["metrics"]["accuracy"] if measured else None
+
+        eligible = [c for c in tried if not measured or loss(c) <= max_accuracy_loss]
+        meeting = [c for c in eligible if c["latency"]["explain_p95_ms"] <= target_ms]
+        if meeting:
+            chosen = max(meeting, key=lambda c: c["iterations"])
+        elif measured:
+            chosen = min(eligible, key=lambda c: c["latency"]["explain_p95_ms"])
+        else:
+            chosen = full
+        return {
+            "iterations": chosen["iterations"],
+            "target_ms": target_ms,
+            "target_met": chosen["latency"]["explain_p95_ms"] <= target_ms,
+            "stopped_by": stopped_by,
+            "max_accuracy_loss": max_accuracy_loss,
+            "accuracy_measured": measured,
+            "accuracy_loss": loss(chosen),
+            "holdout_rows": len(y_test) if measured else 0,
+            "tiers": {
+                "full": {"iterations": total, "latency": full["latency"], "metrics": full["metrics"]},
+                "fast": {"iterations": chosen["iterations"], "latency": chosen["latency"], "metrics": chosen["metrics"]},
+            },
+            "candidates": [
+                {"iterations": c["iterations"], **c["latency"], "accuracy_loss": loss(c)}
+                for c in tried
+            ],
+        }
 
-        model.fit(X_train, y_train, sample_weight=classes_weights)
-        return (model, scaler, X_test, y_test)
-    
     def eval(self, model: Any, X_test: pd.DataFrame, y_test: pd.Series) -> Dict[str, float]:
-        pred = model.predict(X_test)
+        pred = model.predict(X_test.values)
+        return self._metrics(y_test, pred)
 
+    def _metrics(self, y_test: Any, pred: Any) -> Dict[str, float]:
         acc = accuracy_score(y_test, pred)
         prec = precision_score(y_test, pred, average='weighted', zero_division=0)
         rec = recall_score(y_test, pred, average='weighted', zero_division=0)
@@ -55,8 +496,9 @@ class Trainer:
             "macro_f1": macro_f1
         }
 
-    def train_and_eval(self, df: pd.DataFrame, **kwargs) -> Tuple[Dict[str, Any], Dict[str, float]]:
-        model, scaler, X_test, y_test = self.train(df, **kwargs)
+    def train_and_eval(self, df: pd.DataFrame, progress: Optional[ProgressFn] = None, **kwargs) -> Tuple[Any, Dict[str, float], Dict[str, Any]]:
+        emit = progress or _no_progress
+        model, scaler, X_test, y_test, training = self.train(df, progress=progress, **kwargs)
 
         # Create pipeline
         pipeline = Pipeline([
@@ -64,24 +506,47 @@ class Trainer:
             ('xgb', model)        # your trained XGB model
         ])
 
-        # Save pipeline to a single file
-        return pipeline, self.eval(pipeline, X_test, y_test)
+        emit("evaluating")
+        metrics = self.eval(pipeline, X_test, y_test)
+        emit("evaluated", test_rows=len(y_test), metrics=metrics)
+        return pipeline, metrics, training
     
-    def shap(self, model: Any, df: pd.DataFrame) -> Dict[str, Any]:
+    def _split_pipeline(self, model: Any) -> Tuple[Any, Any]:
+        # Expecting a Pipeline([('scaler', ...), ('xgb', ...)])
+        if isinstance(model, Pipeline) and "xgb" in model.named_steps and "scaler" in model.named_steps:
+            return model.named_steps["xgb"], model.named_steps["scaler"]
+        # Fallback: assume bare estimator and df already prepared
+        return model, None
+
+    def _scale(self, scaler: Any, df: pd.DataFrame) -> pd.DataFrame:
+        if scaler is None:
+            return df
+        return pd.DataFrame(
+            scaler.transform(df.values),
+            columns=df.columns,
+            index=df.index
+        )
+
+    def _shap_row(self, xgb: Any, x_row: pd.DataFrame, class_idx: int, explainer: Optional[str] = None) -> Dict[str, Any]:
+        values, base_values = get_explainer(explainer or SHAP_EXPLAINER)(xgb, x_row)
+
+        # values: (1, n_features, n_classes); single-output models have one class column
+        k = class_idx if values.shape[2] > 1 else 0
+        vec = values[0, :, k]
+        base = float(base_values[k])
+
+        per_feature = {feature: float(v) for feature, v in zip(x_row.columns, vec)}
+
+        return {
+            "class_index": class_idx,
+            "base_value": base,
+            "per_feature": per_feature,
+        }
+
+    def shap(self, model: Any, df: pd.DataFrame, explainer: Optional[str] = None) -> Dict[str, Any]:
         try:
-            # Expecting a Pipeline([('scaler', ...), ('xgb', ...)])
-            if isinstance(model, Pipeline) and "xgb" in model.named_steps and "scaler" in model.named_steps:
-                xgb = model.named_steps["xgb"]
-                scaler = model.named_steps["scaler"]
-                X_scaled = pd.DataFrame(
-                    scaler.transform(df),
-                    columns=df.columns,
-                    index=df.index
-                )
-            else:
-                # Fallback: assume bare estimator and df already prepared
-                xgb = model
-                X_scaled = df
+            xgb, scaler = self._split_pipeline(model)
+            X_scaled = self._scale(scaler, df)
 
             # Single row
             x_row = X_scaled.iloc[[0]]
@@ -93,29 +558,86 @@ class Trainer:
             else:
                 class_idx = 0
 
-            explainer = shap.TreeExplainer(xgb)
-            ex = explainer(x_row)
+            return self._shap_row(xgb, x_row, class_idx, explainer)
+        except Exception as e:
+            raise RuntimeError(f"Failed to compute SHAP values: {e}")
 
-            values = ex.values
-            base_values = ex.base_values
+    def predict_explain(self, model: Any, df: pd.DataFrame, explainer: Optional[str] = None) -> Dict[str, Any]:
+        """Predict, score and explain the first row of df with one scaling pass."""
+        try:
+            xgb, scaler = self._split_pipeline(model)
+            x_row = self._scale(scaler, df.iloc[[0]])
 
-            # Handle shapes: (1, n_features, n_classes) vs (1, n_features)
-            if values.ndim == 3:
-                vec = values[0, :, class_idx]
-                base = float(base_values[0, class_idx]) if np.ndim(base_values) == 2 else float(base_values[class_idx])
-            elif values.ndim == 2:
-                vec = values[0, :]
-                base = float(base_values[0]) if np.ndim(base_values) > 0 else float(base_values)
+            if hasattr(xgb, "predict_proba"):
+                proba = np.asarray(xgb.predict_proba(x_row)[0], dtype=float)
+                class_idx = int(np.argmax(proba))
+                prediction = xgb.classes_[class_idx] if hasattr(xgb, "classes_") else class_idx
             else:
-                vec = values
-                base = float(base_values)
+                proba = None
+                prediction = np.asarray(xgb.predict(x_row)).ravel()[0]
+                class_idx = 0
+
+            return {
+                "prediction": prediction.item() if hasattr(prediction, "item") else prediction,
+                "probabilities": proba.tolist() if proba is not None else None,
+                "shap": self._shap_row(xgb, x_row, class_idx, explainer),
+            }
+        except Exception as e:
+            raise RuntimeError(f"Failed to compute prediction and SHAP values: {e}")
+
+    def booster_importance(self, model: Any) -> Dict[str, Dict[str, float]]:
+        xgb, _ = self._split_pipeline(model)
+        booster = xgb.get_booster()
+        return {
+            importance_type: {k: float(v) for k, v in booster.get_score(importance_type=importance_type).items()}
+            for importance_type in ("gain", "cover", "weight")
+        }
+
+    def shap_summary(self, model: Any, df: pd.DataFrame, max_rows: int = 2000, n_bins: int = 10,
+                     explainer: Optional[str] = None) -> Dict[str, Any]:
+        """Global SHAP summary over df: mean |SHAP| and per-quantile-bin mean SHAP for every feature and class."""
+        try:
+            xgb, scaler = self._split_pipeline(model)
+            X = df.drop(columns=["label"], errors="ignore")
+            if len(X) > max_rows:
+                X = X.sample(n=max_rows, random_state=11111)
+            X_scaled = self._scale(scaler, X)
+
+            values, _ = get_explainer(explainer or SHAP_EXPLAINER)(xgb, X_scaled)
+            classes = [c.item() if hasattr(c, "item") else c for c in getattr(xgb, "classes_", range(values.shape[2]))]
+
+            mean_abs = np.abs(values).mean(axis=0)
+            mean_abs_shap = {
+                str(c): {feature: float(v) for feature, v in zip(X.columns, mean_abs[:, k])}
+                for k, c in enumerate(classes)
+            }
 
-            per_feature = {feature: float(v) for feature, v in zip(X_scaled.columns, vec)}
+            # Beeswarm-style bins: quantiles of the raw feature value, mean SHAP of the rows in each bin
+            raw = X.to_numpy(dtype=float)
+            beeswarm: Dict[str, Any] = {}
+            for j, feature in enumerate(X.columns):
+                col = raw[:, j]
+                present = ~np.isnan(col)
+                entry: Dict[str, Any] = {"missing_rate": float(1.0 - present.mean()) if len(col) else 0.0}
+                if present.any():
+                    edges = np.unique(np.quantile(col[present], np.linspace(0.0, 1.0, n_bins + 1)))
+                    bins = np.searchsorted(edges[1:-1], col[present], side="right")
+                    n = max(len(edges) - 1, 1)
+                    counts = np.bincount(bins, minlength=n)
+                    sums = np.stack([np.bincount(bins, weights=values[present, j, k], minlength=n) for k in range(len(classes))], axis=1)
+                    means = np.divide(sums, counts[:, np.newaxis], out=np.zeros_like(sums), where=counts[:, np.newaxis] > 0)
+                    entry["edges"] = edges.tolist()
+                    entry["counts"] = counts.tolist()
+                    entry["mean_shap"] = {str(c): means[:, k].tolist() for k, c in enumerate(classes)}
+                beeswarm[feature] = entry
 
             return {
-                "class_index": class_idx,
-                "base_value": base,
-                "per_feature": per_feature,
+                "rows": int(len(X)),
+                "features": list(X.columns),
+                "classes": classes,
+                "mean_abs_shap": mean_abs_shap,
+                "beeswarm": beeswarm,
+                "booster_importance": self.booster_importance(model),
             }
         except Exception as e:
-            raise RuntimeError(f"Failed to compute SHAP values: {e}")
\ No newline at end of file
+            raise RuntimeError(f"Failed to compute SHAP summary: {e}")
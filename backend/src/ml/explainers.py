@@ -0,0 +1,102 @@
+import time
+import weakref
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+import shap
+import xgboost
+
+# Each backend takes the bare XGB estimator and already-scaled features and returns
+# (values, base_values) with shapes (n_rows, n_features, n_classes) and (n_classes,),
+# both in margin (log-odds) space.
+ExplainerFn = Callable[[Any, pd.DataFrame], Tuple[np.ndarray, np.ndarray]]
+
+
+# TreeExplainers live exactly as long as the estimator they explain, so swapping the
+# serving model swaps its explainer too
+_tree_explainers: "weakref.WeakKeyDictionary[Any, Any]" = weakref.WeakKeyDictionary()
+
+
+def _shap_tree(xgb: Any, X: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    explainer = _tree_explainers.get(xgb)
+    if explainer is None:
+        explainer = _tree_explainers.setdefault(xgb, shap.TreeExplainer(xgb))
+    ex = explainer(X)
+    values = ex.values
+    base_values = np.asarray(ex.base_values, dtype=float)
+    if values.ndim == 2:
+        values = values[:, :, np.newaxis]
+    if base_values.ndim == 2:
+        base_values = base_values[0]
+    return values, np.atleast_1d(base_values)
+
+
+def _booster_contribs(xgb: Any, X: pd.DataFrame, approx: bool) -> Tuple[np.ndarray, np.ndarray]:
+    booster = xgb.get_booster()
+    dmatrix = xgboost.DMatrix(X, missing=np.nan, feature_names=booster.feature_names)
+    contribs = booster.predict(dmatrix, pred_contribs=True, approx_contribs=approx, validate_features=False)
+    # Multi-class: (n_rows, n_classes, n_features + 1); binary: (n_rows, n_features + 1). Last column is the bias.
+    if contribs.ndim == 2:
+        contribs = contribs[:, np.newaxis, :]
+    values = np.transpose(contribs[:, :, :-1], (0, 2, 1))
+    base_values = contribs[0, :, -1].astype(float)
+    return values, base_values
+
+
+def _native(xgb: Any, X: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    # Exact TreeSHAP computed by XGBoost's multithreaded C++ path, no explainer construction
+    return _booster_contribs(xgb, X, approx=False)
+
+
+def _approx(xgb: Any, X: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    # Saabas-style path attribution: faster, but not consistent like exact SHAP
+    return _booster_contribs(xgb, X, approx=True)
+
+
+EXPLAINERS: Dict[str, ExplainerFn] = {
+    "shap": _shap_tree,
+    "native": _native,
+    "approx": _approx,
+}
+
+
+def get_explainer(name: str) -> ExplainerFn:
+    try:
+        return EXPLAINERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown explainer '{name}'. Available: {sorted(EXPLAINERS)}")
+
+
+def compare_explainers(xgb: Any, X: pd.DataFrame, reference: str = "shap", repeats: int = 5) -> Dict[str, Dict[str, float]]:
+    """Max absolute deviation from the reference backend and mean latency for every backend."""
+    ref_values, ref_base = get_explainer(reference)(xgb, X)
+    report: Dict[str, Dict[str, float]] = {}
+    for name, fn in EXPLAINERS.items():
+        start = time.perf_counter()
+        for _ in range(repeats):
+            values, base = fn(xgb, X)
+        elapsed = (time.perf_counter() - start) / repeats
+        report[name] = {
+            "latency_ms": elapsed * 1000.0,
+            "max_abs_diff": float(np.max(np.abs(values - ref_values))),
+            "max_abs_base_diff": float(np.max(np.abs(base - ref_base))),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    # Parity and latency check of every backend against the shap library on a base model:
+    #   PYTHONPATH=./src python -m ml.explainers [model_name] [rows]
+    import sys
+    from ml.model_registry import ModelRegistry
+    from utils.settings import COLUMNS
+
+    model_name = sys.argv[1] if len(sys.argv) > 1 else "default"
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    pipeline = ModelRegistry().get_model(model_name)
+    xgb, scaler = pipeline.named_steps["xgb"], pipeline.named_steps["scaler"]
+    rng = np.random.default_rng(11111)
+    X = pd.DataFrame(scaler.transform(rng.normal(size=(rows, len(COLUMNS)))), columns=COLUMNS)
+    for name, stats in compare_explainers(xgb, X).items():
+        print(f"{name:>8}  {stats['latency_ms']:9.2f} ms  max|diff|={stats['max_abs_diff']:.2e}  max|base diff|={stats['max_abs_base_diff']:.2e}")
@@ -28,6 +28,12 @@ class ModelRegistry:
             raise FileNotFoundError
         return joblib.load(file_path)
 
+    def get_model_path(self, model_name: str) -> str | None:
+        info = self.get_model_info(model_name)
+        if info is None:
+            return None
+        return os.path.join(MODELS_DIR, info['model'], "model.pkl")
+
     def get_default_model(self) -> dict[str, str] | None:
         data = self._read()
         return data.get("default")
@@ -44,6 +50,17 @@ class ModelRegistry:
         data = self._read()
         return data.get("tess")
     
+    def resolve_version(self, model_name: str, version: str) -> str | None:
+        """Concrete id of a family's version: an existing id as is, "latest" for the newest
+        version or "serving" for the promoted one; None when there is no such version."""
+        versions = self._repo.list_versions(model_name)
+        if version == "latest":
+            return versions[-1] if versions else None
+        if version == "serving":
+            serving = self._repo.load_serving(model_name)
+            return serving["version"] if serving and serving["version"] in versions else None
+        return version if version in versions else None
+
     def get_model_dataset_path(self, model_name: str) -> str | None:
         data = self._read()
         data.get(model_name)
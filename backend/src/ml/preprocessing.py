@@ -20,4 +20,46 @@ class DataPreprocessor:
 def preprocess_input_data(data):
     df = pd.DataFrame(data)
     # Add any additional preprocessing steps here
-    return df
\ No newline at end of file
+    return df
+
+
+def compose_datasets(sources, columns, dedup_key=None):
+    """Concatenate several training datasets into one frame aligned to `columns`.
+
+    `sources` is a list of (metadata, loader) pairs; each loader is only called when its
+    source is reached, and each source is trimmed to the aligned columns (and de-duplicated)
+    before the next one is loaded, so the only full-size copy built is the final concat.
+    With `dedup_key`, the last occurrence of a key wins, so later sources override earlier ones.
+    Returns (frame, lineage).
+    """
+    keep = list(columns) + ([dedup_key] if dedup_key and dedup_key not in columns else [])
+    seen = set()
+    parts = []
+    lineage = []
+    # Walk newest-first so "keep last" needs only the set of keys already taken
+    for meta, load in reversed(sources):
+        df = load()
+        df.columns = df.columns.str.strip()
+        if "label" not in df.columns:
+            raise ValueError(f"Dataset source {meta} has no 'label' column.")
+        if dedup_key and dedup_key not in df.columns:
+            raise ValueError(f"Dataset source {meta} has no '{dedup_key}' column to de-duplicate on.")
+        rows_in = len(df)
+        dropped_columns = [c for c in df.columns if c not in keep]
+        df = df.reindex(columns=keep)
+        if dedup_key:
+            keys = df[dedup_key]
+            mask = ~keys.duplicated(keep="last") & ~keys.isin(seen)
+            df = df[mask]
+            seen.update(df[dedup_key].tolist())
+        parts.append(df)
+        lineage.append({**meta, "rows_in": rows_in, "rows_used": len(df), "dropped_columns": dropped_columns})
+        del df
+
+    parts.reverse()
+    lineage.reverse()
+    composed = pd.concat(parts, ignore_index=True, copy=False)
+    del parts
+    if dedup_key and dedup_key not in columns:
+        composed.drop(columns=[dedup_key], inplace=True)
+    return composed, lineage
@@ -1,8 +1,9 @@
 import os
+import math
 import uuid
 import json
 import sqlite3
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 class BuildHistoryRepository:
     def __init__(self, db_path: str | None = None):
@@ -29,12 +30,103 @@ class BuildHistoryRepository:
                     metrics TEXT,
                     previous_version TEXT,
                     previous_metrics TEXT,
-                    model_path TEXT
+                    model_path TEXT,
+                    training TEXT
                 )
             """)
+            # Databases created before these columns existed
+            columns = {row[1] for row in cur.execute("PRAGMA table_info(retrain_builds)")}
+            for column in ("training", "model_name", "version", "fingerprint", "reused_from"):
+                if column not in columns:
+                    cur.execute(f"ALTER TABLE retrain_builds ADD COLUMN {column} TEXT")
             cur.execute("CREATE INDEX IF NOT EXISTS idx_retrain_builds_started_at ON retrain_builds(started_at)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_retrain_builds_model ON retrain_builds(model_name, started_at)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_retrain_builds_fingerprint ON retrain_builds(fingerprint, status)")
+            # One row per (build, numeric metric). Family, version and start time are copied in so
+            # leaderboards and trends are answered from the indexes without touching retrain_builds.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS build_metrics (
+                    build_id TEXT NOT NULL,
+                    model_name TEXT,
+                    version TEXT,
+                    started_at TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (build_id, metric)
+                )
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_build_metrics_rank ON build_metrics(metric, value)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_build_metrics_family_rank ON build_metrics(model_name, metric, value)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_build_metrics_family_trend ON build_metrics(model_name, metric, started_at)")
+            # Bumped in the same transaction as every write to the build list, so readers can tell
+            # whether it changed without reading it. The epoch changes when the database is recreated.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS history_generation (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    epoch TEXT NOT NULL,
+                    value INTEGER NOT NULL
+                )
+            """)
+            cur.execute("INSERT OR IGNORE INTO history_generation (id, epoch, value) VALUES (1, ?, 0)", (uuid.uuid4().hex[:12],))
+            self._backfill_metrics(cur)
             conn.commit()
 
+    def _bump_generation(self, cur: sqlite3.Cursor) -> None:
+        cur.execute("UPDATE history_generation SET value = value + 1 WHERE id = 1")
+
+    def generation(self) -> str:
+        """Opaque token that changes whenever a build is recorded or updated."""
+        with self._connect() as conn:
+            epoch, value = conn.execute("SELECT epoch, value FROM history_generation WHERE id = 1").fetchone()
+            return f"{epoch}-{value}"
+
+    def _backfill_metrics(self, cur: sqlite3.Cursor) -> None:
+        # Successful builds recorded before build_metrics existed
+        cur.execute("""
+            SELECT b.id, b.model_name, b.version, b.started_at, b.metrics
+            FROM retrain_builds b
+            WHERE b.status = 'success' AND b.metrics IS NOT NULL AND b.reused_from IS NULL
+              AND NOT EXISTS (SELECT 1 FROM build_metrics m WHERE m.build_id = b.id)
+        """)
+        for build_id, model_name, version, started_at, metrics in cur.fetchall():
+            try:
+                parsed = json.loads(metrics)
+            except ValueError:
+                continue
+            self._write_metrics(cur, build_id, model_name, version, started_at, parsed)
+
+    def _write_metrics(self, cur: sqlite3.Cursor, build_id: str, model_name: Optional[str], version: Optional[str],
+                       started_at: str, metrics: Any) -> None:
+        cur.execute("DELETE FROM build_metrics WHERE build_id = ?", (build_id,))
+        if not isinstance(metrics, dict):
+            return
+        cur.executemany(
+            "INSERT INTO build_metrics (build_id, model_name, version, started_at, metric, value) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (build_id, model_name, version, started_at, name, float(value))
+                for name, value in metrics.items()
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+            ],
+        )
+
+    def backfill_models(self, resolve: Callable[[str], Optional[Tuple[str, str]]]) -> int:
+        """Fill model_name/version of older successful builds from `resolve(build_id) -> (model_name, version)`."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id FROM retrain_builds WHERE model_name IS NULL AND status = 'success'")
+            updated = 0
+            for (build_id,) in cur.fetchall():
+                found = resolve(build_id)
+                if not found:
+                    continue
+                cur.execute("UPDATE retrain_builds SET model_name = ?, version = ? WHERE id = ?", (found[0], found[1], build_id))
+                cur.execute("UPDATE build_metrics SET model_name = ?, version = ? WHERE build_id = ?", (found[0], found[1], build_id))
+                updated += 1
+            if updated:
+                self._bump_generation(cur)
+            conn.commit()
+        return updated
+
     def new_id(self) -> str:
         return str(uuid.uuid4())
 
@@ -45,8 +137,9 @@ class BuildHistoryRepository:
                 INSERT OR REPLACE INTO retrain_builds (
                     id, started_at, finished_at, status,
                     attempt_version, promoted, metrics,
-                    previous_version, previous_metrics, model_path
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    previous_version, previous_metrics, model_path, training,
+                    model_name, version, fingerprint, reused_from
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 record.get("id"),
                 record.get("started_at"),
@@ -58,7 +151,42 @@ class BuildHistoryRepository:
                 record.get("previous_version"),
                 json.dumps(record.get("previous_metrics")) if record.get("previous_metrics") is not None else None,
                 record.get("model_path"),
+                json.dumps(record.get("training")) if record.get("training") is not None else None,
+                record.get("model_name"),
+                record.get("version"),
+                record.get("fingerprint"),
+                record.get("reused_from"),
             ))
+            # Leaderboards and trends rank trained models: a build that reused an earlier one's artifact is not counted again
+            ranked = record.get("status") == "success" and not record.get("reused_from")
+            self._write_metrics(cur, record.get("id"), record.get("model_name"), record.get("version"),
+                                record.get("started_at"), record.get("metrics") if ranked else None)
+            self._bump_generation(cur)
+            conn.commit()
+
+    def find_by_fingerprint(self, fingerprint: str) -> List[Tuple[str, str, str]]:
+        """(build_id, model_name, version) of successful builds with this fingerprint, newest first."""
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT id, model_name, version
+                FROM retrain_builds
+                WHERE fingerprint = ? AND status = 'success' AND version IS NOT NULL
+                ORDER BY started_at DESC
+            """, (fingerprint,))
+            return cur.fetchall()
+
+    def set_promotion(self, build_id: str, promoted: bool, previous_version: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            cur = conn.cursor()
+            if promoted:
+                cur.execute(
+                    "UPDATE retrain_builds SET promoted = 1, previous_version = ? WHERE id = ?",
+                    (previous_version, build_id),
+                )
+            else:
+                cur.execute("UPDATE retrain_builds SET promoted = 0 WHERE id = ?", (build_id,))
+            self._bump_generation(cur)
             conn.commit()
 
     def list(self, limit: int = 50) -> List[Dict[str, Any]]:
@@ -67,7 +195,8 @@ class BuildHistoryRepository:
             cur.execute("""
                 SELECT id, started_at, finished_at, status,
                        attempt_version, promoted, metrics,
-                       previous_version, previous_metrics, model_path
+                       previous_version, previous_metrics, model_path, training,
+                       model_name, version, reused_from
                 FROM retrain_builds
                 ORDER BY datetime(started_at) DESC, id DESC
                 LIMIT ?
@@ -87,6 +216,11 @@ class BuildHistoryRepository:
                 "previous_version": r[7],
                 "previous_metrics": json.loads(r[8]) if r[8] else None,
                 "model_path": r[9],
+                # Curves can run to thousands of points per build; fetch one build to get them
+                "training": {k: v for k, v in json.loads(r[10]).items() if k != "curves"} if r[10] else None,
+                "model_name": r[11],
+                "version": r[12],
+                "reused_from": r[13],
             })
         return items
 
@@ -96,7 +230,8 @@ class BuildHistoryRepository:
             cur.execute("""
                 SELECT id, started_at, finished_at, status,
                        attempt_version, promoted, metrics,
-                       previous_version, previous_metrics, model_path
+                       previous_version, previous_metrics, model_path, training,
+                       model_name, version, fingerprint, reused_from
                 FROM retrain_builds
                 WHERE id = ?
                 LIMIT 1
@@ -116,4 +251,72 @@ class BuildHistoryRepository:
             "previous_version": r[7],
             "previous_metrics": json.loads(r[8]) if r[8] else None,
             "model_path": r[9],
-        }
\ No newline at end of file
+            "training": json.loads(r[10]) if r[10] else None,
+            "model_name": r[11],
+            "version": r[12],
+            "fingerprint": r[13],
+            "reused_from": r[14],
+        }
+
+    def leaderboard(self, metric: str, model_name: Optional[str] = None, limit: int = 10,
+                    per_family: bool = False, ascending: bool = False) -> List[Dict[str, Any]]:
+        order = "ASC" if ascending else "DESC"
+        best = "MIN" if ascending else "MAX"
+        where = "metric = ?" + (" AND model_name = ?" if model_name else "")
+        params: List[Any] = [metric] + ([model_name] if model_name else [])
+        with self._connect() as conn:
+            cur = conn.cursor()
+            if per_family:
+                # SQLite returns the bare columns of the row holding the MAX()/MIN()
+                cur.execute(f"""
+                    SELECT build_id, model_name, version, started_at, {best}(value) AS value
+                    FROM build_metrics
+                    WHERE {where} AND model_name IS NOT NULL
+                    GROUP BY model_name
+                    ORDER BY value {order}
+                    LIMIT ?
+                """, params + [limit])
+            else:
+                cur.execute(f"""
+                    SELECT build_id, model_name, version, started_at, value
+                    FROM build_metrics
+                    WHERE {where}
+                    ORDER BY value {order}, started_at DESC
+                    LIMIT ?
+                """, params + [limit])
+            rows = cur.fetchall()
+        return [
+            {"rank": i + 1, "build_id": r[0], "model_name": r[1], "version": r[2], "started_at": r[3], "value": r[4]}
+            for i, r in enumerate(rows)
+        ]
+
+    def trend(self, metric: str, model_name: Optional[str] = None, limit: int = 200) -> Dict[str, Any]:
+        where = "metric = ?" + (" AND model_name = ?" if model_name else "")
+        params: List[Any] = [metric] + ([model_name] if model_name else [])
+        window = f"""
+            SELECT build_id, model_name, version, started_at, value
+            FROM build_metrics
+            WHERE {where}
+            ORDER BY started_at DESC
+            LIMIT ?
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT * FROM ({window}) ORDER BY started_at ASC", params + [limit])
+            points = cur.fetchall()
+            cur.execute(f"SELECT COUNT(*), AVG(value), MIN(value), MAX(value) FROM ({window})", params + [limit])
+            count, mean, low, high = cur.fetchone()
+        return {
+            "metric": metric,
+            "model_name": model_name,
+            "builds": count,
+            "mean": mean,
+            "min": low,
+            "max": high,
+            "first": points[0][4] if points else None,
+            "last": points[-1][4] if points else None,
+            "points": [
+                {"build_id": r[0], "model_name": r[1], "version": r[2], "started_at": r[3], "value": r[4]}
+                for r in points
+            ],
+        }
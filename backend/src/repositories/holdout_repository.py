@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pandas import DataFrame, read_csv
+
+from utils.settings import HOLDOUTS_DIR
+
+HOLDOUT_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+class HoldoutRepository:
+    """Registered benchmark holdout sets (holdouts/<name>/holdout.csv + meta.json) and their evaluation cache."""
+
+    def __init__(self, holdouts_dir: str | None = None):
+        self.holdouts_dir = os.path.abspath(holdouts_dir or HOLDOUTS_DIR)
+        os.makedirs(self.holdouts_dir, exist_ok=True)
+
+    def _dir(self, name: str) -> str:
+        if not HOLDOUT_NAME.match(name):
+            raise ValueError(f"Invalid holdout name '{name}': use letters, digits, '_', '-' or '.'.")
+        return os.path.join(self.holdouts_dir, name)
+
+    def _write_json(self, path: str, data: Any) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _read_json(self, path: str) -> Any:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def save(self, name: str, df: DataFrame, description: str | None = None) -> Dict[str, Any]:
+        holdout_dir = self._dir(name)
+        if os.path.exists(holdout_dir):
+            raise FileExistsError(f"Holdout '{name}' already exists.")
+        os.makedirs(holdout_dir)
+        csv_path = os.path.join(holdout_dir, "holdout.csv")
+        df.to_csv(f"{csv_path}.tmp", index=False)
+        os.replace(f"{csv_path}.tmp", csv_path)
+
+        digest = hashlib.sha256()
+        with open(csv_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        meta = {
+            "name": name,
+            "hash": digest.hexdigest(),
+            "rows": len(df),
+            "label_counts": {str(k): int(v) for k, v in df["label"].value_counts().sort_index().items()},
+            "description": description,
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        self._write_json(os.path.join(holdout_dir, "meta.json"), meta)
+        return meta
+
+    def get(self, name: str) -> Dict[str, Any] | None:
+        return self._read_json(os.path.join(self._dir(name), "meta.json"))
+
+    def list(self) -> List[Dict[str, Any]]:
+        items = []
+        for name in sorted(os.listdir(self.holdouts_dir)):
+            meta = self._read_json(os.path.join(self.holdouts_dir, name, "meta.json"))
+            if meta:
+                items.append(meta)
+        return items
+
+    def load(self, name: str) -> DataFrame:
+        path = os.path.join(self._dir(name), "holdout.csv")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Holdout '{name}' not found.")
+        return read_csv(path)
+
+    def delete(self, name: str) -> None:
+        holdout_dir = self._dir(name)
+        if not os.path.isdir(holdout_dir):
+            raise FileNotFoundError(f"Holdout '{name}' not found.")
+        shutil.rmtree(holdout_dir)
+
+    # Evaluation cache: "<artifact sha256>:<holdout sha256>" -> result. Keys are content hashes, so
+    # results survive renames, re-registration of the same data and moves to the cold tier.
+    def load_evaluations(self) -> Dict[str, Any]:
+        return self._read_json(os.path.join(self.holdouts_dir, "evaluations.json")) or {}
+
+    def save_evaluations(self, evaluations: Dict[str, Any]) -> None:
+        self._write_json(os.path.join(self.holdouts_dir, "evaluations.json"), evaluations)
@@ -1,40 +1,165 @@
+import gzip
+import hashlib
 import json
-from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime
 import shutil
-from typing import Any, List
+import tempfile
+import threading
+import time
+from typing import Any, Iterator, List
 import os
 import joblib
-from pandas import DataFrame
+from pandas import DataFrame, read_csv
 
 from utils.settings import MODELS_DIR
 
+try:
+    import fcntl
+except ImportError:  # Windows: locks only hold within this process
+    fcntl = None
+
+# Artifacts moved to the cold tier are stored as <file>.gz
+COLD_FILES = ("dataset.csv", "model.pkl")
+COLD_SUFFIX = ".gz"
+COLD_COMPRESSLEVEL = 6
+
+# New versions are assembled under models/.staging and renamed into their family when complete;
+# per-family lock files live in models/.locks. Neither shows up as a family or a version.
+STAGING_DIR = ".staging"
+LOCKS_DIR = ".locks"
+# Bumped on every change to the catalog (versions published, deleted or moved between tiers)
+GENERATION_FILE = ".generation"
+STALE_STAGING_SECONDS = 24 * 3600
+
+_thread_locks: dict = {}
+_thread_locks_guard = threading.Lock()
+
 class ModelRepository:
     def __init__(self):
         self.models_dir = os.path.abspath(MODELS_DIR)
         os.makedirs(self.models_dir, exist_ok=True)
+        # (path, mtime, size) -> sha256, so unchanged artifacts are hashed once per process
+        self._hashes: dict = {}
+        os.makedirs(os.path.join(self.models_dir, STAGING_DIR), exist_ok=True)
+        os.makedirs(os.path.join(self.models_dir, LOCKS_DIR), exist_ok=True)
+        self._sweep_staging()
 
     def _version_dir(self, model_name: str, version: str) -> str:
         return os.path.join(self.models_dir, model_name, version)
 
-    def save_model(self, model: Any, model_name: str, version: str, dataset: DataFrame) -> str:
-        version_dir = self._version_dir(model_name, version)
+    def _artifact_path(self, model_name: str, version: str, filename: str) -> str:
+        # Cold versions keep their artifacts gzip-compressed next to where the plain file used to be
+        path = os.path.join(self._version_dir(model_name, version), filename)
+        if not os.path.exists(path) and os.path.exists(path + COLD_SUFFIX):
+            return path + COLD_SUFFIX
+        return path
+
+    @contextmanager
+    def family_lock(self, model_name: str) -> Iterator[None]:
+        """Exclusive lock on a model family, held across threads and worker processes (flock)."""
+        path = os.path.join(self.models_dir, LOCKS_DIR, f"{model_name}.lock")
+        if fcntl is None:
+            with _thread_locks_guard:
+                lock = _thread_locks.setdefault(path, threading.Lock())
+            with lock:
+                yield
+            return
+        with open(path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def catalog_generation(self) -> tuple:
+        """(generation, mtime_ns) of the family/version catalog; both are 0 before the first change."""
+        path = os.path.join(self.models_dir, GENERATION_FILE)
+        try:
+            with open(path, "r") as f:
+                generation = int(f.read().strip() or 0)
+            return generation, os.stat(path).st_mtime_ns
+        except (FileNotFoundError, ValueError):
+            return 0, 0
+
+    def _bump_generation(self) -> None:
+        path = os.path.join(self.models_dir, GENERATION_FILE)
+        with self.family_lock(".catalog"):
+            generation = self.catalog_generation()[0] + 1
+            with open(f"{path}.tmp", "w") as f:
+                f.write(str(generation))
+            os.replace(f"{path}.tmp", path)
+
+    def stage_version(self) -> str:
+        """Private directory to write a new version's artifacts into before publish_version."""
+        return tempfile.mkdtemp(prefix="v-", dir=os.path.join(self.models_dir, STAGING_DIR))
+
+    def discard_staged(self, staging_dir: str) -> None:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def _sweep_staging(self) -> None:
+        # Left behind by crashed builds; recent ones may belong to a build still running elsewhere
+        root = os.path.join(self.models_dir, STAGING_DIR)
+        for entry in os.scandir(root):
+            try:
+                stale = entry.is_dir() and time.time() - entry.stat().st_mtime > STALE_STAGING_SECONDS
+            except FileNotFoundError:
+                continue  # published while we looked
+            if stale:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _new_version_id(self, model_name: str) -> str:
+        # Called with the family lock held. Builds finishing within the same second get a
+        # zero-padded suffix, which keeps ids unique and sorting in publication order.
+        base = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        version, n = base, 0
+        while os.path.exists(self._version_dir(model_name, version)):
+            n += 1
+            version = f"{base}.{n:03d}"
+        return version
+
+    def publish_version(self, staging_dir: str, model_name: str, parent: dict | None = None) -> str:
+        """Move a staged version into its family under a new version id, in one rename.
+
+        With `parent` the family must be new: it is created with parent.json, and the check
+        happens under the family lock so two forks cannot claim the same name.
+        """
+        family_dir = os.path.join(self.models_dir, model_name)
+        with self.family_lock(model_name):
+            if parent is not None:
+                if model_name in self._registry_names():
+                    raise FileExistsError(f"fork_name '{model_name}' is a base model in the registry. Choose a different name.")
+                if os.path.exists(os.path.join(family_dir, "parent.json")) or self.list_versions(model_name):
+                    raise FileExistsError(f"fork_name '{model_name}' already exists. Choose a different name.")
+                os.makedirs(family_dir, exist_ok=True)
+                self._write_json(os.path.join(family_dir, "parent.json"), parent)
+            else:
+                os.makedirs(family_dir, exist_ok=True)
+            version = self._new_version_id(model_name)
+            os.rename(staging_dir, self._version_dir(model_name, version))
+        self._bump_generation()
+        return version
+
+    def save_staged_json(self, staging_dir: str, filename: str, data: dict) -> str:
+        return self._write_json(os.path.join(staging_dir, filename), data)
+
+    def save_model(self, model: Any, model_name: str, version: str, dataset: DataFrame | None, source_path: str | None = None) -> str:
+        return self.write_artifacts(self._version_dir(model_name, version), model, dataset, source_path=source_path)
+
+    def write_artifacts(self, version_dir: str, model: Any, dataset: DataFrame | None, source_path: str | None = None) -> str:
         os.makedirs(version_dir, exist_ok=True)
         file_path = os.path.join(version_dir, "model.pkl")
         joblib.dump(model, file_path)
         dataset_path = os.path.join(version_dir, "dataset.csv")
-        dataset.to_csv(dataset_path, index=False)
+        if dataset is not None:
+            dataset.to_csv(dataset_path, index=False)
+        else:
+            # Out-of-core builds never had the dataset in memory: stream-copy the file they trained on
+            opener = gzip.open if source_path.endswith(COLD_SUFFIX) else open
+            with opener(source_path, "rb") as src, open(dataset_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
         return file_path
 
-    def save_fork_info(self, path: str, model: str, version: str, build_id: str, hyperparams: str, metrics: str) -> None:
-        info_path = os.path.join(Path(path).parent.parent, "parent.json")
-        info = {
-            "model": model,
-            "version": version,
-        }
-        with open(info_path, "w") as f:
-            json.dump(info, f)
-        self.save_version_info(Path(path).parent, build_id, hyperparams, metrics)
-    
     def save_version_info(self, path: str, build_id: str, hyperparams: str, metrics: str) -> None:
         info_path = os.path.join(path, "info.json")
         info = {
@@ -45,6 +170,79 @@ class ModelRepository:
         with open(info_path, "w") as f:
             json.dump(info, f)
 
+    def _version_file(self, model_name: str, version: str | None, filename: str) -> str:
+        root = self._version_dir(model_name, version) if version else os.path.join(self.models_dir, model_name)
+        return os.path.join(root, filename)
+
+    def _write_json(self, path: str, data: dict) -> str:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        return path
+
+    def _read_json(self, path: str) -> dict | None:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def save_shap_summary(self, model_name: str, version: str | None, summary: dict) -> str:
+        return self._write_json(self._version_file(model_name, version, "shap_summary.json"), summary)
+
+    def load_shap_summary(self, model_name: str, version: str | None) -> dict | None:
+        return self._read_json(self._version_file(model_name, version, "shap_summary.json"))
+
+    def save_drift_reference(self, model_name: str, version: str | None, reference: dict) -> str:
+        return self._write_json(self._version_file(model_name, version, "drift_reference.json"), reference)
+
+    def load_drift_reference(self, model_name: str, version: str | None) -> dict | None:
+        return self._read_json(self._version_file(model_name, version, "drift_reference.json"))
+
+    def save_shadow_config(self, model_name: str, config: dict) -> str:
+        return self._write_json(self._version_file(model_name, None, "shadow.json"), config)
+
+    def load_shadow_config(self, model_name: str) -> dict | None:
+        return self._read_json(self._version_file(model_name, None, "shadow.json"))
+
+    def delete_shadow_config(self, model_name: str) -> None:
+        path = self._version_file(model_name, None, "shadow.json")
+        if os.path.exists(path):
+            os.remove(path)
+
+    def save_lite_info(self, model_name: str, version: str, info: dict) -> str:
+        return self._write_json(self._version_file(model_name, version, "lite.json"), info)
+
+    def load_lite_info(self, model_name: str, version: str) -> dict | None:
+        return self._read_json(self._version_file(model_name, version, "lite.json"))
+
+    def load_split(self, model_name: str, version: str) -> dict | None:
+        # How training split the stored dataset; missing for versions trained before it was recorded
+        return self._read_json(self._version_file(model_name, version, "split.json"))
+
+    def save_lineage(self, model_name: str, version: str, lineage: dict) -> str:
+        return self._write_json(self._version_file(model_name, version, "lineage.json"), lineage)
+
+    def load_lineage(self, model_name: str, version: str) -> dict | None:
+        return self._read_json(self._version_file(model_name, version, "lineage.json"))
+
+    def serving_path(self, model_name: str) -> str:
+        return self._version_file(model_name, None, "serving.json")
+
+    def save_serving(self, model_name: str, serving: dict) -> str:
+        return self._write_json(self.serving_path(model_name), serving)
+
+    def load_serving(self, model_name: str) -> dict | None:
+        return self._read_json(self.serving_path(model_name))
+
+    def delete_serving(self, model_name: str) -> None:
+        path = self.serving_path(model_name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def get_version_info(self, model_name: str, version: str) -> dict | None:
+        return self._read_json(self._version_file(model_name, version, "info.json"))
+
     def get_parent_model(self, model_name: str) -> Any | None:
         parent_path = os.path.join(self.models_dir, model_name, "parent.json")
         if not os.path.exists(parent_path):
@@ -53,17 +251,60 @@ class ModelRepository:
             return json.load(f)
 
     def load_model(self, model_name: str, version: str) -> Any:
-        file_path = os.path.join(self._version_dir(model_name, version), "model.pkl")
+        file_path = self._artifact_path(model_name, version, "model.pkl")
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Model '{model_name}' version '{version}' not found at {file_path}")
+        # joblib detects gzip from the file header, so cold artifacts load transparently
         return joblib.load(file_path)
         
+    def model_path(self, model_name: str, version: str) -> str:
+        return self._artifact_path(model_name, version, "model.pkl")
+
+    def artifact_hash(self, path: str) -> str:
+        """sha256 of a model artifact's (decompressed) bytes, so moving a version to the cold tier keeps its hash."""
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        cached = self._hashes.get(key)
+        if cached is None:
+            digest = hashlib.sha256()
+            opener = gzip.open if path.endswith(COLD_SUFFIX) else open
+            with opener(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            cached = self._hashes[key] = digest.hexdigest()
+        return cached
+
+    def dataset_path(self, model_name: str, version: str) -> str:
+        return self._artifact_path(model_name, version, "dataset.csv")
+
+    def load_dataset(self, model_name: str, version: str, nrows: int | None = None) -> DataFrame:
+        dataset_path = self.dataset_path(model_name, version)
+        if not os.path.exists(dataset_path):
+            raise FileNotFoundError(f"Dataset for '{model_name}' version '{version}' not found at {dataset_path}")
+        return read_csv(dataset_path, nrows=nrows)
+
     def list_models(self) -> List[str]:
-        return sorted(
-            d for d in os.listdir(self.models_dir)
-            if os.path.isdir(os.path.join(self.models_dir, d)) and not os.path.exists(os.path.join(self.models_dir, d, "model.pkl"))
+        return sorted(d for d in os.listdir(self.models_dir) if self.is_model(d))
+
+    def is_model(self, model_name: str) -> bool:
+        # A registry base model's directory (model.pkl at the top) is a family once versions
+        # have been trained from it: they are published next to the base model
+        root = os.path.join(self.models_dir, model_name)
+        return (
+            not model_name.startswith(".") and os.path.isdir(root)
+            and (not os.path.exists(os.path.join(root, "model.pkl")) or bool(self.list_versions(model_name)))
         )
-        
+
+    def _registry_names(self) -> set:
+        # Keys of registry.json and the directories they point at; read here because the
+        # registry itself is built on this repository
+        try:
+            with open(os.path.join(self.models_dir, "registry.json"), "r", encoding="utf-8") as f:
+                registry = json.load(f)
+        except FileNotFoundError:
+            return set()
+        return set(registry) | {info["model"] for info in registry.values() if isinstance(info, dict) and info.get("model")}
+
     def list_versions(self, model_name: str) -> List[str]:
         root = os.path.join(self.models_dir, model_name)
         if not os.path.isdir(root):
@@ -73,6 +314,51 @@ class ModelRepository:
             if os.path.isdir(os.path.join(root, d))
         )
     
+    def version_tier(self, model_name: str, version: str) -> str:
+        # Only checks file names, never opens or decompresses anything
+        version_dir = self._version_dir(model_name, version)
+        for filename in COLD_FILES:
+            if os.path.exists(os.path.join(version_dir, filename + COLD_SUFFIX)):
+                return "cold"
+        return "hot"
+
+    def version_size(self, model_name: str, version: str) -> int:
+        version_dir = self._version_dir(model_name, version)
+        return sum(entry.stat().st_size for entry in os.scandir(version_dir) if entry.is_file())
+
+    def compress_version(self, model_name: str, version: str) -> int:
+        """Move a version to the cold tier by gzip-compressing its artifacts; returns bytes saved."""
+        version_dir = self._version_dir(model_name, version)
+        saved = 0
+        for filename in COLD_FILES:
+            src = os.path.join(version_dir, filename)
+            if not os.path.exists(src):
+                continue
+            dst = src + COLD_SUFFIX
+            tmp = dst + ".tmp"
+            with open(src, "rb") as fin, gzip.open(tmp, "wb", compresslevel=COLD_COMPRESSLEVEL) as fout:
+                shutil.copyfileobj(fin, fout, length=1024 * 1024)
+            os.replace(tmp, dst)
+            saved += os.path.getsize(src) - os.path.getsize(dst)
+            os.remove(src)
+        self._bump_generation()
+        return saved
+
+    def decompress_version(self, model_name: str, version: str) -> None:
+        """Move a version back to the hot tier."""
+        version_dir = self._version_dir(model_name, version)
+        for filename in COLD_FILES:
+            dst = os.path.join(version_dir, filename)
+            src = dst + COLD_SUFFIX
+            if not os.path.exists(src):
+                continue
+            tmp = dst + ".tmp"
+            with gzip.open(src, "rb") as fin, open(tmp, "wb") as fout:
+                shutil.copyfileobj(fin, fout, length=1024 * 1024)
+            os.replace(tmp, dst)
+            os.remove(src)
+        self._bump_generation()
+
     def latest_version(self, model_name: str) -> str | None:
         versions = self.list_versions(model_name)
         return versions[-1] if versions else None
@@ -82,3 +368,4 @@ class ModelRepository:
         if not os.path.isdir(version_dir):
             raise FileNotFoundError(f"{model_name}/{version} not found")
         shutil.rmtree(version_dir)
+        self._bump_generation()
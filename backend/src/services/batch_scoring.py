@@ -0,0 +1,221 @@
+"""Offline batch scoring of large CSV or Parquet files.
+
+    PYTHONPATH=./src python -m services.batch_scoring INPUT OUTPUT --model default [--version V]
+        [--workers N] [--chunksize ROWS] [--probabilities] [--shap] [--id-column COL] [--resume]
+
+Chunks are scored across a process pool and written in input order. After every chunk a
+checkpoint (OUTPUT.ckpt.json) records how far the output got, so an interrupted run can
+continue with --resume instead of starting over.
+"""
+from __future__ import annotations
+import json
+import os
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ml.dummy_trainer import Trainer
+from ml.model_registry import ModelRegistry
+from repositories.model_repository import ModelRepository
+from utils.settings import COLUMNS, LABEL_MAP, _to_label
+
+_worker_model: Any = None
+_worker_options: Dict[str, Any] = {}
+
+
+def resolve_version(model_name: str, version: Optional[str]) -> Optional[str]:
+    """Same rule as the API: pinned version, else the promoted serving version, else the base model."""
+    if version is not None:
+        return version
+    serving = ModelRepository().load_serving(model_name)
+    return serving["version"] if serving else None
+
+
+def load_model(model_name: str, version: Optional[str]) -> Any:
+    if version is not None:
+        return ModelRepository().load_model(model_name=model_name, version=version)
+    return ModelRegistry().get_model(model_name)
+
+
+def _init_worker(model_name: str, version: Optional[str], options: Dict[str, Any]) -> None:
+    global _worker_model, _worker_options
+    _worker_model = load_model(model_name, version)
+    # Parallelism comes from the process pool; one XGBoost thread per worker avoids oversubscription
+    xgb = getattr(_worker_model, "named_steps", {}).get("xgb", _worker_model)
+    if hasattr(xgb, "set_params"):
+        xgb.set_params(n_jobs=1)
+    _worker_options = options
+
+
+def _score_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    options = _worker_options
+    features = chunk[COLUMNS]
+    out = pd.DataFrame(index=chunk.index)
+    if options.get("id_column"):
+        out[options["id_column"]] = chunk[options["id_column"]].values
+
+    if options.get("probabilities") or options.get("shap"):
+        proba = _worker_model.predict_proba(features.values)
+        preds = np.argmax(proba, axis=1)
+        if options.get("probabilities"):
+            for k in range(proba.shape[1]):
+                out[f"p_{LABEL_MAP.get(k, k)}"] = proba[:, k]
+    else:
+        preds = np.asarray(_worker_model.predict(features.values)).ravel()
+    out.insert(1 if options.get("id_column") else 0, "prediction", [_to_label(v) for v in preds])
+
+    if options.get("shap"):
+        trainer = Trainer()
+        xgb, scaler = trainer._split_pipeline(_worker_model)
+        from ml.explainers import get_explainer
+        values, _ = get_explainer(options["explainer"])(xgb, trainer._scale(scaler, features))
+        # Contributions towards each row's predicted class
+        picked = values[np.arange(len(features)), :, preds.astype(int) if values.shape[2] > 1 else 0]
+        shap_df = pd.DataFrame(picked, index=chunk.index, columns=[f"shap_{c}" for c in COLUMNS])
+        out = pd.concat([out, shap_df], axis=1)
+    return out
+
+
+def _read_chunks(path: str, chunksize: int, skip_rows: int) -> Iterator[pd.DataFrame]:
+    if path.endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Reading Parquet requires pyarrow (pip install pyarrow).")
+        seen = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            if seen + batch.num_rows <= skip_rows:
+                seen += batch.num_rows
+                continue
+            df = batch.to_pandas()
+            if seen < skip_rows:
+                df = df.iloc[skip_rows - seen:]
+            seen += batch.num_rows
+            yield df
+        return
+    skiprows = range(1, skip_rows + 1) if skip_rows else None
+    yield from pd.read_csv(path, chunksize=chunksize, skiprows=skiprows)
+
+
+def _checkpoint_path(output: str) -> str:
+    return f"{output}.ckpt.json"
+
+
+def _load_checkpoint(output: str, params: Dict[str, Any]) -> Tuple[int, int]:
+    path = _checkpoint_path(output)
+    if not os.path.exists(path) or not os.path.exists(output):
+        return 0, 0
+    with open(path, "r") as f:
+        ckpt = json.load(f)
+    if ckpt.get("params") != params:
+        raise RuntimeError(f"Checkpoint {path} was written with different options; remove it or rerun without --resume.")
+    # Drop anything written after the last checkpoint (e.g. a chunk cut short by a crash)
+    with open(output, "r+b") as f:
+        f.truncate(ckpt["output_bytes"])
+    return ckpt["rows_done"], ckpt["output_bytes"]
+
+
+def _save_checkpoint(output: str, params: Dict[str, Any], rows_done: int, output_bytes: int) -> None:
+    path = _checkpoint_path(output)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({"params": params, "rows_done": rows_done, "output_bytes": output_bytes}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def score_file(input_path: str,
+               output_path: str,
+               model_name: str,
+               version: Optional[str] = None,
+               workers: Optional[int] = None,
+               chunksize: int = 50_000,
+               probabilities: bool = False,
+               shap: bool = False,
+               explainer: str = "native",
+               id_column: Optional[str] = None,
+               resume: bool = False,
+               progress: bool = True) -> Dict[str, Any]:
+    version = resolve_version(model_name, version)
+    load_model(model_name, version)  # fail fast before starting the pool
+    workers = workers or os.cpu_count() or 1
+    options = {"probabilities": probabilities, "shap": shap, "explainer": explainer, "id_column": id_column}
+    params = {"input": os.path.abspath(input_path), "model": model_name, "version": version, **options}
+
+    rows_done, output_bytes = _load_checkpoint(output_path, params) if resume else (0, 0)
+    start = time.perf_counter()
+    rows_this_run = 0
+
+    with open(output_path, "ab" if rows_done else "wb") as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(model_name, version, options)) as pool:
+        pending: List[Tuple[int, Future]] = []
+        write_header = rows_done == 0
+
+        def drain(block_until: int) -> None:
+            # Write finished chunks strictly in submission order
+            nonlocal rows_done, rows_this_run, write_header, output_bytes
+            while pending and (len(pending) > block_until or pending[0][1].done()):
+                n_rows, fut = pending.pop(0)
+                result = fut.result()
+                out.write(result.to_csv(index=False, header=write_header).encode("utf-8"))
+                out.flush()
+                write_header = False
+                rows_done += n_rows
+                rows_this_run += n_rows
+                output_bytes = out.tell()
+                _save_checkpoint(output_path, params, rows_done, output_bytes)
+                if progress:
+                    elapsed = time.perf_counter() - start
+                    print(f"\r{rows_done:,} rows scored ({rows_this_run / max(elapsed, 1e-9):,.0f} rows/s)",
+                          end="", file=sys.stderr, flush=True)
+
+        for chunk in _read_chunks(input_path, chunksize, rows_done):
+            missing = [c for c in COLUMNS if c not in chunk.columns]
+            if missing:
+                raise ValueError(f"Missing required feature columns: {missing}")
+            if id_column and id_column not in chunk.columns:
+                raise ValueError(f"id column '{id_column}' not found in input.")
+            pending.append((len(chunk), pool.submit(_score_chunk, chunk)))
+            # Bounded read-ahead keeps memory at a few chunks per worker
+            drain(block_until=2 * workers)
+        drain(block_until=0)
+
+    if progress:
+        print(file=sys.stderr)
+    os.remove(_checkpoint_path(output_path))
+    elapsed = time.perf_counter() - start
+    return {
+        "model": model_name,
+        "version": version,
+        "rows": rows_done,
+        "rows_this_run": rows_this_run,
+        "seconds": elapsed,
+        "rows_per_second": rows_this_run / max(elapsed, 1e-9),
+        "output": output_path,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score a large CSV/Parquet file offline with a registered model.")
+    parser.add_argument("input", help="Input .csv or .parquet file with the feature columns")
+    parser.add_argument("output", help="Output CSV file")
+    parser.add_argument("--model", required=True, help="Model name")
+    parser.add_argument("--version", default=None, help="Model version (default: serving version or base model)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="Rows per chunk")
+    parser.add_argument("--probabilities", action="store_true", help="Add per-class probability columns")
+    parser.add_argument("--shap", action="store_true", help="Add SHAP contributions towards the predicted class")
+    parser.add_argument("--explainer", default="native", choices=["shap", "native", "approx"], help="SHAP backend")
+    parser.add_argument("--id-column", default=None, help="Input column copied to the output to identify rows")
+    parser.add_argument("--resume", action="store_true", help="Continue from OUTPUT.ckpt.json")
+    args = parser.parse_args()
+
+    report = score_file(args.input, args.output, args.model, version=args.version, workers=args.workers,
+                        chunksize=args.chunksize, probabilities=args.probabilities, shap=args.shap,
+                        explainer=args.explainer, id_column=args.id_column, resume=args.resume)
+    print(json.dumps(report, indent=2))
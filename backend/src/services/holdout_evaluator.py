@@ -0,0 +1,151 @@
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pandas import DataFrame
+
+from ml.dummy_trainer import Trainer
+from ml.model_registry import ModelRegistry
+from repositories.holdout_repository import HoldoutRepository
+from repositories.model_repository import ModelRepository
+from utils.settings import COLUMNS, HOLDOUT_EVAL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class HoldoutEvaluator:
+    """Scores every base model and model version against every registered holdout, off the request path.
+
+    Results are cached by (artifact hash, holdout hash), so a refresh only computes pairs that
+    involve a new version or a new holdout. The comparison table is read from the cache.
+    """
+
+    def __init__(self,
+                 models: ModelRepository,
+                 registry: ModelRegistry,
+                 holdouts: HoldoutRepository | None = None,
+                 trainer: Trainer | None = None,
+                 workers: int = HOLDOUT_EVAL_WORKERS):
+        self.models = models
+        self.registry = registry
+        self.holdouts = holdouts or HoldoutRepository()
+        self.trainer = trainer or Trainer()
+        self.workers = workers
+        self._results: Dict[str, Any] = self.holdouts.load_evaluations()
+        # Failures are kept out of the persistent cache so the next refresh retries them
+        self._errors: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="holdout-eval")
+        self._queued: Optional[Future] = None
+        self.status: Dict[str, Any] = {"running": False, "last_started": None, "last_finished": None, "last_computed": 0}
+
+    @staticmethod
+    def _key(artifact_hash: str, holdout_hash: str) -> str:
+        return f"{artifact_hash}:{holdout_hash}"
+
+    def targets(self) -> List[Dict[str, Any]]:
+        """Every scorable artifact: registry base models (version None) and all stored versions."""
+        targets = []
+        for name in self.registry.list_base_models():
+            path = self.registry.get_model_path(name)
+            if path and os.path.exists(path):
+                targets.append({"model": name, "version": None, "artifact_hash": self.models.artifact_hash(path)})
+        for name in self.models.list_models():
+            for version in self.models.list_versions(name):
+                try:
+                    path = self.models.model_path(name, version)
+                    targets.append({"model": name, "version": version, "artifact_hash": self.models.artifact_hash(path)})
+                except FileNotFoundError:
+                    continue  # half-written or deleted while listing
+        return targets
+
+    def schedule(self) -> Future:
+        # Requests that arrive while a refresh is queued share it; one arriving mid-run queues the next
+        with self._lock:
+            if self._queued is not None and not self._queued.running() and not self._queued.done():
+                return self._queued
+            self._queued = self._runner.submit(self.refresh)
+            return self._queued
+
+    def refresh(self) -> int:
+        self.status.update(running=True, last_started=datetime.utcnow().isoformat())
+        computed = 0
+        try:
+            holdouts = self.holdouts.list()
+            targets = self.targets()
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="holdout-score") as pool:
+                futures = {}
+                for holdout in holdouts:
+                    missing = [t for t in targets if self._key(t["artifact_hash"], holdout["hash"]) not in self._results]
+                    if not missing:
+                        continue
+                    df = self.holdouts.load(holdout["name"])
+                    for target in missing:
+                        futures[pool.submit(self._evaluate, target, df)] = (target, holdout)
+                for future in as_completed(futures):
+                    target, holdout = futures[future]
+                    key = self._key(target["artifact_hash"], holdout["hash"])
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.exception("Holdout evaluation of %s/%s on %s failed", target["model"], target["version"], holdout["name"])
+                        with self._lock:
+                            self._errors[key] = {"error": str(e), "computed_at": datetime.utcnow().isoformat()}
+                        continue
+                    with self._lock:
+                        self._results[key] = result
+                        self._errors.pop(key, None)
+                    computed += 1
+            if computed:
+                with self._lock:
+                    snapshot = dict(self._results)
+                self.holdouts.save_evaluations(snapshot)
+            return computed
+        finally:
+            self.status.update(running=False, last_finished=datetime.utcnow().isoformat(), last_computed=computed)
+
+    def _evaluate(self, target: Dict[str, Any], df: DataFrame) -> Dict[str, Any]:
+        # Loaded straight from disk: a sweep over every version must not evict the serving cache
+        if target["version"] is None:
+            model = self.registry.get_model(target["model"])
+        else:
+            model = self.models.load_model(model_name=target["model"], version=target["version"])
+        start = time.perf_counter()
+        metrics = self.trainer.eval(model, df[COLUMNS], df["label"])
+        return {
+            "metrics": {k: float(v) for k, v in metrics.items()},
+            "rows": len(df),
+            "seconds": time.perf_counter() - start,
+            "computed_at": datetime.utcnow().isoformat(),
+        }
+
+    def table(self, metric: Optional[str] = None) -> Dict[str, Any]:
+        """Comparison of every target on every holdout from cached results; pairs not yet scored are null."""
+        holdouts = self.holdouts.list()
+        targets = self.targets()
+        rows = []
+        pending = 0
+        with self._lock:
+            for target in targets:
+                cells: Dict[str, Any] = {}
+                for holdout in holdouts:
+                    key = self._key(target["artifact_hash"], holdout["hash"])
+                    result = self._results.get(key) or self._errors.get(key)
+                    if result is None:
+                        pending += 1
+                    elif metric is not None and "metrics" in result:
+                        result = result["metrics"].get(metric)
+                    cells[holdout["name"]] = result
+                rows.append({**target, "results": cells})
+        return {
+            "holdouts": [{"name": h["name"], "hash": h["hash"], "rows": h["rows"]} for h in holdouts],
+            "metric": metric,
+            "rows": rows,
+            "pending": pending,
+            "status": dict(self.status),
+        }
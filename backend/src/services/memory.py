@@ -0,0 +1,131 @@
+from __future__ import annotations
+import random
+import threading
+import tracemalloc
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from utils.settings import MEMORY_SAMPLE_RATE
+
+
+class _Probe:
+    """Stage marks for one request. The unsampled probe records nothing."""
+
+    sampled = False
+
+    def stage(self, name: str) -> None:
+        pass
+
+
+class _TracedProbe(_Probe):
+    sampled = True
+
+    def __init__(self):
+        tracemalloc.reset_peak()
+        self._base = tracemalloc.get_traced_memory()[0]
+        self.stages: Dict[str, int] = {}
+
+    def stage(self, name: str) -> None:
+        # High-water mark of the request's allocations while this stage ran, held data from
+        # earlier stages included. Streaming requests mark the same stage once per chunk.
+        peak = max(0, tracemalloc.get_traced_memory()[1] - self._base)
+        self.stages[name] = max(self.stages.get(name, 0), peak)
+        tracemalloc.reset_peak()
+
+
+class _Tracking:
+    def __init__(self, monitor: "MemoryMonitor", endpoint: str):
+        self._monitor = monitor
+        self._endpoint = endpoint
+        self._started = False
+        self.probe: _Probe = _Probe()
+
+    def __enter__(self) -> _Probe:
+        monitor = self._monitor
+        monitor.count(self._endpoint, "requests")
+        # One traced request at a time: tracemalloc peaks are process-wide
+        if monitor.sample_rate > 0 and random.random() < monitor.sample_rate and monitor._tracing.acquire(blocking=False):
+            self._started = not tracemalloc.is_tracing()
+            if self._started:
+                tracemalloc.start()
+            self.probe = _TracedProbe()
+        return self.probe
+
+    def __exit__(self, *exc: Any) -> None:
+        if not self.probe.sampled:
+            return
+        try:
+            self._monitor._record(self._endpoint, self.probe.stages)
+        finally:
+            if self._started:
+                tracemalloc.stop()
+            self._monitor._tracing.release()
+
+
+class MemoryMonitor:
+    """Per-endpoint allocation high-water marks by stage, from a sample of requests.
+
+    tracemalloc only runs while a sampled request does, but then it traces every thread's
+    allocations, so requests overlapping a sampled one are slowed too. Peaks are measured
+    process-wide, so a sampled request that overlaps others reads high: treat them as upper bounds.
+    """
+
+    def __init__(self, sample_rate: float = MEMORY_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._tracing = threading.Lock()
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+
+    def _endpoint(self, endpoint: str) -> Dict[str, Any]:
+        # Called with the lock held
+        return self._endpoints.setdefault(endpoint, {"counts": {}, "sampled": 0, "stages": {}})
+
+    def track(self, endpoint: str) -> _Tracking:
+        """`with monitor.track("predict") as probe: ...; probe.stage("parse") ...`"""
+        return _Tracking(self, endpoint)
+
+    def count(self, endpoint: str, event: str, n: int = 1) -> None:
+        with self._lock:
+            counts = self._endpoint(endpoint)["counts"]
+            counts[event] = counts.get(event, 0) + n
+
+    def _record(self, endpoint: str, stages: Dict[str, int]) -> None:
+        with self._lock:
+            entry = self._endpoint(endpoint)
+            entry["sampled"] += 1
+            if stages:
+                stages = {**stages, "request": max(stages.values())}
+            for name, peak in stages.items():
+                stats = entry["stages"].setdefault(name, {"samples": 0, "total_bytes": 0, "max_bytes": 0, "last_bytes": 0})
+                stats["samples"] += 1
+                stats["total_bytes"] += peak
+                stats["max_bytes"] = max(stats["max_bytes"], peak)
+                stats["last_bytes"] = peak
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {
+                name: {
+                    "counts": dict(entry["counts"]),
+                    "sampled": entry["sampled"],
+                    "stages": {
+                        stage: {
+                            "samples": s["samples"],
+                            "mean_bytes": s["total_bytes"] // s["samples"],
+                            "max_bytes": s["max_bytes"],
+                            "last_bytes": s["last_bytes"],
+                        }
+                        for stage, s in entry["stages"].items()
+                    },
+                }
+                for name, entry in self._endpoints.items()
+            }
+        max_rss: Optional[int] = None
+        if resource is not None:
+            # ru_maxrss is in KiB on Linux
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return {"sample_rate": self.sample_rate, "process_max_rss_bytes": max_rss, "endpoints": endpoints}
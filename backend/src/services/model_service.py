@@ -1,16 +1,39 @@
 from __future__ import annotations
+import os
+import json
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait as futures_wait
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
 
-from pandas import DataFrame
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, read_csv
 
 from repositories.model_repository import ModelRepository
 from repositories.build_history_repository import BuildHistoryRepository
 from ml.model_registry import ModelRegistry
 from ml.dummy_trainer import Trainer
+from ml.drift import DriftMonitor, build_reference
+from ml.model_cache import ModelCache
+from services.retention_service import RetentionService
+from services.holdout_evaluator import HoldoutEvaluator
+from services.progress import ProgressHub
+from services.shadow_service import ShadowScorer
+from utils.settings import ANALYSIS_MAX_ROWS, BACKGROUND_RETRY_SECONDS, COLUMNS, MODEL_CACHE_SIZE
+
+class _LiteNotBuilt(Exception):
+    """A version's fast tier has not been sized yet."""
+
 
 LABEL_MAP = {0: "CONFIRMED", 1: "CANDIDATE", 2: "FALSE POSITIVE"}
 
+logger = logging.getLogger(__name__)
+
 class ModelService:
     def __init__(self,
                  registry: ModelRegistry | None = None,
@@ -21,42 +44,168 @@ class ModelService:
         self.models = models or ModelRepository()
         self.history = history or BuildHistoryRepository()
         self.trainer = trainer or Trainer()
+        self.retention = RetentionService(self.models)
+        # Background work (SHAP summaries, ...) runs here, off the request path
+        self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-bg")
+        self._summaries: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        self._summary_jobs: Dict[Tuple[str, Optional[str]], Future] = {}
+        self._jobs_lock = threading.Lock()
+        self.drift = DriftMonitor(reference_loader=self._drift_reference)
+        self._drift_jobs: Dict[Tuple[str, Optional[str]], Future] = {}
+        self._lite_jobs: Dict[Tuple[str, str], Future] = {}
+        # (job kind, model, version) -> last failure of a background job, kept to back off retries
+        self._failures: Dict[Tuple[str, str, Optional[str]], Dict[str, Any]] = {}
+        self._cache = ModelCache(max_entries=MODEL_CACHE_SIZE)
+        self._serving: Dict[str, Tuple[Optional[int], Optional[str]]] = {}
+        self._promotion_lock = threading.Lock()
+        self.shadow = ShadowScorer(model_loader=self._resolve_model, models=self.models)
+        self.progress = ProgressHub()
+        # Build fingerprint -> in-flight build, so identical concurrent submissions train once
+        self._inflight_builds: Dict[str, Future] = {}
+        self._builds_lock = threading.Lock()
+        self.holdout_eval = HoldoutEvaluator(self.models, self.registry, trainer=self.trainer)
+        # Catch up on versions or holdouts added while the server was down
+        self.holdout_eval.schedule()
+        self._background.submit(self._backfill_build_models)
 
-    def shap(self, df: DataFrame, model_name: str, version: Optional[str] = None) -> Dict[str, Any]:
-        # Resolve model_name/version: use default if not provided, else latest if version None
-        model = None
-        if version is not None:
+    def _resolve_model(self, model_name: str, version: Optional[str] = None, tier: str = "full") -> Any:
+        # Resolve model_name/version: explicit version if given, else the promoted serving version,
+        # else the registry's base model. Loaded models are cached and shared across requests.
+        if version is None:
+            version = self.serving_version(model_name)
+
+        if tier == "fast":
+            if version is None:
+                raise ValueError(f"Model '{model_name}' serves its base model; the fast tier needs a trained version.")
+            def load_lite():
+                info = self.models.load_lite_info(model_name, version)
+                if info is None:
+                    raise _LiteNotBuilt()
+                return self.trainer.truncate(self._resolve_model(model_name, version), info["iterations"])
             try:
-                model = self.models.load_model(model_name=model_name, version=version)
-            except FileNotFoundError:
-                raise RuntimeError("Model does not exist.")
+                return self._cache.get((model_name, version, "fast"), load_lite)
+            except _LiteNotBuilt:
+                # The fast tier is sized in the background, never on a request: serve the full
+                # tier until it is ready (or while a failed build waits for its retry)
+                self.schedule_lite(model_name, version)
+                return self._resolve_model(model_name, version)
 
-        if model is None:
+        if version is not None:
+            def load_version():
+                try:
+                    return self.models.load_model(model_name=model_name, version=version)
+                except FileNotFoundError:
+                    raise RuntimeError("Model does not exist.")
+            return self._cache.get((model_name, version), load_version)
+
+        def load_base():
             try:
-                model = self.registry.get_model(model_name)
+                return self.registry.get_model(model_name)
             except FileNotFoundError:
                 raise RuntimeError("Base model does not exist.")
+        return self._cache.get((model_name, None), load_base)
+
+    def serving_version(self, model_name: str) -> Optional[str]:
+        """Promoted version of a family, or None when the base model serves. Re-read only when serving.json changes."""
+        try:
+            mtime = os.stat(self.models.serving_path(model_name)).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            mtime = None
+        cached = self._serving.get(model_name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        serving = self.models.load_serving(model_name) if mtime is not None else None
+        version = serving["version"] if serving else None
+        self._serving[model_name] = (mtime, version)
+        return version
+
+    def get_serving(self, model_name: str) -> Dict[str, Any]:
+        serving = self.models.load_serving(model_name)
+        return serving or {"model": model_name, "version": None, "history": []}
+
+    def promote(self, model_name: str, version: str) -> Dict[str, Any]:
+        if version not in self.models.list_versions(model_name):
+            raise ValueError(f"Model '{model_name}' version '{version}' not found.")
+        with self._promotion_lock:
+            current = self.models.load_serving(model_name)
+            previous_version = current["version"] if current else None
+            if previous_version == version:
+                return current
+            # Load (and cache) the new model before switching, so the first requests after the
+            # swap do not all miss at once; in-flight requests keep their reference to the old one
+            self._resolve_model(model_name, version)
+            history = (current.get("history", []) + [previous_version]) if current else []
+            info = self.models.get_version_info(model_name, version) or {}
+            serving = {
+                "model": model_name,
+                "version": version,
+                "previous_version": previous_version,
+                "history": history,
+                "build_id": info.get("build_id"),
+                "promoted_at": datetime.utcnow().isoformat(),
+            }
+            self._switch_serving(model_name, serving)
+            if serving["build_id"]:
+                self.history.set_promotion(serving["build_id"], True, previous_version)
+            if current and current.get("build_id"):
+                self.history.set_promotion(current["build_id"], False)
+            return serving
+
+    def rollback(self, model_name: str) -> Dict[str, Any]:
+        with self._promotion_lock:
+            current = self.models.load_serving(model_name)
+            if not current:
+                raise ValueError(f"Model '{model_name}' has no promoted version to roll back.")
+            history = list(current.get("history", []))
+            target = history.pop() if history else None
+            if target is None and not self.registry.get_model_info(model_name):
+                raise ValueError(f"Model '{model_name}' has no earlier version to roll back to.")
+            serving = None
+            if target is not None:
+                self._resolve_model(model_name, target)
+                info = self.models.get_version_info(model_name, target) or {}
+                serving = {
+                    "model": model_name,
+                    "version": target,
+                    "previous_version": history[-1] if history else None,
+                    "history": history,
+                    "build_id": info.get("build_id"),
+                    "promoted_at": datetime.utcnow().isoformat(),
+                }
+            self._switch_serving(model_name, serving)
+            if current.get("build_id"):
+                self.history.set_promotion(current["build_id"], False)
+            if serving and serving["build_id"]:
+                self.history.set_promotion(serving["build_id"], True, serving["previous_version"])
+            return serving or {"model": model_name, "version": None, "history": []}
+
+    def _switch_serving(self, model_name: str, serving: Optional[Dict[str, Any]]) -> None:
+        # serving.json is replaced atomically; other worker processes pick it up on their next mtime check
+        if serving is None:
+            self.models.delete_serving(model_name)
+        else:
+            self.models.save_serving(model_name, serving)
+        self._serving.pop(model_name, None)
+        self.serving_version(model_name)
+
+    def shap(self, df: DataFrame, model_name: str, version: Optional[str] = None,
+             explainer: Optional[str] = None) -> Dict[str, Any]:
+        model = self._resolve_model(model_name, version)
         try:
-            shap_values = self.trainer.shap(model, df)
+            shap_values = self.trainer.shap(model, df, explainer=explainer)
             return shap_values
         except Exception as e:
             raise RuntimeError(f"Failed to compute SHAP values: {e}")
 
-    def predict(self, df: DataFrame, model_name: str, version: Optional[str] = None) -> List[Any]:
-        # Resolve model_name/version: use default if not provided, else latest if version None
-        model = None
-        if version is not None:
-            try:
-                model = self.models.load_model(model_name=model_name, version=version)
-            except FileNotFoundError:
-                raise RuntimeError("Model does not exist.")
+    def predict_explain(self, df: DataFrame, model_name: str, version: Optional[str] = None,
+                        explainer: Optional[str] = None, tier: str = "full") -> Dict[str, Any]:
+        # Single-row fast path: one model load, one scaling pass, probabilities and SHAP together
+        model = self._resolve_model(model_name, version, tier)
+        return self.trainer.predict_explain(model, df, explainer=explainer)
+
+    def predict(self, df: DataFrame, model_name: str, version: Optional[str] = None, tier: str = "full") -> List[Any]:
+        model = self._resolve_model(model_name, version, tier)
 
-        if model is None:
-            try:
-                model = self.registry.get_model(model_name)
-            except FileNotFoundError:
-                raise RuntimeError("Base model does not exist.")
-        
         preds = model.predict(df.values)
 
         # Return raw numeric predictions (no label mapping)
@@ -70,6 +219,89 @@ class ModelService:
             except Exception:
                 return preds
 
+    def predict_many(self, df: DataFrame, targets: List[Tuple[str, Optional[str]]]) -> List[List[Any]]:
+        """Score one feature matrix with several (model_name, version) targets in parallel."""
+        X = df.values
+        # Resolve everything up front so a missing model fails before any scoring starts
+        models = [self._resolve_model(name, version) for name, version in targets]
+        with ThreadPoolExecutor(max_workers=len(models), thread_name_prefix="compare") as pool:
+            results = list(pool.map(lambda m: m.predict(X), models))
+        return [[v.item() if hasattr(v, "item") else v for v in np.asarray(preds).ravel()] for preds in results]
+
+    def mission_routes(self) -> Dict[str, Tuple[str, Optional[str]]]:
+        """Default routing for mixed uploads: each mission slot filled in registry.json, served under its own name."""
+        slots = {
+            "kepler": self.registry.get_kepler_model(),
+            "k2": self.registry.get_k2_model(),
+            "tess": self.registry.get_tess_model(),
+        }
+        return {mission: (mission, None) for mission, info in slots.items() if info is not None}
+
+    def predict_routed(self, df: DataFrame, assignment: np.ndarray, targets: List[Tuple[str, Optional[str]]]) -> List[Any]:
+        """Score each row with targets[assignment[row]]; returns predictions in the input's row order.
+
+        Rows are grouped per target so every model scores one matrix, and the groups run in parallel.
+        """
+        X = df.values
+        groups = [(i, np.flatnonzero(assignment == i)) for i in range(len(targets))]
+        groups = [(i, rows) for i, rows in groups if len(rows)]
+        if not groups:
+            return []
+        # Resolve everything up front so a missing model fails before any scoring starts
+        models = {i: self._resolve_model(*targets[i]) for i, _ in groups}
+        with ThreadPoolExecutor(max_workers=len(groups), thread_name_prefix="routed") as pool:
+            results = list(pool.map(lambda g: np.asarray(models[g[0]].predict(X[g[1]])).ravel(), groups))
+        out = np.empty(len(X), dtype=np.result_type(*results))
+        for (_, rows), preds in zip(groups, results):
+            out[rows] = preds
+        return [v.item() if hasattr(v, "item") else v for v in out]
+
+    def _dataset_hash(self, df: Optional[DataFrame], dataset_path: Optional[str]) -> str:
+        if df is None:
+            # Content of the stored file, decompressed, so the same upload hashes the same either way
+            return self.models.artifact_hash(dataset_path)
+        digest = hashlib.sha256()
+        digest.update(json.dumps([str(c) for c in df.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        return digest.hexdigest()
+
+    def _build_fingerprint(self, base: Tuple[str, Optional[str]], hyperparams: Dict[str, Any],
+                           df: Optional[DataFrame], dataset_path: Optional[str]) -> str:
+        """sha256 over (dataset content, base model/version, normalized hyperparameters, trainer code version)."""
+        payload = {
+            "dataset": self._dataset_hash(df, dataset_path),
+            "base": list(base),
+            "config": self.trainer.build_config(hyperparams, streaming=df is None),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _reusable_build(self, fingerprint: str, target: str) -> Optional[Dict[str, Any]]:
+        # Newest successful build whose version is still on disk (retention may have removed it),
+        # preferring one in the target family over a copy elsewhere
+        found = [(build_id, model_name) for build_id, model_name, version in self.history.find_by_fingerprint(fingerprint)
+                 if model_name and version in self.models.list_versions(model_name)]
+        for build_id, model_name in found:
+            if model_name == target:
+                return self.history.get(build_id)
+        return self.history.get(found[0][0]) if found else None
+
+    def _claim_build(self, fingerprint: str, emit) -> Future:
+        # Identical submissions queue behind the one in flight and then find its result in history
+        while True:
+            with self._builds_lock:
+                leader = self._inflight_builds.get(fingerprint)
+                if leader is None:
+                    claim = self._inflight_builds[fingerprint] = Future()
+                    return claim
+            emit("waiting", reason="identical build in progress")
+            futures_wait([leader])
+
+    def _release_build(self, fingerprint: str, claim: Future) -> None:
+        with self._builds_lock:
+            if self._inflight_builds.get(fingerprint) is claim:
+                del self._inflight_builds[fingerprint]
+        claim.set_result(None)
+
     def retrain(self,
                 action: str,
                 fork_name: Optional[str] = None,
@@ -79,16 +311,21 @@ class ModelService:
                 version_model: Optional[str] = None,
                 version_base_model: Optional[str] = None,
                 original_df: Optional[DataFrame] = None,
-                hyperparams: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        build_id = self.history.new_id()
+                hyperparams: Optional[Dict[str, Any]] = None,
+                lineage: Optional[Dict[str, Any]] = None,
+                dataset_path: Optional[str] = None,
+                build_id: Optional[str] = None) -> Dict[str, Any]:
+        # Callers may pick the id up front so clients can follow the build's progress while it runs
+        build_id = build_id or self.history.new_id()
         started_at = datetime.utcnow().isoformat()
+        emit = partial(self.progress.publish, build_id)
+        fingerprint = claim = None
         try:
+            emit("started", action=action)
             # process outputs
             if action == "fork":
                 if not fork_name:
                     raise ValueError("fork_name is required when action='fork'.")
-                if fork_name in self.models.list_models():
-                    raise ValueError(f"fork_name '{fork_name}' already exists. Choose a different name.")
                 if fork_base_model:
                     base_model = self.registry.get_model(fork_base_model)
                     if not base_model:
@@ -96,14 +333,12 @@ class ModelService:
                     model_name = fork_base_model
                     model_version = None
                 elif fork_model and fork_version:
-                    base_model = self.registry.get_model(fork_model)
-                    if not base_model:
-                        raise ValueError(f"Model '{fork_model}' not found in registry.")
                     resolved_version = self.registry.resolve_version(fork_model, fork_version)
                     if not resolved_version:
                         raise ValueError(f"Version '{fork_version}' for model '{fork_model}' not found.")
                     model_name = fork_model
-                    model_version = fork_version
+                    # The concrete id, never an alias: it is fingerprinted and recorded as the parent
+                    model_version = resolved_version
                 else:
                     raise ValueError("For 'fork' action, either 'fork_base_model' or both 'fork_model' and 'fork_version' must be provided.")
 
@@ -126,46 +361,108 @@ class ModelService:
                 raise ValueError("Action must be either 'fork' or 'version'.")
                 
             # Pass hyperparameters to trainer if supported
-            hp = hyperparams or {}
-            if hasattr(self.trainer, "train_and_eval"):
-                model, metrics = self.trainer.train_and_eval(original_df, **hp)
-            else:
-                model, metrics = self.trainer.train_and_eval(original_df)
+            hp = json.loads(hyperparams) if isinstance(hyperparams, str) else dict(hyperparams or {})
+            if original_df is None and not dataset_path:
+                raise ValueError("Either original_df or dataset_path must be provided.")
 
-            new_version = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-            if action == "fork":
-                path = self.models.save_model(model, fork_name, new_version, original_df)
-                self.models.save_fork_info(path, model_name, model_version, build_id, str(hyperparams), str(metrics))
+            # Double-clicks and client retries resubmit the same build: wait for an identical one in
+            # flight, then answer from an earlier successful build instead of training again
+            fingerprint = self._build_fingerprint((model_name, model_version), hp, original_df, dataset_path)
+            claim = self._claim_build(fingerprint, emit)
+            target = fork_name if action == "fork" else model_name
+            reusable = self._reusable_build(fingerprint, target)
+            # Reuses point at the build that actually trained the artifact
+            source = (reusable.get("reused_from") or reusable["id"]) if reusable else None
+            if reusable and reusable["model_name"] == target:
+                # Recorded under the caller's id, so the build can be looked up (and not resubmitted) like any other
+                training = {k: v for k, v in (reusable["training"] or {}).items() if k != "curves"}
                 self.history.append({
                     "id": build_id,
-                    "model_name": fork_name,
-                    "version": new_version,
+                    "model_name": target,
+                    "version": reusable["version"],
                     "started_at": started_at,
                     "finished_at": datetime.utcnow().isoformat(),
                     "status": "success",
-                    "metrics": metrics,
-                    "note": f"Saved at {path}",
+                    "metrics": reusable["metrics"],
+                    "training": {**training, "reused_from": source},
+                    "fingerprint": fingerprint,
+                    "reused_from": source,
                 })
-            else:
-                path = self.models.save_model(model, fork_model, new_version, original_df)
-                self.models.save_version_info(fork_model, new_version, build_id)
-                self.history.append({
-                    "id": build_id,
-                    "model_name": fork_model,
-                    "version": new_version,
-                    "started_at": started_at,
-                    "finished_at": datetime.utcnow().isoformat(),
+                emit("finished", status="success", version=reusable["version"], metrics=reusable["metrics"], reused_from=source)
+                return {
+                    "build_id": build_id,
                     "status": "success",
-                    "metrics": metrics,
-                    "note": f"Saved at {path}",
-                })
+                    "model_name": target,
+                    "model_version": reusable["version"],
+                    "metrics": reusable["metrics"],
+                    "training": training,
+                    "reused_from": source,
+                    "created": False,
+                }
+            if action == "fork" and fork_name in self.models.list_models():
+                raise FileExistsError(f"fork_name '{fork_name}' already exists. Choose a different name.")
+
+            if reusable:
+                # Same model under another name: link the trained artifact into the new family
+                emit("reusing", source_build=source, model=reusable["model_name"], version=reusable["version"])
+                model = self.models.load_model(model_name=reusable["model_name"], version=reusable["version"])
+                metrics = reusable["metrics"]
+                training = {**(reusable["training"] or {}), "reused_from": source}
+            elif original_df is None:
+                # Dataset too big for memory: the trainer streams it from disk
+                emit("dataset_loaded", path=dataset_path, out_of_core=True)
+                model, metrics, training = self.trainer.train_streaming(dataset_path, progress=emit, **hp)
+            elif hasattr(self.trainer, "train_and_eval"):
+                emit("dataset_loaded", rows=len(original_df), columns=len(original_df.columns))
+                model, metrics, training = self.trainer.train_and_eval(original_df, progress=emit, **hp)
+            else:
+                model, metrics, training = self.trainer.train_and_eval(original_df)
+
+            emit("saving")
+            # Artifacts are written to a private staging directory and renamed into the family in
+            # one step, so readers see a complete version or none; the id is taken under the family lock
+            staging = self.models.stage_version()
+            try:
+                self.models.write_artifacts(staging, model, original_df, source_path=dataset_path)
+                self.models.save_version_info(staging, build_id, str(hyperparams), str(metrics))
+                if lineage:
+                    self.models.save_staged_json(staging, "lineage.json", lineage)
+                if training.get("split"):
+                    self.models.save_staged_json(staging, "split.json", training["split"])
+                parent = {"model": model_name, "version": model_version} if action == "fork" else None
+                new_version = self.models.publish_version(staging, target, parent=parent)
+            except Exception:
+                self.models.discard_staged(staging)
+                raise
+            path = self.models.model_path(target, new_version)
+            self.schedule_shap_summary(target, new_version)
+            self.schedule_lite(target, new_version)
+            self._background.submit(self._compute_drift_reference, target, new_version, original_df)
+            self.history.append({
+                "id": build_id,
+                "model_name": target,
+                "version": new_version,
+                "started_at": started_at,
+                "finished_at": datetime.utcnow().isoformat(),
+                "status": "success",
+                "metrics": metrics,
+                "training": training,
+                "fingerprint": fingerprint,
+                "reused_from": source,
+                "note": f"Saved at {path}",
+            })
             
+            emit("finished", status="success", version=new_version, metrics=metrics)
+            self.holdout_eval.schedule()
             return {
                 "build_id": build_id,
                 "status": "success",
-                "model_name": fork_model,
+                "model_name": target,
                 "model_version": new_version,
                 "metrics": metrics,
+                "training": {k: v for k, v in training.items() if k != "curves"},
+                "reused_from": source,
+                "created": True,
             }
         except Exception as e:
             self.history.append({
@@ -178,11 +475,203 @@ class ModelService:
                 "metrics": None,
                 "note": str(e),
             })
+            emit("failed", status="failed", error=str(e))
+            raise
+        finally:
+            if claim is not None:
+                self._release_build(fingerprint, claim)
+
+    def get_lite(self, model_name: str, version: str) -> Optional[Dict[str, Any]]:
+        """Fast tier of a trained version: its boosting rounds, and latency and holdout metrics of both tiers.
+
+        Built in the background after training (or when first asked for) and stored next to the model;
+        None until then.
+        """
+        return self.models.load_lite_info(model_name, version)
+
+    def serving_tier(self, model_name: str, version: Optional[str], tier: str) -> str:
+        """Tier a request for `tier` is scored with: "full" until the version's fast tier has been built."""
+        if tier != "fast":
+            return tier
+        version = version or self.serving_version(model_name)
+        if version is None or version not in self.models.list_versions(model_name):
+            return tier  # left for _resolve_model to reject
+        if self.get_lite(model_name, version) is not None:
+            return tier
+        self.schedule_lite(model_name, version)
+        return "full"
+
+    def schedule_lite(self, model_name: str, version: str) -> Future:
+        key = (model_name, version)
+        with self._jobs_lock:
+            job = self._lite_jobs.get(key)
+            # A recent failure is kept and reported rather than rebuilt on every request
+            if job is None or (job.done() and self.background_failure("lite", model_name, version) is None):
+                job = self._background.submit(self._compute_lite, model_name, version)
+                self._lite_jobs[key] = job
+            return job
+
+    def _compute_lite(self, model_name: str, version: str) -> None:
+        try:
+            if self.models.load_lite_info(model_name, version) is None:
+                self._build_lite(model_name, version)
+            self._failures.pop(("lite", model_name, version), None)
+        except Exception as e:
+            logger.exception("Fast tier build failed for %s/%s", model_name, version)
+            self._record_failure("lite", model_name, version, e)
+            raise
+
+    def _build_lite(self, model_name: str, version: str) -> Dict[str, Any]:
+        if version not in self.models.list_versions(model_name):
+            raise ValueError(f"Model '{model_name}' version '{version}' not found.")
+        model = self._resolve_model(model_name, version)
+        df = self._load_version_dataset(model_name, version)
+        split = self.models.load_split(model_name, version)
+        if df is None or df.empty or (split is not None and "label" not in df.columns):
+            raise RuntimeError(f"Model '{model_name}' version '{version}' has no labelled dataset to measure the fast tier on.")
+        if split is not None:
+            # The version's own test rows, found again from the split recorded at training
+            X_test, y_test = self.trainer.holdout(df, split)
+        else:
+            # Trained before splits were recorded: no rows are known to be unseen, so the
+            # tiers are only timed and the accuracy given up is left unmeasured
+            X_test, y_test = df[[c for c in df.columns if c != "label"]], None
+        info = self.trainer.build_lite(model, X_test, y_test)
+        info["built_at"] = datetime.utcnow().isoformat()
+        self.models.save_lite_info(model_name, version, info)
+        return info
+
+    def get_shap_summary(self, model_name: str, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        key = (model_name, version)
+        summary = self._summaries.get(key)
+        if summary is None:
+            summary = self.models.load_shap_summary(self._summary_dir_name(model_name, version), version)
+            if summary is not None:
+                self._summaries[key] = summary
+        return summary
+
+    def background_failure(self, kind: str, model_name: str, version: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Last failure of a background job ("shap_summary", "lite") while it is not yet due for a retry."""
+        failure = self._failures.get((kind, model_name, version))
+        if failure is None:
+            return None
+        remaining = BACKGROUND_RETRY_SECONDS - (time.monotonic() - failure["monotonic"])
+        if remaining <= 0:
+            return None
+        return {"error": failure["error"], "failed_at": failure["failed_at"], "retry_after_s": remaining}
+
+    def _record_failure(self, kind: str, model_name: str, version: Optional[str], error: Exception) -> None:
+        self._failures[(kind, model_name, version)] = {
+            "error": str(error),
+            "failed_at": datetime.utcnow().isoformat(),
+            "monotonic": time.monotonic(),
+        }
+
+    def schedule_shap_summary(self, model_name: str, version: Optional[str] = None) -> Future:
+        key = (model_name, version)
+        with self._jobs_lock:
+            job = self._summary_jobs.get(key)
+            # A recent failure is kept and reported rather than recomputed on every poll
+            if job is None or (job.done() and self.background_failure("shap_summary", model_name, version) is None):
+                job = self._background.submit(self._compute_shap_summary, model_name, version)
+                self._summary_jobs[key] = job
+            return job
+
+    def _summary_dir_name(self, model_name: str, version: Optional[str]) -> str:
+        # Base models live in the directory named by their registry entry
+        if version is None:
+            info = self.registry.get_model_info(model_name) or {}
+            return info.get("model", model_name)
+        return model_name
+
+    def _compute_shap_summary(self, model_name: str, version: Optional[str]) -> None:
+        try:
+            model = self._resolve_model(model_name, version)
+            df = self._load_version_dataset(model_name, version)
+            if df is not None and not df.empty:
+                summary = self.trainer.shap_summary(model, df)
+            else:
+                summary = {
+                    "rows": 0,
+                    "mean_abs_shap": None,
+                    "beeswarm": None,
+                    "booster_importance": self.trainer.booster_importance(model),
+                    "note": "No stored dataset; only booster importance is available.",
+                }
+            summary.update({
+                "model": model_name,
+                "version": version,
+                "class_labels": {str(k): v for k, v in LABEL_MAP.items()},
+                "computed_at": datetime.utcnow().isoformat(),
+            })
+            self.models.save_shap_summary(self._summary_dir_name(model_name, version), version, summary)
+            self._summaries[(model_name, version)] = summary
+            self._failures.pop(("shap_summary", model_name, version), None)
+        except Exception as e:
+            logger.exception("SHAP summary failed for %s/%s", model_name, version)
+            self._record_failure("shap_summary", model_name, version, e)
             raise
 
+    def _load_version_dataset(self, model_name: str, version: Optional[str]) -> Optional[DataFrame]:
+        if version is None:
+            dataset_path = self.registry.get_model_dataset_path(self._summary_dir_name(model_name, version))
+            return read_csv(dataset_path, nrows=ANALYSIS_MAX_ROWS) if dataset_path and os.path.exists(dataset_path) else None
+        return self.models.load_dataset(model_name, version, nrows=ANALYSIS_MAX_ROWS)
+
+    def record_drift(self, df: DataFrame, model_name: str, version: Optional[str] = None) -> None:
+        # Never blocks the caller: the sketch update runs on the drift monitor's thread
+        self.drift.record(model_name, version or self.serving_version(model_name), df)
+
+    def get_drift(self, model_name: str, version: Optional[str] = None) -> Dict[str, Any]:
+        return self.drift.report(model_name, version or self.serving_version(model_name))
+
+    def _drift_reference(self, model_name: str, version: Optional[str]) -> Optional[Dict[str, Any]]:
+        reference = self.models.load_drift_reference(self._summary_dir_name(model_name, version), version)
+        if reference is None:
+            # Versions trained before drift monitoring existed: build the reference in the background
+            key = (model_name, version)
+            with self._jobs_lock:
+                job = self._drift_jobs.get(key)
+                if job is None or job.done():
+                    self._drift_jobs[key] = self._background.submit(self._compute_drift_reference, model_name, version)
+        return reference
+
+    def _compute_drift_reference(self, model_name: str, version: Optional[str], df: Optional[DataFrame] = None) -> None:
+        try:
+            if df is None:
+                df = self._load_version_dataset(model_name, version)
+            if df is None or df.empty:
+                return
+            reference = build_reference(df, COLUMNS)
+            reference["computed_at"] = datetime.utcnow().isoformat()
+            self.models.save_drift_reference(self._summary_dir_name(model_name, version), version, reference)
+        except Exception:
+            logger.exception("Drift reference failed for %s/%s", model_name, version)
+
+    def set_shadow(self, model_name: str, shadow_version: str, shadow_model: Optional[str] = None,
+                   sample_rate: float = 0.1) -> Dict[str, Any]:
+        shadow_model = shadow_model or model_name
+        # Fail fast on a bad target instead of in the shadow worker
+        self._resolve_model(shadow_model, shadow_version)
+        return self.shadow.set_config(model_name, shadow_model, shadow_version, sample_rate)
+
+    def clear_shadow(self, model_name: str) -> None:
+        self.shadow.clear_config(model_name)
+
+    def get_shadow(self, model_name: str) -> Dict[str, Any]:
+        return self.shadow.report(model_name)
+
+    def observe_shadow(self, df: DataFrame, preds: List[Any], model_name: str, version: Optional[str] = None,
+                       primary_ms: Optional[float] = None) -> None:
+        # Called after the response is sent; only samples and enqueues
+        self.shadow.observe(model_name, version, df.values, preds, primary_ms=primary_ms)
+
     def get_models(self) -> List[str]:
         return self.models.list_models()
     
+    def has_model(self, model_name: str) -> bool:
+        return self.models.is_model(model_name)
+
     def get_base_models(self) -> List[str]:
         return self.registry.list_base_models()
     
@@ -192,8 +681,81 @@ class ModelService:
     def list_versions(self, model_name: str) -> List[str]:
         return self.models.list_versions(model_name)
 
+    def get_lineage(self, model_name: str, version: str) -> Optional[Dict[str, Any]]:
+        return self.models.load_lineage(model_name, version)
+
+    def catalog_validators(self) -> Tuple[str, float]:
+        """(ETag, last-modified timestamp) for the model listings: stored versions plus registry.json."""
+        generation, generation_mtime = self.models.catalog_generation()
+        try:
+            registry_mtime = os.stat(self.registry.registry_path).st_mtime_ns
+        except FileNotFoundError:
+            registry_mtime = 0
+        etag = f'"catalog-{generation}-{generation_mtime:x}-{registry_mtime:x}"'
+        return etag, max(generation_mtime, registry_mtime) / 1e9
+
+    def version_tiers(self, model_name: str) -> Dict[str, str]:
+        return {v: self.models.version_tier(model_name, v) for v in self.models.list_versions(model_name)}
+
+    def run_retention(self, dry_run: bool = True, keep_hot: Optional[int] = None,
+                      max_versions: Optional[int] = None) -> Dict[str, Any]:
+        return self.retention.run(dry_run=dry_run, keep_hot=keep_hot, max_versions=max_versions)
+
+    def list_holdouts(self) -> List[Dict[str, Any]]:
+        return self.holdout_eval.holdouts.list()
+
+    def register_holdout(self, name: str, df: DataFrame, description: Optional[str] = None) -> Dict[str, Any]:
+        missing = [c for c in COLUMNS + ["label"] if c not in df.columns]
+        if missing:
+            raise ValueError(f"Holdout is missing required columns: {missing}")
+        df = df[COLUMNS + ["label"]].copy()
+        # Labels are stored as class indices, whether the file used indices or names
+        names = {v: k for k, v in LABEL_MAP.items()}
+        labels = df["label"].map(lambda v: names.get(str(v).strip(), v))
+        labels = pd.to_numeric(labels, errors="coerce")
+        if labels.isna().any() or not labels.isin(list(LABEL_MAP)).all():
+            raise ValueError(f"Holdout labels must be class indices {sorted(LABEL_MAP)} or names {sorted(names)}.")
+        df["label"] = labels.astype(int)
+        meta = self.holdout_eval.holdouts.save(name, df, description=description)
+        self.holdout_eval.schedule()
+        return meta
+
+    def delete_holdout(self, name: str) -> None:
+        self.holdout_eval.holdouts.delete(name)
+
+    def holdout_comparison(self, metric: Optional[str] = None) -> Dict[str, Any]:
+        return self.holdout_eval.table(metric)
+
+    def evaluate_holdouts(self) -> None:
+        self.holdout_eval.schedule()
+
     def list_builds(self, limit: int = 50):
         return self.history.list(limit)
 
+    def builds_etag(self, limit: int = 50) -> str:
+        return f'"builds-{self.history.generation()}-{limit}"'
+
+    def build_leaderboard(self, metric: str, model_name: Optional[str] = None, limit: int = 10,
+                          per_family: bool = False, ascending: bool = False) -> List[Dict[str, Any]]:
+        return self.history.leaderboard(metric, model_name=model_name, limit=limit, per_family=per_family, ascending=ascending)
+
+    def build_trend(self, metric: str, model_name: Optional[str] = None, limit: int = 200) -> Dict[str, Any]:
+        return self.history.trend(metric, model_name=model_name, limit=limit)
+
+    def _backfill_build_models(self) -> None:
+        # Builds recorded before model_name/version were stored: their version's info.json names the build
+        try:
+            found: Dict[str, Tuple[str, str]] = {}
+            for model_name in self.models.list_models():
+                for version in self.models.list_versions(model_name):
+                    info = self.models.get_version_info(model_name, version) or {}
+                    if info.get("build_id"):
+                        found[info["build_id"]] = (model_name, version)
+            updated = self.history.backfill_models(found.get)
+            if updated:
+                logger.info("Backfilled model/version of %d builds", updated)
+        except Exception:
+            logger.exception("Build history backfill failed")
+
     def get_build(self, build_id: str):
         return self.history.get(build_id)
\ No newline at end of file
@@ -0,0 +1,105 @@
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from utils.settings import PROGRESS_BUFFER_SIZE, PROGRESS_RETAIN_BUILDS
+
+TERMINAL_STAGES = ("finished", "failed")
+
+
+class _Stream:
+    def __init__(self, buffer_size: int):
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self.seq = 0
+        self.started = False
+        self.done = False
+        self.waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+
+class ProgressHub:
+    """Per-build progress events kept in bounded in-memory buffers and pushed to async subscribers.
+
+    Training threads publish; SSE handlers subscribe. A subscriber that falls behind a full
+    buffer gets a "gap" event with the number of events it missed instead of blocking the build.
+    """
+
+    def __init__(self, buffer_size: int = PROGRESS_BUFFER_SIZE, retain: int = PROGRESS_RETAIN_BUILDS):
+        self.buffer_size = buffer_size
+        self.retain = retain
+        self._streams: "OrderedDict[str, _Stream]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _stream(self, build_id: str) -> _Stream:
+        # Called with the lock held
+        stream = self._streams.get(build_id)
+        if stream is None:
+            stream = self._streams[build_id] = _Stream(self.buffer_size)
+            self._prune()
+        return stream
+
+    def _prune(self) -> None:
+        # Finished (or never started) builds nobody is watching are dropped, oldest first
+        idle = [b for b, s in self._streams.items() if (s.done or not s.started) and not s.waiters]
+        for build_id in idle[:max(0, len(idle) - self.retain)]:
+            del self._streams[build_id]
+
+    def publish(self, build_id: str, stage: str, **data: Any) -> None:
+        with self._lock:
+            stream = self._stream(build_id)
+            if stream.done:
+                return
+            stream.seq += 1
+            stream.events.append({"seq": stream.seq, "stage": stage, "time": time.time(), **data})
+            stream.started = True
+            stream.done = stage in TERMINAL_STAGES
+            waiters = list(stream.waiters)
+        for loop, wake in waiters:
+            loop.call_soon_threadsafe(wake.set)
+
+    def active(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"build_id": build_id, "stage": s.events[-1]["stage"], "started_at": s.events[0]["time"], "events": s.seq}
+                for build_id, s in self._streams.items() if s.started and not s.done and s.events
+            ]
+
+    def snapshot(self, build_id: str, after_seq: int = 0) -> Tuple[List[Dict[str, Any]], bool, int]:
+        """Events after `after_seq`, whether the build is over, and how many events were lost to the buffer bound."""
+        with self._lock:
+            stream = self._streams.get(build_id)
+            if stream is None:
+                return [], False, 0
+            events = [e for e in stream.events if e["seq"] > after_seq]
+            first = events[0]["seq"] if events else stream.seq + 1
+            return events, stream.done, max(0, first - after_seq - 1)
+
+    async def subscribe(self, build_id: str, after_seq: int = 0, keepalive: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Yields events as they are published (None every `keepalive` idle seconds) until the build ends."""
+        wake = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), wake)
+        with self._lock:
+            self._stream(build_id).waiters.add(waiter)
+        try:
+            while True:
+                # Clear before reading so a publish between the read and the wait is not missed
+                wake.clear()
+                events, done, dropped = self.snapshot(build_id, after_seq)
+                if dropped:
+                    yield {"seq": after_seq + dropped, "stage": "gap", "dropped": dropped}
+                for event in events:
+                    yield event
+                    after_seq = event["seq"]
+                if done:
+                    return
+                try:
+                    await asyncio.wait_for(wake.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                stream = self._streams.get(build_id)
+                if stream is not None:
+                    stream.waiters.discard(waiter)
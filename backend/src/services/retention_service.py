@@ -0,0 +1,90 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Set
+
+from repositories.model_repository import ModelRepository
+from utils.settings import RETENTION_KEEP_HOT, RETENTION_MAX_VERSIONS
+
+
+class RetentionService:
+    """Keeps recent, promoted and in-use model versions hot; compresses (and optionally drops) the rest."""
+
+    def __init__(self,
+                 models: ModelRepository | None = None,
+                 keep_hot: int = RETENTION_KEEP_HOT,
+                 max_versions: Optional[int] = RETENTION_MAX_VERSIONS):
+        self.models = models or ModelRepository()
+        self.keep_hot = keep_hot
+        self.max_versions = max_versions
+
+    def protected_versions(self, model_name: str) -> Set[str]:
+        # Serving and previously promoted versions (rollback targets), and versions
+        # other families were forked from, stay hot
+        protected: Set[str] = set()
+        serving = self.models.load_serving(model_name)
+        if serving:
+            protected.add(serving["version"])
+            protected.update(serving.get("history", []))
+        for other in self.models.list_models():
+            parent = self.models.get_parent_model(other)
+            if parent and parent.get("model") == model_name and parent.get("version"):
+                protected.add(parent["version"])
+        return protected
+
+    def plan(self, keep_hot: Optional[int] = None, max_versions: Optional[int] = None) -> List[Dict[str, Any]]:
+        keep_hot = self.keep_hot if keep_hot is None else keep_hot
+        max_versions = self.max_versions if max_versions is None else max_versions
+
+        actions: List[Dict[str, Any]] = []
+        for model_name in self.models.list_models():
+            versions = self.models.list_versions(model_name)
+            protected = self.protected_versions(model_name)
+            hot = set(versions[-keep_hot:]) if keep_hot > 0 else set()
+            # Newest first, so max_versions counts from the most recent build
+            for rank, version in enumerate(reversed(versions)):
+                if version in protected or version in hot:
+                    continue
+                if max_versions is not None and rank >= max_versions:
+                    action = "delete"
+                elif self.models.version_tier(model_name, version) == "hot":
+                    action = "compress"
+                else:
+                    continue
+                actions.append({
+                    "model": model_name,
+                    "version": version,
+                    "action": action,
+                    "bytes": self.models.version_size(model_name, version),
+                })
+        return actions
+
+    def run(self, dry_run: bool = True, keep_hot: Optional[int] = None, max_versions: Optional[int] = None) -> Dict[str, Any]:
+        actions = self.plan(keep_hot=keep_hot, max_versions=max_versions)
+        bytes_freed = 0
+        if not dry_run:
+            for item in actions:
+                if item["action"] == "compress":
+                    item["bytes_freed"] = self.models.compress_version(item["model"], item["version"])
+                else:
+                    self.models.delete_version(item["model"], item["version"])
+                    item["bytes_freed"] = item["bytes"]
+                bytes_freed += item["bytes_freed"]
+        return {
+            "dry_run": dry_run,
+            "actions": actions,
+            "bytes_freed": bytes_freed,
+        }
+
+
+if __name__ == "__main__":
+    # Retention GC: PYTHONPATH=./src python -m services.retention_service [--keep-hot N] [--max-versions M] [--execute]
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Compress or remove cold model versions.")
+    parser.add_argument("--keep-hot", type=int, default=None, help=f"Newest versions kept uncompressed per family (default {RETENTION_KEEP_HOT})")
+    parser.add_argument("--max-versions", type=int, default=None, help="Delete versions older than the newest M (default: never delete)")
+    parser.add_argument("--execute", action="store_true", help="Apply the plan (default is a dry run)")
+    args = parser.parse_args()
+
+    report = RetentionService().run(dry_run=not args.execute, keep_hot=args.keep_hot, max_versions=args.max_versions)
+    print(json.dumps(report, indent=2))
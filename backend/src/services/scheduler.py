@@ -0,0 +1,142 @@
+from __future__ import annotations
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Deque, Dict, List
+
+import numpy as np
+
+
+class LaneOverloaded(Exception):
+    def __init__(self, lane: str):
+        super().__init__(f"Lane '{lane}' is overloaded; try again later.")
+        self.lane = lane
+
+
+class Lane:
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, weight: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.weight = weight
+        self.running = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        # Virtual time for weighted fair queueing: grows by 1/weight per admitted request
+        self.vtime = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.waits_ms: Deque[float] = deque(maxlen=1024)
+
+    def eligible(self) -> bool:
+        return bool(self.waiters) and self.running < self.max_concurrency
+
+    def metrics(self) -> Dict[str, Any]:
+        waits = np.fromiter(self.waits_ms, dtype=float) if self.waits_ms else None
+        return {
+            "running": self.running,
+            "queued": len(self.waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "weight": self.weight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_ms": {
+                "p50": float(np.percentile(waits, 50)),
+                "p95": float(np.percentile(waits, 95)),
+                "p99": float(np.percentile(waits, 99)),
+                "max": float(waits.max()),
+            } if waits is not None else None,
+        }
+
+
+class LaneScheduler:
+    """Admission control in front of ModelService.
+
+    Blocking work runs on a shared thread pool with `workers` slots. Each lane caps its own
+    concurrency and queue length; when slots free up, waiting lanes are served in weighted
+    fair order, so a burst of bulk or training work cannot starve interactive requests.
+    Keep the non-interactive lanes' concurrency sum below `workers` to reserve headroom.
+    """
+
+    def __init__(self, lanes: List[Lane], workers: int):
+        self.lanes: Dict[str, Lane] = {lane.name: lane for lane in lanes}
+        self.workers = workers
+        self._running = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lane")
+
+    def _dispatch(self) -> None:
+        while self._running < self.workers:
+            candidates = [lane for lane in self.lanes.values() if lane.eligible()]
+            if not candidates:
+                return
+            lane = min(candidates, key=lambda l: l.vtime)
+            waiter = lane.waiters.popleft()
+            if waiter.done():  # cancelled while queued
+                continue
+            lane.running += 1
+            self._running += 1
+            lane.vtime += 1.0 / lane.weight
+            waiter.set_result(None)
+
+    def _release(self, lane: Lane) -> None:
+        lane.running -= 1
+        self._running -= 1
+        self._dispatch()
+
+    async def _acquire(self, lane: Lane) -> None:
+        if len(lane.waiters) >= lane.max_queue:
+            lane.rejected += 1
+            raise LaneOverloaded(lane.name)
+        if not lane.waiters and lane.running == 0:
+            # An idle lane does not bank credit: start from the busiest lane's virtual time
+            active = [l.vtime for l in self.lanes.values() if l.waiters or l.running]
+            lane.vtime = max(lane.vtime, min(active)) if active else lane.vtime
+        waiter = asyncio.get_running_loop().create_future()
+        lane.waiters.append(waiter)
+        enqueued = time.perf_counter()
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted just before cancellation: hand it back
+                self._release(lane)
+            else:
+                # Still queued: stop counting against the lane's queue limit
+                try:
+                    lane.waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+        lane.admitted += 1
+        lane.waits_ms.append((time.perf_counter() - enqueued) * 1000.0)
+
+    def _finished(self, lane: Lane, future: Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            lane.failed += 1
+        else:
+            lane.completed += 1
+        self._release(lane)
+
+    async def run(self, lane_name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        lane = self.lanes[lane_name]
+        await self._acquire(lane)
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(partial(fn, *args, **kwargs))
+        # The slot is held until the work itself ends, not the request: a client that disconnects
+        # cancels the await, but a job already running keeps its slot until it finishes
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._finished, lane, f))
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "lanes": {name: lane.metrics() for name, lane in self.lanes.items()},
+        }
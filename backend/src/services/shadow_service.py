@@ -0,0 +1,168 @@
+from __future__ import annotations
+import copy
+import logging
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from repositories.model_repository import ModelRepository
+from utils.settings import SHADOW_QUEUE_SIZE, _to_label
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowScorer:
+    """Scores a sampled share of live traffic with a family's shadow version, off the request path.
+
+    Jobs go through a bounded queue to a single low-priority worker thread; when the queue is
+    full the job is dropped and counted rather than slowing the primary path down. The primary
+    model's latency is the one measured on the request path; the shadow model runs on one
+    thread here, so its latency reads as an upper bound.
+    """
+
+    def __init__(self,
+                 model_loader: Callable[[str, Optional[str]], Any],
+                 models: ModelRepository | None = None,
+                 queue_size: int = SHADOW_QUEUE_SIZE):
+        self._model_loader = model_loader
+        self.models = models or ModelRepository()
+        self._configs: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._loaded: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._worker = threading.Thread(target=self._run, name="shadow", daemon=True)
+        self._worker.start()
+
+    def get_config(self, family: str) -> Optional[Dict[str, Any]]:
+        if family not in self._configs:
+            self._configs[family] = self.models.load_shadow_config(family)
+        return self._configs[family]
+
+    def set_config(self, family: str, shadow_model: str, shadow_version: str, sample_rate: float) -> Dict[str, Any]:
+        config = {
+            "model": shadow_model,
+            "version": shadow_version,
+            "sample_rate": sample_rate,
+            "since": datetime.utcnow().isoformat(),
+        }
+        self.models.save_shadow_config(family, config)
+        with self._lock:
+            self._configs[family] = config
+            self._stats[family] = self._new_stats(config)
+        return config
+
+    def clear_config(self, family: str) -> None:
+        self.models.delete_shadow_config(family)
+        with self._lock:
+            self._configs[family] = None
+            self._stats.pop(family, None)
+
+    def _new_stats(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "shadow": f"{config['model']}@{config['version']}",
+            "since": config["since"],
+            "batches_scored": 0,
+            "rows_scored": 0,
+            "rows_agreed": 0,
+            "dropped": 0,
+            "errors": 0,
+            "timed_batches": 0,
+            "primary_ms": 0.0,
+            "shadow_ms": 0.0,
+            "confusion": {},
+        }
+
+    def observe(self, family: str, version: Optional[str], X: np.ndarray, primary_preds: List[Any],
+                primary_ms: Optional[float] = None) -> bool:
+        """Sample and enqueue one scored request; never blocks.
+
+        `primary_ms` is how long the primary model took on X; without it the batch only counts
+        toward agreement.
+        """
+        config = self.get_config(family)
+        if not config or random.random() >= config["sample_rate"]:
+            return False
+        try:
+            self._queue.put_nowait((family, version, config, X, primary_preds, primary_ms))
+            return True
+        except queue.Full:
+            with self._lock:
+                self._stats.setdefault(family, self._new_stats(config))["dropped"] += 1
+            return False
+
+    def _load(self, key: Tuple[str, Optional[str]]) -> Any:
+        model = self._loaded.get(key)
+        if model is None:
+            model = copy.deepcopy(self._model_loader(*key))
+            # One thread only, so shadow scoring does not steal cores from primary requests
+            xgb = getattr(model, "named_steps", {}).get("xgb", model)
+            if hasattr(xgb, "set_params"):
+                xgb.set_params(n_jobs=1)
+            # Only the current shadow model is kept
+            self._loaded = {key: model}
+        return model
+
+    def _timed_predict(self, model: Any, X: np.ndarray) -> Tuple[np.ndarray, float]:
+        start = time.perf_counter()
+        preds = np.asarray(model.predict(X)).ravel()
+        return preds, (time.perf_counter() - start) * 1000.0
+
+    def _run(self) -> None:
+        while True:
+            family, version, config, X, primary_preds, primary_ms = self._queue.get()
+            try:
+                if self.get_config(family) is not config:
+                    continue  # shadow changed or removed since the job was queued
+                shadow_key = (config["model"], config["version"])
+                shadow_preds, shadow_ms = self._timed_predict(self._load(shadow_key), X)
+
+                primary = [_to_label(v) for v in primary_preds]
+                shadow = [_to_label(v) for v in shadow_preds]
+                with self._lock:
+                    stats = self._stats.setdefault(family, self._new_stats(config))
+                    stats["batches_scored"] += 1
+                    stats["rows_scored"] += len(shadow)
+                    stats["rows_agreed"] += sum(p == s for p, s in zip(primary, shadow))
+                    if primary_ms is not None:
+                        stats["timed_batches"] += 1
+                        stats["primary_ms"] += primary_ms
+                        stats["shadow_ms"] += shadow_ms
+                    for p, s in zip(primary, shadow):
+                        row = stats["confusion"].setdefault(p, {})
+                        row[s] = row.get(s, 0) + 1
+            except Exception:
+                logger.exception("Shadow scoring failed for %s", family)
+                with self._lock:
+                    self._stats.setdefault(family, self._new_stats(config))["errors"] += 1
+            finally:
+                self._queue.task_done()
+
+    def report(self, family: str) -> Dict[str, Any]:
+        config = self.get_config(family)
+        with self._lock:
+            stats = dict(self._stats.get(family) or (self._new_stats(config) if config else {}))
+        if not config:
+            return {"model": family, "shadow": None}
+        timed = stats["timed_batches"]
+        rows = max(stats["rows_scored"], 1)
+        return {
+            "model": family,
+            "shadow": config,
+            "queued": self._queue.qsize(),
+            "batches_scored": stats["batches_scored"],
+            "rows_scored": stats["rows_scored"],
+            "agreement_rate": stats["rows_agreed"] / rows if stats["rows_scored"] else None,
+            "dropped": stats["dropped"],
+            "errors": stats["errors"],
+            "timed_batches": timed,
+            "primary_ms_mean": stats["primary_ms"] / timed if timed else None,
+            "shadow_ms_mean": stats["shadow_ms"] / timed if timed else None,
+            "latency_diff_ms_mean": (stats["shadow_ms"] - stats["primary_ms"]) / timed if timed else None,
+            "confusion": stats["confusion"],
+        }
@@ -0,0 +1,330 @@
+"""HTTP load test of the API under mixed traffic, swept over increasing concurrency.
+
+    PYTHONPATH=./src python -m utils.load_test [--mix single=70,bulk=10,models=10,builds=10]
+        [--concurrency 1,2,4,8,16,32] [--duration 20] [--server-workers 1] [--env SCHEDULER_WORKERS=16]
+        [--url http://host:port] [--output report.json]
+
+Without --url the app is started locally with uvicorn (using --server-workers and --env
+overrides) and stopped afterwards, so deploy configurations can be compared run against run.
+Every concurrency level runs for --duration seconds after a short warm-up; the JSON report
+has throughput, p50/p95/p99 latency and error rates per level and per endpoint, and the
+level at which the server saturated.
+
+The client is plain threads over http.client. Against a remote server or on a busy machine
+the client itself can become the bottleneck; run it from a separate host for real numbers.
+"""
+from __future__ import annotations
+import http.client
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from utils.settings import COLUMNS
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# (method, path, body, headers) of one request
+Request = Tuple[str, str, Optional[bytes], Dict[str, str]]
+
+
+class Workload:
+    """Builds the requests of each endpoint in the mix from synthetic (or sampled) feature rows."""
+
+    def __init__(self, model: str, bulk_rows: int, dataset: Optional[str] = None):
+        self.model = model
+        self.bulk_rows = bulk_rows
+        self.rows = pd.read_csv(dataset, usecols=lambda c: c in COLUMNS).reindex(columns=COLUMNS) if dataset else None
+        # One bulk body is shared by every bulk request: it is the server's parse/score time we measure
+        self._bulk_body, self._bulk_type = self._multipart(self._frame(random.Random(0), bulk_rows).to_csv(index=False).encode())
+        self.builders: Dict[str, Callable[[random.Random], Request]] = {
+            "single": self._single,
+            "bulk": self._bulk,
+            "models": lambda rng: ("GET", "/api/v1/models/all", None, {}),
+            "builds": lambda rng: ("GET", "/api/v1/builds/?limit=50", None, {}),
+        }
+
+    def _frame(self, rng: random.Random, n: int) -> pd.DataFrame:
+        if self.rows is not None:
+            return self.rows.sample(n=n, replace=True, random_state=rng.randrange(2 ** 31))
+        values = np.random.default_rng(rng.randrange(2 ** 31)).normal(size=(n, len(COLUMNS)))
+        return pd.DataFrame(values, columns=COLUMNS)
+
+    def _single(self, rng: random.Random) -> Request:
+        row = self._frame(rng, 1).iloc[0]
+        body = json.dumps({"data": {c: (None if pd.isna(v) else float(v)) for c, v in row.items()}}).encode()
+        return "POST", f"/api/v1/predict/single/?model={self.model}", body, {"Content-Type": "application/json"}
+
+    def _bulk(self, rng: random.Random) -> Request:
+        return "POST", f"/api/v1/predict/?model={self.model}", self._bulk_body, {"Content-Type": self._bulk_type}
+
+    def _multipart(self, csv_bytes: bytes) -> Tuple[bytes, str]:
+        boundary = uuid.uuid4().hex
+        body = io.BytesIO()
+        body.write(f"--{boundary}\r\n".encode())
+        body.write(b'Content-Disposition: form-data; name="file"; filename="load.csv"\r\n')
+        body.write(b"Content-Type: text/csv\r\n\r\n")
+        body.write(csv_bytes)
+        body.write(f"\r\n--{boundary}--\r\n".encode())
+        return body.getvalue(), f"multipart/form-data; boundary={boundary}"
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, Optional[float]]:
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "mean_ms": float(np.mean(latencies))}
+
+
+def _summarize(samples: List[Tuple[str, float, Any]], seconds: float) -> Dict[str, Any]:
+    # samples: (endpoint, latency_ms, status code or exception name)
+    def block(items: List[Tuple[str, float, Any]]) -> Dict[str, Any]:
+        ok = [lat for _, lat, status in items if isinstance(status, int) and status < 400]
+        statuses: Dict[str, int] = {}
+        for _, _, status in items:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = len(items) - len(ok)
+        return {
+            "requests": len(items),
+            "throughput_rps": len(ok) / seconds if seconds else 0.0,
+            "error_rate": errors / len(items) if items else 0.0,
+            # Admission control sheds load with 429; counted as errors but worth telling apart
+            "rejected": statuses.get("429", 0),
+            "statuses": statuses,
+            **_percentiles(ok),
+        }
+
+    report = block(samples)
+    report["endpoints"] = {name: block([s for s in samples if s[0] == name]) for name in sorted({s[0] for s in samples})}
+    return report
+
+
+def run_level(base_url: str, workload: Workload, mix: Dict[str, float], concurrency: int,
+              duration: float, warmup: float, timeout: float, seed: int = 11111) -> Dict[str, Any]:
+    target = urlsplit(base_url)
+    names, weights = list(mix), list(mix.values())
+    samples: List[Tuple[str, float, Any]] = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def worker(worker_id: int) -> None:
+        rng = random.Random(seed * 1000 + worker_id)
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=timeout)
+        local: List[Tuple[str, float, Any]] = []
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                break
+            name = rng.choices(names, weights)[0]
+            method, path, body, headers = workload.builders[name](rng)
+            t0 = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                status: Any = resp.status
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=timeout)
+            t1 = time.perf_counter()
+            # Requests that started during warm-up or finished after the window are not counted
+            if t0 >= measure_from and t1 <= stop_at:
+                local.append((name, (t1 - t0) * 1000.0, status))
+        conn.close()
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=warmup + duration + timeout + 5)
+    report = _summarize(samples, duration)
+    report["concurrency"] = concurrency
+    return report
+
+
+def find_saturation(levels: List[Dict[str, Any]], min_gain: float, max_error_rate: float,
+                    slo_p99_ms: Optional[float]) -> Dict[str, Any]:
+    """First level where adding concurrency stops paying: errors, a p99 SLO breach or a throughput plateau."""
+    best = None
+    for level in levels:
+        reason = None
+        if level["error_rate"] > max_error_rate:
+            reason = f"error rate {level['error_rate']:.1%} above {max_error_rate:.1%}"
+        elif slo_p99_ms is not None and level["p99_ms"] is not None and level["p99_ms"] > slo_p99_ms:
+            reason = f"p99 {level['p99_ms']:.0f} ms above SLO {slo_p99_ms:.0f} ms"
+        elif best is not None and level["throughput_rps"] < best["throughput_rps"] * (1.0 + min_gain):
+            reason = f"throughput gained less than {min_gain:.0%} over concurrency {best['concurrency']}"
+        if reason:
+            return {
+                "saturated": True,
+                "concurrency": level["concurrency"],
+                "reason": reason,
+                "last_scaling_concurrency": best["concurrency"] if best else None,
+                "peak_throughput_rps": max(l["throughput_rps"] for l in levels),
+            }
+        best = level
+    return {
+        "saturated": False,
+        "concurrency": None,
+        "reason": "throughput still scaling at the highest level tested",
+        "last_scaling_concurrency": best["concurrency"] if best else None,
+        "peak_throughput_rps": max((l["throughput_rps"] for l in levels), default=0.0),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, env: Dict[str, str], ready_timeout: float = 120.0) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=SRC_DIR,
+        env={**os.environ, **env},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + ready_timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited during startup with code {proc.returncode}.")
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+        try:
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return proc, base_url
+        except OSError:
+            pass
+        finally:
+            conn.close()
+        # Not up yet, or up but not answering 200
+        time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError(f"Server did not become ready within {ready_timeout:.0f}s.")
+
+
+def run(mix: Dict[str, float],
+        concurrency: List[int],
+        duration: float = 20.0,
+        warmup: float = 2.0,
+        model: str = "default",
+        bulk_rows: int = 500,
+        dataset: Optional[str] = None,
+        url: Optional[str] = None,
+        server_workers: int = 1,
+        env: Optional[Dict[str, str]] = None,
+        timeout: float = 60.0,
+        min_gain: float = 0.1,
+        max_error_rate: float = 0.01,
+        slo_p99_ms: Optional[float] = None,
+        progress: bool = True) -> Dict[str, Any]:
+    unknown = [name for name in mix if name not in ("single", "bulk", "models", "builds")]
+    if unknown:
+        raise ValueError(f"Unknown endpoints in mix: {unknown}. Use single, bulk, models and builds.")
+    env = env or {}
+    workload = Workload(model, bulk_rows, dataset)
+
+    proc = None
+    if url is None:
+        proc, url = start_server(server_workers, env)
+    try:
+        levels = []
+        for c in concurrency:
+            level = run_level(url, workload, mix, c, duration, warmup, timeout)
+            levels.append(level)
+            if progress:
+                print(f"concurrency {c:>4}: {level['throughput_rps']:8.1f} req/s  p50 {level['p50_ms'] or 0:8.1f} ms  "
+                      f"p99 {level['p99_ms'] or 0:8.1f} ms  errors {level['error_rate']:.1%}", file=sys.stderr, flush=True)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    return {
+        "config": {
+            "url": url if proc is None else "local",
+            "server_workers": server_workers if proc is not None else None,
+            "env": env,
+            "mix": mix,
+            "model": model,
+            "bulk_rows": bulk_rows,
+            "duration_s": duration,
+            "warmup_s": warmup,
+            "cpu_count": os.cpu_count(),
+        },
+        "levels": levels,
+        "saturation": find_saturation(levels, min_gain, max_error_rate, slo_p99_ms),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sweep concurrency over a mix of API endpoints and report latency/throughput.")
+    parser.add_argument("--mix", default="single=70,bulk=10,models=10,builds=10",
+                        help="Endpoint weights: single (/predict/single/), bulk (/predict/), models (/models/all), builds (/builds/)")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each level")
+    parser.add_argument("--model", default="default", help="Model used by the predict endpoints")
+    parser.add_argument("--bulk-rows", type=int, default=500, help="Rows per bulk /predict/ upload")
+    parser.add_argument("--dataset", default=None, help="CSV to sample feature rows from (default: random values)")
+    parser.add_argument("--url", default=None, help="Test a running server instead of starting one")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn worker processes for the local server")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Environment override for the local server, e.g. SCHEDULER_WORKERS=16 (repeatable)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="Throughput gain below which the next level counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Error rate that counts as saturated")
+    parser.add_argument("--slo-p99-ms", type=float, default=None, help="p99 latency that counts as saturated")
+    parser.add_argument("--output", default=None, help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    report = run(
+        parse_mix(args.mix),
+        [int(c) for c in args.concurrency.split(",")],
+        duration=args.duration,
+        warmup=args.warmup,
+        model=args.model,
+        bulk_rows=args.bulk_rows,
+        dataset=args.dataset,
+        url=args.url,
+        server_workers=args.server_workers,
+        env=dict(item.split("=", 1) for item in args.env),
+        timeout=args.timeout,
+        min_gain=args.min_gain,
+        max_error_rate=args.max_error_rate,
+        slo_p99_ms=args.slo_p99_ms,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
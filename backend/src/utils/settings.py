@@ -1,8 +1,86 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 MODELS_DIR = BASE_DIR / "models"
 MODELS_DIR.mkdir(parents=True, exist_ok=True)
+
+# SHAP backend used when a request does not pick one: "shap" (shap.TreeExplainer),
+# "native" (XGBoost pred_contribs, exact) or "approx" (XGBoost Saabas approximation)
+SHAP_EXPLAINER = os.getenv("SHAP_EXPLAINER", "native")
+
+# Retention: newest versions per family kept uncompressed, and an optional cap on stored versions
+RETENTION_KEEP_HOT = int(os.getenv("RETENTION_KEEP_HOT", "3"))
+RETENTION_MAX_VERSIONS = int(os.environ["RETENTION_MAX_VERSIONS"]) if os.getenv("RETENTION_MAX_VERSIONS") else None
+
+# Admission control: worker threads shared by all lanes, and per-lane
+# (max concurrency, max queued requests, fair-share weight)
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "8"))
+SCHEDULER_LANES = {
+    "interactive": (int(os.getenv("LANE_INTERACTIVE_CONCURRENCY", "4")), int(os.getenv("LANE_INTERACTIVE_QUEUE", "64")), 8.0),
+    "bulk": (int(os.getenv("LANE_BULK_CONCURRENCY", "2")), int(os.getenv("LANE_BULK_QUEUE", "8")), 2.0),
+    "shap": (int(os.getenv("LANE_SHAP_CONCURRENCY", "1")), int(os.getenv("LANE_SHAP_QUEUE", "16")), 2.0),
+    "training": (int(os.getenv("LANE_TRAINING_CONCURRENCY", "1")), int(os.getenv("LANE_TRAINING_QUEUE", "4")), 1.0),
+}
+
+# Largest accepted upload, counted on the decompressed CSV bytes
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(512 * 1024 * 1024)))
+
+# Bulk prediction input budgets, checked while the upload is parsed PREDICT_CHUNK_ROWS rows at a
+# time: more rows or (decompressed) bytes than allowed is refused with 413; an input whose
+# estimated in-memory size passes the memory budget is scored chunk by chunk instead of whole
+PREDICT_MAX_ROWS = int(os.getenv("PREDICT_MAX_ROWS", "2000000"))
+PREDICT_MAX_BYTES = int(os.getenv("PREDICT_MAX_BYTES", str(MAX_UPLOAD_BYTES)))
+PREDICT_MEMORY_BUDGET_BYTES = int(os.getenv("PREDICT_MEMORY_BUDGET_BYTES", str(256 * 1024 * 1024)))
+PREDICT_CHUNK_ROWS = int(os.getenv("PREDICT_CHUNK_ROWS", "50000"))
+# Columnar JSON bodies are parsed whole into Python lists (up to ~8x their size in memory) before
+# the budget can be checked, so they are capped on their raw size instead, derived from the budget
+PREDICT_MAX_JSON_BYTES = int(os.getenv("PREDICT_MAX_JSON_BYTES", str(PREDICT_MEMORY_BUDGET_BYTES // 8)))
+
+# Fast tier: trained versions also serve a copy truncated to the first boosting rounds whose
+# single-row predict+SHAP p95 meets LITE_LATENCY_TARGET_MS (measured over LITE_LATENCY_REPEATS calls)
+LITE_LATENCY_TARGET_MS = float(os.getenv("LITE_LATENCY_TARGET_MS", "25"))
+LITE_LATENCY_REPEATS = int(os.getenv("LITE_LATENCY_REPEATS", "30"))
+# Halving stops once a candidate gives up more holdout accuracy than LITE_MAX_ACCURACY_LOSS, or is
+# not at least LITE_MIN_SPEEDUP (a fraction) faster than the one before; when the target is out
+# of reach the fastest candidate within the accuracy loss serves
+LITE_MAX_ACCURACY_LOSS = float(os.getenv("LITE_MAX_ACCURACY_LOSS", "0.01"))
+LITE_MIN_SPEEDUP = float(os.getenv("LITE_MIN_SPEEDUP", "0.1"))
+
+# Share of prediction requests traced with tracemalloc for the per-stage memory metrics
+MEMORY_SAMPLE_RATE = float(os.getenv("MEMORY_SAMPLE_RATE", "0.05"))
+
+# Loaded models kept in memory per process (serving versions, pinned versions and base models)
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "8"))
+
+# Shadow scoring: sampled requests waiting for the shadow worker before new ones are dropped
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "64"))
+
+# Training memory: stored datasets bigger than the budget are trained out of core, streamed
+# TRAIN_CHUNK_ROWS rows at a time; scratch files (memmaps, external-memory caches) go to TRAIN_SCRATCH_DIR
+TRAIN_MEMORY_BUDGET_BYTES = int(os.getenv("TRAIN_MEMORY_BUDGET_BYTES", str(1024 * 1024 * 1024)))
+TRAIN_CHUNK_ROWS = int(os.getenv("TRAIN_CHUNK_ROWS", "100000"))
+TRAIN_SCRATCH_DIR = os.getenv("TRAIN_SCRATCH_DIR") or None
+
+# Early stopping: share of the training split held out for validation, rounds without improvement
+# before stopping (0 disables) and an optional wall-clock budget per build; both can be
+# overridden per build through the early_stopping_rounds / time_budget_s hyperparameters
+TRAIN_VALIDATION_FRACTION = float(os.getenv("TRAIN_VALIDATION_FRACTION", "0.15"))
+TRAIN_EARLY_STOPPING_ROUNDS = int(os.getenv("TRAIN_EARLY_STOPPING_ROUNDS", "25"))
+TRAIN_TIME_BUDGET_S = float(os.environ["TRAIN_TIME_BUDGET_S"]) if os.getenv("TRAIN_TIME_BUDGET_S") else None
+
+# Live training progress: events buffered per build, and finished builds whose events are kept
+PROGRESS_BUFFER_SIZE = int(os.getenv("PROGRESS_BUFFER_SIZE", "512"))
+PROGRESS_RETAIN_BUILDS = int(os.getenv("PROGRESS_RETAIN_BUILDS", "32"))
+
+# Benchmark holdout sets every model version is scored against, and the evaluator's parallelism
+HOLDOUTS_DIR = BASE_DIR / "holdouts"
+HOLDOUT_EVAL_WORKERS = int(os.getenv("HOLDOUT_EVAL_WORKERS", "2"))
+
+# Rows of a stored dataset read for background analyses (SHAP summary, drift reference)
+ANALYSIS_MAX_ROWS = int(os.getenv("ANALYSIS_MAX_ROWS", "500000"))
+# A failed background analysis (SHAP summary, fast tier) is reported instead of recomputed for this long
+BACKGROUND_RETRY_SECONDS = float(os.getenv("BACKGROUND_RETRY_SECONDS", "600"))
 COLUMNS = [
     'star_rad',
     'st_meterr2',